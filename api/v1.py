@@ -0,0 +1,211 @@
+"""Versioned JSON API: /api/v1/<resource>.
+
+    GET /api/v1/events?fields=name,date&limit=50&cursor=...
+    GET /api/v1/events?ids=1,2,3          (one query, ids in request order)
+    GET /api/v1/events/42?fields=description
+    GET /api/v1/tickets?event_id=42
+    GET /api/v1/stats/series?unit=week&from=2024-01-01&to=2024-06-30
+    GET /api/v1/stats/organizers?top=10
+
+Events are public like the HTML pages; organizers, attendees, tickets and
+the dashboard series need a session. Bodies are serialized with orjson when it is installed.
+"""
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from flask import Blueprint, current_app, request
+from flask_login import current_user
+
+from database import stats
+from database.resources import RESOURCES, fetch_ids, fetch_page
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle
+    orjson = None
+
+MAX_IDS = 100
+MAX_LIMIT = 200
+MAX_POINTS = 1000
+MAX_TOP = 50
+PUBLIC = {"events"}
+
+bp = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+
+def _default(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(",", ":"), ensure_ascii=False)
+
+
+def _json(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype="application/json")
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@bp.errorhandler(APIError)
+def _api_error(error):
+    return _json({"error": error.message}, error.status)
+
+
+def _resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise APIError("unknown resource", 404)
+    if name not in PUBLIC and not current_user.is_authenticated:
+        raise APIError("authentication required", 401)
+    return resource
+
+
+def _fields(resource):
+    """?fields=a,b -> validated list; absent -> the resource's defaults"""
+    raw = request.args.get("fields")
+    if not raw:
+        return list(resource.default)
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        raise APIError(f"unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def _int_list(raw, what):
+    try:
+        return [int(value) for value in raw.split(",") if value.strip()]
+    except ValueError:
+        raise APIError(f"{what} must be a comma-separated list of integers")
+
+
+@bp.route("/<resource_name>")
+def list_resource(resource_name):
+    resource = _resource(resource_name)
+    names = _fields(resource)
+    conn = current_app.extensions["db_connection"]()
+    cur = conn.cursor()
+
+    if "ids" in request.args:
+        ids = list(dict.fromkeys(_int_list(request.args["ids"], "ids")))
+        if len(ids) > MAX_IDS:
+            raise APIError(f"at most {MAX_IDS} ids per request")
+        found, columns = fetch_ids(cur, resource, names, ids)
+        cur.close()
+        conn.close()
+        return _json({
+            "data": [dict(zip(columns, found[i])) for i in ids if i in found],
+            "missing": [i for i in ids if i not in found],
+        })
+
+    filters = {}
+    for field in resource.filters:
+        value = request.args.get(field)
+        if value is not None:
+            try:
+                filters[field] = int(value)
+            except ValueError:
+                raise APIError(f"{field} must be an integer")
+    limit = min(max(request.args.get("limit", 50, type=int), 1), MAX_LIMIT)
+
+    page, columns = fetch_page(cur, resource, names, filters, request.args.get("cursor"), limit)
+    cur.close()
+    conn.close()
+    return _json({
+        "data": [dict(zip(columns, row)) for row in page.rows],
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    })
+
+
+@bp.route("/<resource_name>/<int:item_id>")
+def get_resource(resource_name, item_id):
+    resource = _resource(resource_name)
+    names = _fields(resource)
+    conn = current_app.extensions["db_connection"]()
+    cur = conn.cursor()
+    found, columns = fetch_ids(cur, resource, names, [item_id])
+    cur.close()
+    conn.close()
+    if item_id not in found:
+        raise APIError("not found", 404)
+    return _json({"data": dict(zip(columns, found[item_id]))})
+
+
+# ---------------------- dashboard series ----------------------
+
+def _stats_cursor():
+    if not current_user.is_authenticated:
+        raise APIError("authentication required", 401)
+    # Lecture seule, comme /dashboard : le worker de tâches reconstruit.
+    return current_app.extensions["db_connection"]().cursor()
+
+
+def _date_arg(name, default):
+    raw = request.args.get(name)
+    if not raw:
+        return default
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        raise APIError(f"{name} must be a date (YYYY-MM-DD)")
+
+
+def _top_arg(default):
+    return min(max(request.args.get("top", default, type=int), 1), MAX_TOP)
+
+
+def _cached(payload):
+    response = _json(payload)
+    # Agrégats : une minute de retard est acceptable, même pour le navigateur.
+    response.headers["Cache-Control"] = "private, max-age=60"
+    return response
+
+
+@bp.route("/stats/series")
+def stats_series():
+    unit = request.args.get("unit", "month")
+    if unit not in stats.UNITS:
+        raise APIError(f"unit must be one of {', '.join(stats.UNITS)}")
+    today = date.today()
+    start = _date_arg("from", today - timedelta(days=365))
+    end = _date_arg("to", today + timedelta(days=365))
+    if end < start:
+        raise APIError("to must not be before from")
+    days = (end - start).days + 1
+    points = {"day": days, "week": days // 7 + 1, "month": days // 28 + 1}[unit]
+    if points > MAX_POINTS:
+        raise APIError(f"at most {MAX_POINTS} {unit}s per request")
+    cur = _stats_cursor()
+    data = stats.series(cur, unit, start, end)
+    cur.close()
+    return _cached(dict(unit=unit, start=start, end=end, **data))
+
+
+@bp.route("/stats/organizers")
+def stats_organizers():
+    cur = _stats_cursor()
+    data = stats.top_organizers(cur, _top_arg(10))
+    cur.close()
+    return _cached(data)
+
+
+@bp.route("/stats/popular-events")
+def stats_popular_events():
+    cur = _stats_cursor()
+    data = stats.popular_events(cur, _top_arg(5))
+    cur.close()
+    return _cached(data)
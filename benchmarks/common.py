@@ -0,0 +1,20 @@
+import psycopg2
+
+import config
+
+
+def connection_params():
+    """Mêmes paramètres que l'application (config.py, surchargeables par .env)"""
+    return config.connection_params(config.from_env())
+
+
+def connect():
+    return psycopg2.connect(**connection_params())
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
@@ -0,0 +1,173 @@
+"""Flash-sale load test: concurrent registrations against one capped event.
+
+    python -m benchmarks.flash_sale --capacity 500 --registrations 5000 --concurrency 64
+
+Creates a throw-away event, fires --registrations concurrent register()
+calls (one connection per worker thread, the same code path as
+register_event()), cancels a few tickets so the promoter refills them, and
+checks the invariants: no oversell, seat counter equal to the ticket
+count, and every attendee either registered or waitlisted. Exits non-zero
+when an invariant is broken. Needs at least --registrations attendees
+(see benchmarks.generate).
+"""
+import argparse
+import datetime
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from benchmarks.common import connect, percentile
+from database import capacity, writes
+from services.waitlist import WaitlistPromoter
+
+
+def _setup(capacity_limit, registrations):
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM attendees ORDER BY id LIMIT %s", (registrations,))
+    attendee_ids = [row[0] for row in cur.fetchall()]
+    if len(attendee_ids) < registrations:
+        raise SystemExit(f"{len(attendee_ids)} participants en base, {registrations} nécessaires")
+    cur.execute("SELECT id FROM organizers ORDER BY id LIMIT 1")
+    organizer = cur.fetchone()
+    if organizer is None:
+        raise SystemExit("aucun organisateur en base")
+    cur.close()
+    # Même écriture que create_event() : statistiques et compteur de places compris.
+    event_id = writes.run(
+        conn, writes.create_event, f"Flash sale {int(time.time())}", datetime.date.today(),
+        "Benchmark", "Créé par benchmarks.flash_sale", organizer[0], capacity_limit
+    )
+    conn.close()
+    return event_id, attendee_ids
+
+
+def _check(event_id, capacity_limit, expected):
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT (SELECT COUNT(*) FROM tickets WHERE event_id = %s),
+               (SELECT taken FROM event_seats WHERE event_id = %s),
+               (SELECT COUNT(*) FROM waitlist WHERE event_id = %s)
+    """, (event_id, event_id, event_id))
+    tickets, taken, waitlisted = cur.fetchone()
+    cur.close()
+    conn.close()
+    errors = []
+    if tickets > capacity_limit:
+        errors.append(f"survente : {tickets} billets pour {capacity_limit} places")
+    if taken != tickets:
+        errors.append(f"compteur désynchronisé : taken={taken}, billets={tickets}")
+    if waitlisted and tickets < capacity_limit:
+        errors.append(f"{capacity_limit - tickets} place(s) libre(s) malgré {waitlisted} en attente")
+    if tickets + waitlisted != expected:
+        errors.append(f"{tickets} inscrits + {waitlisted} en attente != {expected} demandes")
+    return tickets, waitlisted, errors
+
+
+def _cleanup(event_id):
+    conn = connect()
+    writes.run(conn, writes.delete_event, event_id)
+    cur = conn.cursor()
+    # Confirmations en file pour les inscriptions du test : rien à envoyer.
+    cur.execute("DELETE FROM jobs WHERE status = 'queued' AND payload->>'event_id' = %s", (str(event_id),))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def run(capacity_limit, registrations, concurrency, cancellations, seed, keep=False, out=sys.stdout):
+    event_id, attendee_ids = _setup(capacity_limit, registrations)
+    random.Random(seed).shuffle(attendee_ids)
+
+    local = threading.local()
+    connections = []
+    connections_lock = threading.Lock()
+
+    def register(attendee_id):
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = connect()
+            with connections_lock:
+                connections.append(conn)
+        start = time.perf_counter()
+        try:
+            status = writes.run(conn, capacity.register, event_id, attendee_id)
+        except psycopg2.Error:
+            status = "error"
+        elapsed = time.perf_counter() - start
+        return status, elapsed
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(register, attendee_ids))
+        wall = time.perf_counter() - started
+        for conn in connections:
+            conn.close()
+
+        counts = {}
+        for status, _ in samples:
+            counts[status] = counts.get(status, 0) + 1
+        latencies = sorted(elapsed * 1000 for _, elapsed in samples)
+        out.write(f"événement {event_id} : {registrations} inscriptions, {capacity_limit} places, "
+                  f"{concurrency} connexions\n")
+        out.write(f"  {', '.join(f'{k}: {v}' for k, v in sorted(counts.items()))}\n")
+        out.write(f"  p50 {percentile(latencies, 50):.1f} ms  p95 {percentile(latencies, 95):.1f} ms  "
+                  f"p99 {percentile(latencies, 99):.1f} ms  {registrations / wall:,.0f} inscriptions/s\n")
+
+        tickets, waitlisted, errors = _check(event_id, capacity_limit, registrations - counts.get("error", 0))
+
+        if cancellations and tickets:
+            conn = connect()
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT attendee_id FROM tickets WHERE event_id = %s ORDER BY random() LIMIT %s",
+                (event_id, cancellations)
+            )
+            cancelled = [row[0] for row in cur.fetchall()]
+            for attendee_id in cancelled:
+                capacity.unregister(cur, event_id, attendee_id)
+                conn.commit()
+            cur.close()
+            conn.close()
+            # Même chemin que le thread de promotion, exécuté ici en synchrone.
+            promoter = WaitlistPromoter(connect)
+            promoter.promote_event(event_id)
+            out.write(f"  {len(cancelled)} annulation(s), {promoter.promoted} promotion(s) "
+                      f"depuis la liste d'attente\n")
+            tickets, waitlisted, more = _check(
+                event_id, capacity_limit, registrations - counts.get("error", 0) - len(cancelled)
+            )
+            errors.extend(more)
+
+        out.write(f"  final : {tickets} billets, {waitlisted} en attente\n")
+        for error in errors:
+            out.write(f"  ÉCHEC : {error}\n")
+        return not errors
+    finally:
+        if not keep:
+            _cleanup(event_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--capacity", type=int, default=500)
+    parser.add_argument("--registrations", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64,
+                        help="connexions simultanées (vérifier max_connections)")
+    parser.add_argument("--cancellations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="conserve l'événement créé")
+    args = parser.parse_args(argv)
+    ok = run(args.capacity, args.registrations, args.concurrency,
+             args.cancellations, args.seed, keep=args.keep)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Synthetic dataset generator, loaded with COPY.
+
+    python -m benchmarks.generate --attendees 1000000 --events 50000 --tickets 5000000
+
+Rows are produced lazily and streamed to COPY FROM STDIN, so memory stays
+flat whatever the size. Ids continue after the current maximum, and the
+run is deterministic for a given --seed.
+"""
+import argparse
+import datetime
+import math
+import random
+import time
+
+from benchmarks.common import connect
+from database import capacity, partitions, versions
+
+FIRST_NAMES = [
+    "Alice", "Bob", "Carol", "Daniel", "Emma", "Frank", "Grace", "Henry", "Ivy",
+    "Jack", "Kate", "Liam", "Maya", "Noah", "Olivia", "Paul", "Quinn", "Rosa",
+    "Sam", "Tina", "Ugo", "Vera", "Will", "Xena", "Yann", "Zoé",
+]
+LAST_NAMES = [
+    "Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit",
+    "Durand", "Leroy", "Moreau", "Simon", "Laurent", "Lefebvre", "Michel",
+    "Garcia", "Smith", "Johnson", "Brown", "Lee", "Chen", "Patel", "Kim",
+]
+CITIES = [
+    "Paris", "Lyon", "Marseille", "Toulouse", "Nantes", "Lille", "Bordeaux",
+    "Casablanca", "Rabat", "Montréal", "Bruxelles", "Genève", "San Francisco",
+]
+KINDS = ["Conférence", "Festival", "Atelier", "Salon", "Meetup", "Séminaire", "Gala"]
+
+
+class RowStream:
+    """File-like adapter feeding COPY from a generator of text lines"""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = ""
+        self.count = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            batch = [line for _, line in zip(range(1000), self._lines)]
+            if not batch:
+                break
+            self.count += len(batch)
+            self._buffer += "".join(batch)
+        if size < 0:
+            data, self._buffer = self._buffer, ""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _copy(cur, table, columns, lines):
+    stream = RowStream(lines)
+    start = time.monotonic()
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)",
+        stream
+    )
+    return stream.count, time.monotonic() - start
+
+
+def _max_id(cur, table):
+    cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+    return cur.fetchone()[0]
+
+
+def _coprime_step(n, rng):
+    """A step coprime with n: walking it visits n distinct values"""
+    if n <= 1:
+        return 1
+    step = rng.randrange(1, n)
+    while math.gcd(step, n) != 1:
+        step = rng.randrange(1, n)
+    return step
+
+
+def generate(organizers, events, attendees, tickets, seed=42, truncate=False, chronological=False,
+             echo=print):
+    if events and not organizers:
+        raise ValueError("--events nécessite au moins un organisateur généré")
+    if tickets and not (events and attendees):
+        raise ValueError("--tickets nécessite des événements et des participants générés")
+    rng = random.Random(seed)
+    conn = connect()
+    cur = conn.cursor()
+
+    if truncate:
+        cur.execute("TRUNCATE tickets, events, attendees, organizers RESTART IDENTITY CASCADE")
+
+    org_base = _max_id(cur, "organizers")
+    event_base = _max_id(cur, "events")
+    attendee_base = _max_id(cur, "attendees")
+
+    def organizer_rows():
+        for i in range(1, organizers + 1):
+            oid = org_base + i
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {oid}"
+            yield f"{oid}\t{name}\torg{oid}@example.com\t+33{rng.randrange(10**8, 10**9)}\n"
+
+    today = datetime.date.today()
+
+    def event_rows():
+        for i in range(1, events + 1):
+            eid = event_base + i
+            offset = rng.randrange(-730, 365)
+            if chronological:
+                offset = -730 + (i - 1) * 1095 // events
+            day = today + datetime.timedelta(days=offset)
+            city = rng.choice(CITIES)
+            name = f"{rng.choice(KINDS)} {city} {eid}"
+            organizer_id = org_base + rng.randrange(1, organizers + 1)
+            yield (f"{eid}\t{name}\t{day.isoformat()}\t{city}\t"
+                   f"Événement généré n°{eid}\t{organizer_id}\n")
+
+    def attendee_rows():
+        for i in range(1, attendees + 1):
+            aid = attendee_base + i
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            yield f"{aid}\t{name}\tuser{aid}@example.com\t+33{rng.randrange(10**8, 10**9)}\n"
+
+    def ticket_rows():
+        # Chaque événement reçoit un nombre de billets suivant une loi
+        # asymétrique (quelques événements très populaires), sans doublon
+        # (event_id, attendee_id) : on parcourt les participants avec un pas
+        # premier avec leur nombre.
+        weights = [rng.paretovariate(1.2) for _ in range(events)]
+        total_weight = sum(weights)
+        remaining = tickets
+        for index, weight in enumerate(weights):
+            if remaining <= 0:
+                break
+            count = min(int(tickets * weight / total_weight) + 1, attendees, remaining)
+            remaining -= count
+            eid = event_base + index + 1
+            start = rng.randrange(attendees)
+            step = _coprime_step(attendees, rng)
+            for j in range(count):
+                aid = attendee_base + 1 + (start + j * step) % attendees
+                yield f"{eid}\t{aid}\n"
+
+    plan = [
+        ("organizers", ("id", "name", "email", "phone"), organizer_rows, organizers),
+        ("events", ("id", "name", "date", "location", "description", "organizer_id"),
+         event_rows, events),
+        ("attendees", ("id", "name", "email", "phone"), attendee_rows, attendees),
+        ("tickets", ("event_id", "attendee_id"), ticket_rows, tickets),
+    ]
+    for table, columns, rows, count in plan:
+        if not count:
+            continue
+        if table == "tickets" and partitions.state(cur) != "legacy":
+            # Sinon les billets des nouveaux événements tombent dans tickets_default.
+            partitions.ensure(cur)
+        count, elapsed = _copy(cur, table, columns, rows())
+        echo(f"{table:<11} {count:>10} lignes en {elapsed:6.2f}s "
+             f"({count / elapsed if elapsed else 0:,.0f} lignes/s)")
+
+    # Les id explicites ne font pas avancer les séquences SERIAL.
+    for table in ("organizers", "events", "attendees", "tickets"):
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"GREATEST((SELECT MAX(id) FROM {table}), 1))"
+        )
+    cur.execute("UPDATE stats_state SET refreshed_at = NULL")
+    # COPY contourne les compteurs de places : on les recalcule.
+    capacity.resync(cur)
+    versions.bump_all(cur)
+    conn.commit()
+
+    # ANALYZE hors transaction pour des plans réalistes dès le premier run.
+    conn.autocommit = True
+    for table in ("organizers", "events", "attendees", "tickets"):
+        cur.execute(f"ANALYZE {table}")
+    cur.close()
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--organizers", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--attendees", type=int, default=300000)
+    parser.add_argument("--tickets", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chronological", action="store_true",
+                        help="dates croissantes avec l'id, comme des événements créés au fil du temps "
+                             "(partitions archivables, voir benchmarks/partitions.py)")
+    parser.add_argument("--truncate", action="store_true",
+                        help="vide les tables avant le chargement")
+    args = parser.parse_args(argv)
+    generate(args.organizers, args.events, args.attendees, args.tickets,
+             seed=args.seed, truncate=args.truncate, chronological=args.chronological)
+
+
+if __name__ == "__main__":
+    main()
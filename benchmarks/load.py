@@ -0,0 +1,230 @@
+"""Reproducible load harness for the routes in index.py.
+
+    python -m benchmarks.load --requests 500 --concurrency 8 --username admin --password admin123
+    python -m benchmarks.load --url http://localhost:8000 ...   # contre un serveur lancé
+
+In-process mode (the default) drives the Flask app through its test client
+and counts the SQL statements each request issues. HTTP mode measures a
+real server (gunicorn, proxy) but cannot count queries. Every route gets
+the same number of requests with ids drawn from a seeded RNG, so two runs
+against the same dataset are comparable.
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import connect, percentile
+from database.instrumentation import InstrumentedCursor
+
+_local = threading.local()
+
+
+class CountingCursor(InstrumentedCursor):
+    """Cursor counting executed statements for the current thread.
+
+    Built on the app's own cursor so SQL_INSTRUMENTATION=0/1 runs can be
+    compared to measure its overhead.
+    """
+
+    def execute(self, query, vars=None):
+        _local.queries = getattr(_local, "queries", 0) + 1
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _local.queries = getattr(_local, "queries", 0) + 1
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        _local.queries = getattr(_local, "queries", 0) + 1
+        return super().copy_expert(sql, file, size)
+
+
+def _dataset_bounds():
+    conn = connect()
+    cur = conn.cursor()
+    bounds = {}
+    for table in ("events", "attendees", "organizers"):
+        cur.execute(f"SELECT COALESCE(MIN(id), 1), COALESCE(MAX(id), 1) FROM {table}")
+        bounds[table] = cur.fetchone()
+    cur.execute("SELECT COUNT(*) FROM events")
+    bounds["event_pages"] = max(cur.fetchone()[0] // 10, 1)
+    cur.close()
+    conn.close()
+    return bounds
+
+
+def _pick(rng, bounds, table):
+    low, high = bounds[table]
+    return rng.randint(low, high)
+
+
+def build_routes(include_writes):
+    """[(name, callable(rng, bounds) -> (method, path, form))]"""
+    routes = [
+        ("index", lambda r, b: ("GET", "/", None)),
+        ("events", lambda r, b: ("GET", "/events", None)),
+        ("events_deep_page", lambda r, b: ("GET", f"/events?page={r.randint(1, b['event_pages'])}", None)),
+        ("view_event", lambda r, b: ("GET", f"/events/{_pick(r, b, 'events')}", None)),
+        ("organizers", lambda r, b: ("GET", "/organizers", None)),
+        ("attendees", lambda r, b: ("GET", "/attendees", None)),
+        ("attendee_details", lambda r, b: ("GET", f"/attendees/{_pick(r, b, 'attendees')}", None)),
+        ("dashboard", lambda r, b: ("GET", "/dashboard", None)),
+        ("register_event_form", lambda r, b: ("GET", f"/register_event/{_pick(r, b, 'events')}", None)),
+        ("available_attendees", lambda r, b: (
+            "GET", f"/api/events/{_pick(r, b, 'events')}/available_attendees?q={r.choice('abcdefghijklmnopqrstuvwxyz')}",
+            None)),
+        ("update_event_form", lambda r, b: ("GET", f"/events/update/{_pick(r, b, 'events')}", None)),
+    ]
+    if include_writes:
+        routes.append(("register_event", lambda r, b: (
+            "POST", f"/register_event/{_pick(r, b, 'events')}",
+            {"attendee_id": str(_pick(r, b, "attendees"))})))
+        routes.append(("unregister_event", lambda r, b: (
+            "GET", f"/unregister_event/{_pick(r, b, 'events')}/{_pick(r, b, 'attendees')}", None)))
+    return routes
+
+
+class InProcessClient:
+    def __init__(self, app, username, password):
+        self.client = app.test_client()
+        if username:
+            self.client.post("/login", data={"username": username, "password": password})
+
+    def request(self, method, path, form):
+        _local.queries = 0
+        response = self.client.open(path, method=method, data=form)
+        # Consomme le corps : les réponses en streaming font leur travail ici.
+        response.get_data()
+        redirected_to_login = response.status_code == 302 and "/login" in response.headers.get("Location", "")
+        return response.status_code, redirected_to_login, _local.queries
+
+
+class HTTPClient:
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            _NoRedirect()
+        )
+        if username:
+            self.request("POST", "/login", {"username": username, "password": password})
+
+    def request(self, method, path, form):
+        data = urllib.parse.urlencode(form).encode() if form else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                status, location = response.status, ""
+        except urllib.error.HTTPError as e:
+            status, location = e.code, e.headers.get("Location", "")
+        return status, status == 302 and "/login" in location, None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def run(make_client, routes, bounds, requests, concurrency, warmup, seed):
+    results = {}
+    for name, build in routes:
+        rng = random.Random(f"{seed}:{name}")
+        plans = [build(rng, bounds) for _ in range(warmup + requests)]
+        clients = [make_client() for _ in range(concurrency)]
+        client_for = {}
+        lock = threading.Lock()
+
+        def worker(plan):
+            thread = threading.get_ident()
+            with lock:
+                client = client_for.setdefault(thread, clients[len(client_for) % len(clients)])
+            start = time.perf_counter()
+            status, to_login, queries = client.request(*plan)
+            return time.perf_counter() - start, status, to_login, queries
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, plans[:warmup]))
+            started = time.perf_counter()
+            samples = list(pool.map(worker, plans[warmup:]))
+            wall = time.perf_counter() - started
+
+        latencies = sorted(s[0] * 1000 for s in samples)
+        errors = sum(1 for s in samples if s[1] >= 500 or s[2])
+        query_counts = [s[3] for s in samples if s[3] is not None]
+        results[name] = {
+            "requests": len(samples),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "throughput_rps": round(len(samples) / wall, 1) if wall else 0.0,
+            "queries_per_request": round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+        }
+    return results
+
+
+def print_report(results, out=sys.stdout):
+    header = f"{'route':<22}{'req':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'q/req':>7}"
+    out.write(header + "\n" + "-" * len(header) + "\n")
+    for name, r in results.items():
+        queries = "-" if r["queries_per_request"] is None else f"{r['queries_per_request']:.1f}"
+        out.write(
+            f"{name:<22}{r['requests']:>6}{r['errors']:>5}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+            f"{r['p99_ms']:>9.1f}{r['throughput_rps']:>9.1f}{queries:>7}\n"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="serveur à mesurer (sinon : en processus)")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--requests", type=int, default=200, help="requêtes mesurées par route")
+    parser.add_argument("--warmup", type=int, default=20, help="requêtes de chauffe par route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--routes", help="liste de routes séparées par des virgules")
+    parser.add_argument("--writes", action="store_true",
+                        help="inclut les routes d'écriture (inscription / désinscription)")
+    parser.add_argument("--json", dest="json_path", help="écrit aussi les résultats en JSON")
+    args = parser.parse_args(argv)
+
+    routes = build_routes(args.writes)
+    if args.routes:
+        wanted = set(args.routes.split(","))
+        routes = [route for route in routes if route[0] in wanted]
+
+    if args.url:
+        def make_client():
+            return HTTPClient(args.url, args.username, args.password)
+    else:
+        from index import create_app
+
+        app = create_app()
+        pool = app.extensions["db_pool"]()
+        pool.closeall()
+        pool.conn_params["cursor_factory"] = CountingCursor
+
+        def make_client():
+            return InProcessClient(app, args.username, args.password)
+
+    results = run(make_client, routes, _dataset_bounds(), args.requests,
+                  args.concurrency, args.warmup, args.seed)
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
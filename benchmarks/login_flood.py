@@ -0,0 +1,118 @@
+"""Page latency during a login flood, with and without the login guards.
+
+    python -m benchmarks.login_flood --readers 4 --flooders 16 --duration 10
+
+Runs in process, like one threaded worker: --readers threads fetch
+--path anonymously while --flooders threads post wrong passwords for
+--username from distinct IPs. Each mode gets a fresh app:
+
+  baseline   no flood
+  unguarded  flood, no rate limit, scrypt in the request thread
+  bounded    flood, no rate limit, scrypt on the bounded verifier pool
+  guarded    flood, rate limits and bounded pool (the defaults)
+
+The report gives the readers' p50/p95/p99 and throughput, and how the
+login attempts ended (401-like re-render, 429, other).
+"""
+import argparse
+import json
+import threading
+import time
+
+from benchmarks.common import percentile
+
+MODES = {
+    "baseline": None,
+    "unguarded": {"LOGIN_RATE_IP": "", "LOGIN_RATE_USER": "", "LOGIN_HASH_WORKERS": 0},
+    "bounded": {"LOGIN_RATE_IP": "", "LOGIN_RATE_USER": ""},
+    "guarded": {},
+}
+
+
+def run_mode(overrides, readers, flooders, duration, path, username):
+    from index import create_app
+
+    flood = overrides is not None
+    app = create_app(dict(overrides or {}, HTTP_CACHE=False))
+    stop = threading.Event()
+    latencies = []
+    outcomes = {"rejected": 0, "throttled": 0, "other": 0}
+    lock = threading.Lock()
+
+    def reader():
+        client = app.test_client()
+        mine = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get(path).get_data()
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    def flooder(index):
+        client = app.test_client()
+        counter = 0
+        while not stop.is_set():
+            counter += 1
+            response = client.post(
+                "/login", data={"username": username, "password": f"wrong-{counter}"},
+                environ_base={"REMOTE_ADDR": f"10.{index}.{counter // 250 % 250}.{counter % 250}"}
+            )
+            key = {200: "rejected", 429: "throttled"}.get(response.status_code, "other")
+            with lock:
+                outcomes[key] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    if flood:
+        threads += [threading.Thread(target=flooder, args=(i,)) for i in range(flooders)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "logins": outcomes if flood else None,
+        "verifier": app.extensions["hash_verifier"].stats(),
+    }
+
+
+def print_report(results):
+    print(f"{'mode':<10} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}   logins (échec / 429 / autre)")
+    for mode, r in results.items():
+        logins = r["logins"]
+        logins = f"{logins['rejected']} / {logins['throttled']} / {logins['other']}" if logins else "-"
+        print(f"{mode:<10} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}   {logins}")
+    print("latences en ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=4, help="threads lisant --path")
+    parser.add_argument("--flooders", type=int, default=16, help="threads envoyant des connexions")
+    parser.add_argument("--duration", type=float, default=10.0, help="secondes par mode")
+    parser.add_argument("--path", default="/events")
+    parser.add_argument("--username", default="admin", help="compte visé (doit exister)")
+    parser.add_argument("--modes", default=",".join(MODES), help="modes séparés par des virgules")
+    parser.add_argument("--json", dest="json_path", help="écrit aussi les résultats en JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode in args.modes.split(","):
+        results[mode] = run_mode(MODES[mode], args.readers, args.flooders,
+                                 args.duration, args.path, args.username)
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Route queries on tickets before and after partitioning (migration 0010).
+
+    python -m benchmarks.generate --tickets 50000000 --events 200000 --attendees 5000000 --chronological
+    flask --app index tickets-partition
+    flask --app index tickets-archive
+    python -m benchmarks.partitions --samples 500
+
+"Before" is tickets_legacy, the unpartitioned heap kept by the swap until
+``tickets-partition --drop-legacy``; "after" is tickets, whose archived
+partitions are no longer scanned or planned. The queries are those of
+view_event, register_event (first keyset page) and attendee_details, run
+for event and attendee ids drawn from the active tickets with a seeded
+RNG, alternating the two tables so caches warm up evenly. The report
+gives latencies, how many relations each plan reads and the size of each
+side.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import connect, percentile
+
+QUERIES = {
+    "view_event": ("event", """
+        SELECT a.* FROM attendees a
+        JOIN {tickets} t ON a.id = t.attendee_id
+        WHERE t.event_id = %s
+        ORDER BY a.name
+    """),
+    "register_event": ("event", """
+        SELECT a.* FROM attendees a
+        JOIN {tickets} t ON a.id = t.attendee_id
+        WHERE t.event_id = %s
+        ORDER BY a.name, a.id
+        LIMIT 21
+    """),
+    "attendee_details": ("attendee", """
+        SELECT e.* FROM events e
+        JOIN {tickets} t ON e.id = t.event_id
+        WHERE t.attendee_id = %s
+        ORDER BY e.date
+    """),
+}
+
+
+def _exists(cur, table):
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cur.fetchone()[0]
+
+
+def _sample(cur, column, count, rng):
+    # TABLESAMPLE ne s'applique pas à une table partitionnée : ids tirés dans
+    # l'intervalle puis ramenés au billet suivant.
+    cur.execute(f"SELECT MIN({column}), MAX({column}) FROM tickets")
+    low, high = cur.fetchone()
+    if low is None:
+        return []
+    ids = []
+    for _ in range(count):
+        cur.execute(f"SELECT {column} FROM tickets WHERE {column} >= %s ORDER BY {column} LIMIT 1",
+                    (rng.randint(low, high),))
+        ids.append(cur.fetchone()[0])
+    return ids
+
+
+def _relations(plan):
+    """Tables read by an EXPLAIN (FORMAT JSON) plan, index scans included"""
+    found = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            found.add(node["Relation Name"])
+        stack.extend(node.get("Plans", ()))
+    return found
+
+
+def _scanned(cur, sql, param, tickets):
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, (param,))
+    names = _relations(cur.fetchone()[0][0]["Plan"])
+    # Partitions (ou table non partitionnée) parcourues, hors autres tables.
+    return len({n for n in names if n == tickets or n.startswith("tickets_p") or n == "tickets_default"})
+
+
+def _sizes(cur):
+    cur.execute("""
+        SELECT 'tickets_legacy', pg_total_relation_size(to_regclass('tickets_legacy'))
+        UNION ALL
+        SELECT p.relname, SUM(pg_total_relation_size(i.inhrelid))::bigint
+        FROM pg_class p JOIN pg_inherits i ON i.inhparent = p.oid
+        WHERE p.relname IN ('tickets', 'tickets_archive') AND p.relkind = 'p'
+        GROUP BY p.relname
+    """)
+    return {name: size for name, size in cur.fetchall() if size is not None}
+
+
+def run(samples, seed=42):
+    rng = random.Random(seed)
+    conn = connect()
+    conn.autocommit = True
+    cur = conn.cursor()
+    tables = {"after": "tickets"}
+    if _exists(cur, "tickets_legacy"):
+        tables = {"before": "tickets_legacy", "after": "tickets"}
+    params = {
+        "event": _sample(cur, "event_id", samples, rng),
+        "attendee": _sample(cur, "attendee_id", samples, rng),
+    }
+
+    results = {}
+    for name, (kind, sql) in QUERIES.items():
+        timings = {side: [] for side in tables}
+        for value in params[kind]:
+            for side, table in tables.items():
+                start = time.perf_counter()
+                cur.execute(sql.format(tickets=table), (value,))
+                cur.fetchall()
+                timings[side].append(time.perf_counter() - start)
+        for side, table in tables.items():
+            values = sorted(timings[side])
+            results.setdefault(name, {})[side] = {
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "relations": _scanned(cur, sql.format(tickets=table), params[kind][0], table)
+                if values else 0,
+            }
+    sizes = _sizes(cur)
+    cur.close()
+    conn.close()
+    return {"samples": samples, "queries": results, "sizes": sizes}
+
+
+def print_report(results):
+    print(f"{'requête':<18} {'côté':<7} {'p50':>8} {'p95':>8} {'relations':>10}")
+    for name, sides in results["queries"].items():
+        for side, r in sides.items():
+            print(f"{name:<18} {side:<7} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['relations']:>10}")
+    print(f"latences en ms, {results['samples']} ids tirés par requête")
+    for name, size in results["sizes"].items():
+        print(f"{name:<16} {size / 2**20:>10.1f} Mo")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="écrit aussi les résultats en JSON")
+    args = parser.parse_args(argv)
+    results = run(args.samples, seed=args.seed)
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Worker startup and first-request latency, cold vs warmed up.
+
+    python -m benchmarks.startup --runs 10 --path /events
+    python -m benchmarks.startup --runs 10 --jinja-cache /tmp/sge-jinja
+
+Every run is a fresh interpreter, like a new gunicorn worker: it imports
+index.py, calls create_app() and serves --path twice through the test
+client. Runs alternate between WARMUP=0 and WARMUP=1, so the report shows
+what the warm-up moves from the first request to the boot. With
+--jinja-cache the bytecode cache is emptied first; the first warmed-up run
+fills it and the others only load bytecode.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from benchmarks.common import percentile
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from index import create_app
+imported = time.perf_counter()
+app = create_app({"HTTP_CACHE": False})
+ready = time.perf_counter()
+client = app.test_client()
+timings = []
+for _ in range(2):
+    start = time.perf_counter()
+    response = client.get(sys.argv[1])
+    response.get_data()
+    timings.append(time.perf_counter() - start)
+boot = app.extensions["startup"].snapshot()
+print(json.dumps({
+    "status": response.status_code,
+    "import": imported - started,
+    "create_app": ready - imported - (boot["warmup_s"] or 0.0),
+    "warmup": boot["warmup_s"] or 0.0,
+    "first_request": timings[0],
+    "second_request": timings[1],
+}))
+"""
+
+PHASES = ("import", "create_app", "warmup", "first_request", "second_request")
+
+
+def _run_child(path, warmup, jinja_cache):
+    env = dict(os.environ, WARMUP="1" if warmup else "0", JINJA_CACHE_DIR=jinja_cache or "")
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, path], env=env, check=True,
+        capture_output=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(runs, path, jinja_cache=None):
+    if jinja_cache:
+        shutil.rmtree(jinja_cache, ignore_errors=True)
+    samples = {False: [], True: []}
+    for i in range(runs * 2):
+        warmup = bool(i % 2)
+        samples[warmup].append(_run_child(path, warmup, jinja_cache))
+    return {
+        ("warmup" if warmup else "cold"): {
+            phase: {
+                "p50_ms": percentile(sorted(s[phase] for s in results), 50) * 1000,
+                "max_ms": max(s[phase] for s in results) * 1000,
+            }
+            for phase in PHASES
+        }
+        for warmup, results in samples.items()
+    }
+
+
+def print_report(results):
+    print(f"{'':<8}" + "".join(f"{phase:>22}" for phase in PHASES))
+    for mode, phases in results.items():
+        print(f"{mode:<8}" + "".join(
+            f"{phases[p]['p50_ms']:>12.1f} ({phases[p]['max_ms']:>6.1f})" for p in PHASES
+        ))
+    print("ms : p50 (max)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="démarrages par mode")
+    parser.add_argument("--path", default="/events", help="route de la première requête")
+    parser.add_argument("--jinja-cache", help="dossier du cache de bytecode Jinja (vidé au départ)")
+    parser.add_argument("--json", dest="json_path", help="écrit aussi les résultats en JSON")
+    args = parser.parse_args(argv)
+    results = run(args.runs, args.path, args.jinja_cache)
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Round trips and latency of each write path (database/writes.py).
+
+    python -m benchmarks.writes --iterations 200
+
+Each iteration runs the whole life of a throw-away organizer, attendee and
+event through writes.run, the way the routes call it: create, update
+(moving the event's date), register, unregister, then delete. Every
+mutation runs twice per iteration, once as the routes run it and once
+forced into an explicit transaction, so the report shows what the
+autocommit path saves. Statements are counted by the SQL instrumentation;
+round trips are those statements plus BEGIN and COMMIT when the write ran
+in a transaction. Exits non-zero when a single-statement write issued more
+than one statement.
+"""
+import argparse
+import datetime
+import json
+import sys
+import time
+import uuid
+
+from benchmarks.common import connect, percentile
+from database import capacity, instrumentation, writes
+
+MUTATIONS = (
+    "create_organizer", "create_attendee", "create_event", "update_organizer",
+    "update_attendee", "update_event", "register", "unregister",
+    "delete_event", "delete_attendee", "delete_organizer",
+)
+
+
+def _in_transaction(write):
+    # Même écriture, sans la marque single_statement : run() l'exécute entre
+    # BEGIN et COMMIT.
+    def transactional(cur, *args):
+        return write(cur, *args)
+    transactional.__name__ = write.__name__
+    return transactional
+
+
+def _iteration(conn, timed, date):
+    tag = uuid.uuid4().hex[:12]
+    organizer = timed("create_organizer", writes.create_organizer, f"Bench {tag}", f"{tag}@bench.invalid", "")
+    attendee = timed("create_attendee", writes.create_attendee, f"Bench {tag}", f"{tag}@bench.invalid", "")
+    event = timed("create_event", writes.create_event,
+                  f"Bench {tag}", date, "Benchmark", "Créé par benchmarks.writes", organizer, 10)
+    timed("update_organizer", writes.update_organizer, organizer, f"Bench {tag}", f"{tag}@bench.invalid", "1")
+    timed("update_attendee", writes.update_attendee, attendee, f"Bench {tag}", f"{tag}@bench.invalid", "1")
+    timed("update_event", writes.update_event, event,
+          f"Bench {tag}", date + datetime.timedelta(days=40), "Benchmark 2", "", organizer, 10)
+    timed("register", capacity.register, event, attendee)
+    timed("unregister", capacity.unregister, event, attendee)
+    timed("delete_event", writes.delete_event, event)
+    timed("delete_attendee", writes.delete_attendee, attendee)
+    timed("delete_organizer", writes.delete_organizer, organizer)
+
+
+def run(iterations):
+    stats = instrumentation.query_stats
+    conn = connect()
+    conn.cursor_factory = instrumentation.InstrumentedCursor
+    samples = {mode: {name: [] for name in MUTATIONS} for mode in ("routes", "transaction")}
+    statements = {mode: {} for mode in samples}
+    date = datetime.date.today() + datetime.timedelta(days=3650)
+
+    for mode in samples:
+        def timed(name, write, *args):
+            if mode == "transaction":
+                write = _in_transaction(write)
+            stats.reset()
+            start = time.perf_counter()
+            result = writes.run(conn, write, *args)
+            samples[mode][name].append(time.perf_counter() - start)
+            statements[mode][name] = (
+                sum(route["queries"] for route in stats.snapshot().values()),
+                getattr(write, "single_statement", False),
+            )
+            return result
+
+        for _ in range(iterations):
+            _iteration(conn, timed, date)
+    conn.close()
+
+    results = {}
+    for mode, by_name in samples.items():
+        for name, values in by_name.items():
+            values.sort()
+            count, autocommit = statements[mode][name]
+            results.setdefault(name, {})[mode] = {
+                "statements": count,
+                "round_trips": count if autocommit else count + 2,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+            }
+    return results
+
+
+def print_report(results):
+    print(f"{'écriture':<18} {'requêtes':>9} {'allers-retours':>15} {'p50':>8} {'p95':>8}"
+          f"   {'en transaction':>15} {'p50':>8} {'p95':>8}")
+    for name, modes in results.items():
+        r, t = modes["routes"], modes["transaction"]
+        print(f"{name:<18} {r['statements']:>9} {r['round_trips']:>15} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}"
+              f"   {t['round_trips']:>15} {t['p50_ms']:>8.2f} {t['p95_ms']:>8.2f}")
+    print("latences en ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", dest="json_path", help="écrit aussi les résultats en JSON")
+    args = parser.parse_args(argv)
+    results = run(args.iterations)
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    broken = [
+        name for name in MUTATIONS
+        if getattr(getattr(writes, name, None) or getattr(capacity, name, None), "single_statement", False)
+        and results[name]["routes"]["statements"] != 1
+    ]
+    if broken:
+        print("plus d'une requête pour : " + ", ".join(broken))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Application settings, read from the environment (and .env, see README).
+
+``from_env()`` returns the dict given to ``app.config``; create_app() in
+index.py applies it, then the caller's overrides (tests, benchmarks), then
+``check()``. The development defaults match the local setup of the README;
+with APP_ENV=production the secret key and database password must come
+from the environment.
+"""
+import os
+import tempfile
+
+DEV_SECRET_KEY = "super_secret_key"
+DEV_DB_PASSWORD = "root"
+
+
+def _flag(environ, name, default):
+    return environ.get(name, default) == "1"
+
+
+def from_env(environ=None):
+    env = os.environ if environ is None else environ
+    return dict(
+        # "development" ou "production"
+        APP_ENV=env.get("APP_ENV", "development"),
+        SECRET_KEY=env.get("FLASK_SECRET_KEY", DEV_SECRET_KEY),
+        # Base de données (primaire)
+        DB_HOST=env.get("DB_HOST", "localhost"),
+        DB_PORT=int(env.get("DB_PORT", 5432)),
+        DB_NAME=env.get("DB_NAME", "event_management"),
+        DB_USER=env.get("DB_USER", "postgres"),
+        DB_PASSWORD=env.get("DB_PASSWORD", DEV_DB_PASSWORD),
+        # Un pool borné par worker gunicorn ; la connexion est rendue au teardown.
+        DB_POOL_MIN=int(env.get("DB_POOL_MIN", 1)),
+        DB_POOL_MAX=int(env.get("DB_POOL_MAX", 10)),
+        DB_POOL_TIMEOUT=float(env.get("DB_POOL_TIMEOUT", 5)),
+        DB_POOL_MAX_IDLE=float(env.get("DB_POOL_MAX_IDLE", 300)),
+        DB_POOL_MAX_LIFETIME=float(env.get("DB_POOL_MAX_LIFETIME", 3600)),
+        # Âge maximal (secondes) des tables de statistiques avant reconstruction
+        STATS_MAX_STALENESS=float(env.get("STATS_MAX_STALENESS", 300)),
+        # Dossier des fichiers de rejet produits par les imports CSV
+        IMPORT_REJECT_DIR=env.get("IMPORT_REJECT_DIR", tempfile.gettempdir()),
+        # Cache des utilisateurs connectés (load_user)
+        USER_CACHE_SIZE=int(env.get("USER_CACHE_SIZE", 1024)),
+        USER_CACHE_TTL=float(env.get("USER_CACHE_TTL", 60)),
+        USER_CACHE_REDIS_URL=env.get("USER_CACHE_REDIS_URL"),
+        USER_CACHE_SHARED_TTL=int(env.get("USER_CACHE_SHARED_TTL", 300)),
+        # Instrumentation SQL par route (/admin/sql, /metrics)
+        SQL_INSTRUMENTATION=_flag(env, "SQL_INSTRUMENTATION", "1"),
+        # Au-delà de ce seuil (ms), la requête est journalisée avec son plan EXPLAIN
+        SQL_SLOW_QUERY_MS=float(env.get("SQL_SLOW_QUERY_MS", 200)),
+        # Pages publiques : ETag / 304 et cache des fragments HTML rendus
+        HTTP_CACHE=_flag(env, "HTTP_CACHE", "1"),
+        HTTP_FRAGMENT_CACHE_SIZE=int(env.get("HTTP_FRAGMENT_CACHE_SIZE", 512)),
+        HTTP_FRAGMENT_CACHE_TTL=float(env.get("HTTP_FRAGMENT_CACHE_TTL", 300)),
+        # Durée (s) pendant laquelle un CDN peut servir une page publique sans revalider
+        HTTP_CDN_MAX_AGE=int(env.get("HTTP_CDN_MAX_AGE", 60)),
+        # Réplicas en lecture (DSN séparés par « ; »), ex. "host=replica1;host=replica2 port=5433"
+        DB_REPLICAS=env.get("DB_REPLICAS", ""),
+        # Au-delà de ce retard de rejeu (s), un réplica est écarté jusqu'au contrôle suivant
+        DB_REPLICA_MAX_LAG=float(env.get("DB_REPLICA_MAX_LAG", 5)),
+        DB_REPLICA_CHECK_INTERVAL=float(env.get("DB_REPLICA_CHECK_INTERVAL", 5)),
+        # Après une écriture, la session lit sur le primaire pendant ce délai (s)
+        DB_STICKY_SECONDS=float(env.get("DB_STICKY_SECONDS", 5)),
+        # Envoi des e-mails par les workers (flask jobs-worker) : "smtp" ou "file"
+        MAIL_BACKEND=env.get("MAIL_BACKEND", "file"),
+        MAIL_FROM=env.get("MAIL_FROM", "noreply@sge.local"),
+        MAIL_OUTBOX_DIR=env.get("MAIL_OUTBOX_DIR", os.path.join(tempfile.gettempdir(), "sge-outbox")),
+        SMTP_HOST=env.get("SMTP_HOST", "localhost"),
+        SMTP_PORT=int(env.get("SMTP_PORT", 25)),
+        SMTP_USERNAME=env.get("SMTP_USERNAME"),
+        SMTP_PASSWORD=env.get("SMTP_PASSWORD"),
+        SMTP_STARTTLS=_flag(env, "SMTP_STARTTLS", "0"),
+        # Conservation (s) des tâches terminées avant purge
+        JOBS_RETENTION=float(env.get("JOBS_RETENTION", 86400)),
+        # Limites de connexion « tentatives/secondes » (vide ou 0 = désactivée) :
+        # par IP pour toute tentative, par nom d'utilisateur pour les échecs
+        LOGIN_RATE_IP=env.get("LOGIN_RATE_IP", "20/60"),
+        LOGIN_RATE_USER=env.get("LOGIN_RATE_USER", "5/300"),
+        # Seaux partagés entre workers ; sinon par worker
+        LOGIN_RATE_REDIS_URL=env.get("LOGIN_RATE_REDIS_URL"),
+        # Reverse proxies de confiance devant l'application (0 = aucun) : l'IP
+        # du client est lue dans X-Forwarded-For, sur ce nombre de sauts
+        PROXY_FIX=int(env.get("PROXY_FIX", 0)),
+        # Vérifications de mot de passe simultanées par worker (0 = dans le thread
+        # de la requête), en attente au-delà desquelles la connexion répond 429
+        LOGIN_HASH_WORKERS=int(env.get("LOGIN_HASH_WORKERS", 1)),
+        LOGIN_HASH_QUEUE=int(env.get("LOGIN_HASH_QUEUE", 4)),
+        LOGIN_HASH_TIMEOUT=float(env.get("LOGIN_HASH_TIMEOUT", 5)),
+        # Au démarrage d'un worker : ouvre le pool et compile les templates
+        WARMUP=_flag(env, "WARMUP", "0"),
+        # Cache du bytecode Jinja partagé entre workers et redémarrages ; vide = désactivé
+        JINJA_CACHE_DIR=env.get("JINJA_CACHE_DIR", ""),
+        # Flux de changements (/changes) : durée max d'un flux avant que le
+        # navigateur ne se reconnecte, intervalle des commentaires keepalive,
+        # changements gardés en mémoire par worker pour les reprises, file
+        # par abonné avant reset, conservation (s) de la table change_feed
+        CHANGES_STREAM_SECONDS=float(env.get("CHANGES_STREAM_SECONDS", 300)),
+        # Flux tenu ouvert : "auto" (seulement si le serveur sert les requêtes
+        # en threads ou greenlets : gthread, gevent), "1" toujours, "0" jamais.
+        # Sinon chaque requête /changes rend ce qui a changé et le navigateur
+        # revient après CHANGES_POLL_INTERVAL secondes.
+        CHANGES_STREAM=env.get("CHANGES_STREAM", "auto"),
+        CHANGES_POLL_INTERVAL=float(env.get("CHANGES_POLL_INTERVAL", 10)),
+        CHANGES_HEARTBEAT=float(env.get("CHANGES_HEARTBEAT", 15)),
+        CHANGES_BUFFER=int(env.get("CHANGES_BUFFER", 1000)),
+        CHANGES_QUEUE=int(env.get("CHANGES_QUEUE", 256)),
+        CHANGES_RETENTION=float(env.get("CHANGES_RETENTION", 86400)),
+        # Billets partitionnés (migration 0010) : plages créées d'avance par
+        # le worker de tâches, âge (jours) des événements dont les partitions
+        # sont archivées, tablespace d'archive (vide = celui de la base)
+        TICKETS_PARTITIONS_AHEAD=int(env.get("TICKETS_PARTITIONS_AHEAD", 2)),
+        TICKETS_ARCHIVE_DAYS=int(env.get("TICKETS_ARCHIVE_DAYS", 365)),
+        TICKETS_ARCHIVE_TABLESPACE=env.get("TICKETS_ARCHIVE_TABLESPACE", ""),
+    )
+
+
+def check(config):
+    """Refuse to run in production with the development secrets"""
+    if config["APP_ENV"] != "production":
+        return
+    missing = [
+        env_name for name, env_name, dev_value in (
+            ("SECRET_KEY", "FLASK_SECRET_KEY", DEV_SECRET_KEY),
+            ("DB_PASSWORD", "DB_PASSWORD", DEV_DB_PASSWORD),
+        )
+        if config[name] == dev_value
+    ]
+    if missing:
+        raise RuntimeError(
+            "APP_ENV=production: set " + ", ".join(missing) + " in the environment"
+        )
+
+
+def connection_params(config):
+    """psycopg2.connect() keyword arguments for the primary"""
+    return {
+        "host": config["DB_HOST"],
+        "port": config["DB_PORT"],
+        "database": config["DB_NAME"],
+        "user": config["DB_USER"],
+        "password": config["DB_PASSWORD"],
+    }
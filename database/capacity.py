@@ -0,0 +1,357 @@
+"""Event capacity, seat counters and the waitlist.
+
+Each event has one event_seats row. Registering locks and bumps that row,
+so concurrent registrations for the same event queue up on a single row
+lock instead of racing a COUNT(*) over tickets. The lock is held only
+until the caller commits. Registrations for other events are unaffected.
+Every function runs inside the caller's transaction; the caller commits.
+register and unregister are single statements (see database/writes.py),
+so in autocommit mode the lock lasts one round trip.
+"""
+from database import jobs, stats, versions, writes
+
+REGISTERED = "registered"
+WAITLISTED = "waitlisted"
+ALREADY_REGISTERED = "already_registered"
+ALREADY_WAITLISTED = "already_waitlisted"
+
+
+def _claim(cur, event_id, count, respect_queue=True, attendee_id=None):
+    """Take up to ``count`` seats. Returns the number taken, None if no event.
+
+    With ``respect_queue``, nothing is granted while people are waiting: a
+    freed seat belongs to the head of the waitlist, not to whoever asks first.
+    With ``attendee_id``, None is also returned when that attendee does not
+    exist; otherwise their row stays key-share locked until the caller
+    commits, so the ticket insert that follows cannot trip the foreign key.
+    """
+    for _ in range(2):
+        cur.execute("""
+            WITH attendee AS (
+                SELECT %s::int IS NULL
+                       OR EXISTS (SELECT 1 FROM attendees WHERE id = %s FOR KEY SHARE) AS ok
+            ), g AS (
+                SELECT s.event_id,
+                       CASE
+                           WHEN %s AND EXISTS (SELECT 1 FROM waitlist w WHERE w.event_id = s.event_id)
+                               THEN 0
+                           ELSE LEAST(%s, COALESCE(e.capacity - s.taken, %s))
+                       END AS granted
+                FROM event_seats s
+                JOIN events e ON e.id = s.event_id
+                WHERE s.event_id = %s AND (SELECT ok FROM attendee)
+                FOR UPDATE OF s
+            ), claimed AS (
+                UPDATE event_seats s
+                SET taken = s.taken + g.granted
+                FROM g
+                WHERE s.event_id = g.event_id AND g.granted > 0
+            )
+            SELECT (SELECT GREATEST(granted, 0) FROM g),
+                   EXISTS (SELECT 1 FROM events WHERE id = %s),
+                   (SELECT ok FROM attendee)
+        """, (attendee_id, attendee_id, respect_queue, count, count, event_id, event_id))
+        granted, event_exists, attendee_exists = cur.fetchone()
+        if not attendee_exists:
+            return None
+        if granted is not None:
+            return granted
+        if not event_exists:
+            return None
+        # Événement créé hors de l'application (import, générateur) : on
+        # crée son compteur à partir des billets existants et on réessaie.
+        cur.execute("""
+            INSERT INTO event_seats (event_id, taken)
+            SELECT %s, COUNT(*) FROM tickets_history WHERE event_id = %s
+            ON CONFLICT (event_id) DO NOTHING
+        """, (event_id, event_id))
+    return 0
+
+
+def release(cur, event_id, count):
+    cur.execute(
+        "UPDATE event_seats SET taken = GREATEST(taken - %s, 0) WHERE event_id = %s",
+        (count, event_id)
+    )
+
+
+def _ticket_effects(changed, sign):
+    """CTEs applying stats and cache version for ``changed`` (event_id rows
+    of tickets of %(attendee_id)s); same effects as stats.tickets_added (or their
+    inverse)
+    and versions.bump, inside the statement that writes the ticket"""
+    return f"""
+    ticket_stats AS (
+        UPDATE stats_event_tickets SET ticket_count = ticket_count + {sign}1
+        WHERE event_id IN (SELECT event_id FROM {changed})
+    ),
+    -- Un participant ne compte qu'une fois par tranche : pas s'il a un autre
+    -- billet pour un événement du même jour / de la même semaine / du même mois.
+    buckets AS (
+        INSERT INTO stats_attendee_buckets (unit, bucket, attendees, tickets)
+        SELECT b.unit, b.bucket,
+               CASE WHEN EXISTS (
+                   SELECT 1 FROM tickets_history t
+                   JOIN events e2 ON e2.id = t.event_id
+                   WHERE t.attendee_id = %(attendee_id)s
+                     AND e2.id <> b.event_id
+                     AND e2.date >= b.bucket
+                     AND e2.date < b.bucket_end
+               ) THEN 0 ELSE {sign}1 END,
+               {sign}1
+        FROM (
+            SELECT e.id AS event_id, u.unit, date_trunc(u.unit, e.date)::date AS bucket,
+                   (date_trunc(u.unit, e.date) + ('1 ' || u.unit)::interval)::date AS bucket_end
+            FROM {changed} c
+            JOIN events e ON e.id = c.event_id, unnest(%(units)s::text[]) AS u(unit)
+        ) b
+        ON CONFLICT (unit, bucket)
+        DO UPDATE SET attendees = stats_attendee_buckets.attendees + EXCLUDED.attendees,
+                      tickets = stats_attendee_buckets.tickets + EXCLUDED.tickets
+    )"""
+
+
+def _bump_event(sources):
+    return f"""
+    bumped AS (
+        INSERT INTO cache_versions (scope, version, updated_at)
+        SELECT %(scope)s, 1, clock_timestamp()
+        WHERE {" OR ".join(f"EXISTS (SELECT 1 FROM {source})" for source in sources)}
+        ON CONFLICT (scope) DO UPDATE
+        SET version = cache_versions.version + 1,
+            updated_at = GREATEST(cache_versions.updated_at, clock_timestamp())
+    )"""
+
+
+@writes.single_statement
+def register(cur, event_id, attendee_id):
+    """Register one attendee, or put them on the waitlist when the event is full.
+
+    Returns one of the status constants above, or None when the event or
+    the attendee does not exist. One statement: the seat claim, the ticket
+    or waitlist row, the stats, the cache version and the confirmation job
+    are CTEs of it, so the event_seats row lock lasts one round trip. An
+    event created outside the application first gets its seat row, once.
+    """
+    params = {
+        "event_id": event_id, "attendee_id": attendee_id, "units": list(stats.UNITS),
+        "scope": versions.event(event_id), "job_kind": jobs.REGISTRATION_CONFIRMATION,
+        "channel": jobs.CHANNEL,
+    }
+    for _ in range(2):
+        cur.execute(f"""
+            WITH attendee AS (
+                SELECT EXISTS (SELECT 1 FROM attendees WHERE id = %(attendee_id)s FOR KEY SHARE) AS ok
+            ), g AS (
+                -- Personne ne passe devant la liste d'attente. Capacité
+                -- abaissée sous les places prises : 0, pas un nombre négatif.
+                SELECT s.event_id,
+                       CASE
+                           WHEN EXISTS (SELECT 1 FROM waitlist w WHERE w.event_id = s.event_id) THEN 0
+                           ELSE GREATEST(LEAST(1, COALESCE(e.capacity - s.taken, 1)), 0)
+                       END AS granted
+                FROM event_seats s
+                JOIN events e ON e.id = s.event_id
+                WHERE s.event_id = %(event_id)s AND (SELECT ok FROM attendee)
+                FOR UPDATE OF s
+            ), inserted AS (
+                -- Billet d'une plage archivée : la clé unique de tickets ne
+                -- couvre pas tickets_archive (contrôlé par le trigger de 0013).
+                INSERT INTO tickets (event_id, attendee_id)
+                SELECT event_id, %(attendee_id)s FROM g
+                WHERE granted > 0 AND NOT EXISTS (
+                    SELECT 1 FROM tickets_archive a
+                    WHERE a.event_id = g.event_id AND a.attendee_id = %(attendee_id)s
+                )
+                ON CONFLICT (event_id, attendee_id) DO NOTHING
+                RETURNING event_id
+            ), claimed AS (
+                -- Place prise seulement si le billet a été créé : un doublon
+                -- ne la consomme pas.
+                UPDATE event_seats s SET taken = s.taken + 1
+                FROM inserted WHERE s.event_id = inserted.event_id
+            ), dequeued AS (
+                DELETE FROM waitlist
+                WHERE event_id = %(event_id)s AND attendee_id = %(attendee_id)s
+                  AND EXISTS (SELECT 1 FROM inserted)
+            ), waitlisted AS (
+                INSERT INTO waitlist (event_id, attendee_id)
+                SELECT g.event_id, %(attendee_id)s FROM g
+                WHERE g.granted = 0 AND NOT EXISTS (
+                    SELECT 1 FROM tickets_history t WHERE t.event_id = g.event_id AND t.attendee_id = %(attendee_id)s
+                )
+                ON CONFLICT (event_id, attendee_id) DO NOTHING
+                RETURNING event_id
+            ),
+            {_ticket_effects("inserted", "")},
+            {_bump_event(("inserted", "waitlisted"))},
+            queued AS (
+                INSERT INTO jobs (kind, payload)
+                SELECT %(job_kind)s, jsonb_build_object('event_id', event_id, 'attendee_id', %(attendee_id)s)
+                FROM inserted
+                RETURNING id
+            ),
+            -- Un CTE en lecture seule n'est évalué que s'il est référencé.
+            notified AS (
+                SELECT pg_notify(%(channel)s, '') FROM queued LIMIT 1
+            )
+            SELECT (SELECT granted FROM g),
+                   EXISTS (SELECT 1 FROM events WHERE id = %(event_id)s),
+                   (SELECT ok FROM attendee),
+                   EXISTS (SELECT 1 FROM inserted),
+                   EXISTS (SELECT 1 FROM waitlisted),
+                   EXISTS (SELECT 1 FROM tickets_history WHERE event_id = %(event_id)s AND attendee_id = %(attendee_id)s),
+                   (SELECT COUNT(*) FROM notified)
+        """, params)
+        granted, event_exists, attendee_exists, inserted, waitlisted, has_ticket, _ = cur.fetchone()
+        if not attendee_exists:
+            return None
+        if granted is not None:
+            break
+        if not event_exists:
+            return None
+        # Événement créé hors de l'application (import, générateur) : on
+        # crée son compteur à partir des billets existants et on réessaie.
+        cur.execute("""
+            INSERT INTO event_seats (event_id, taken)
+            SELECT %s, COUNT(*) FROM tickets_history WHERE event_id = %s
+            ON CONFLICT (event_id) DO NOTHING
+        """, (event_id, event_id))
+    else:
+        return None
+
+    if inserted:
+        return REGISTERED
+    if waitlisted:
+        return WAITLISTED
+    # Billet concurrent validé après l'instantané : le conflit l'a vu.
+    if granted or has_ticket:
+        return ALREADY_REGISTERED
+    return ALREADY_WAITLISTED
+
+
+@writes.single_statement
+def unregister(cur, event_id, attendee_id):
+    """Delete the ticket and free its seat, in one statement.
+
+    Returns (removed, has_waitlist); when both are true the caller should
+    hand the event to the promoter once it has committed.
+    """
+    cur.execute(f"""
+        WITH removed AS (
+            DELETE FROM tickets WHERE event_id = %(event_id)s AND attendee_id = %(attendee_id)s
+            RETURNING event_id
+        ), freed AS (
+            UPDATE event_seats SET taken = GREATEST(taken - 1, 0)
+            WHERE event_id IN (SELECT event_id FROM removed)
+        ),
+        {_ticket_effects("removed", "-")},
+        {_bump_event(("removed",))}
+        SELECT EXISTS (SELECT 1 FROM removed),
+               EXISTS (SELECT 1 FROM waitlist WHERE event_id = %(event_id)s)
+    """, {
+        "event_id": event_id, "attendee_id": attendee_id, "units": list(stats.UNITS),
+        "scope": versions.event(event_id),
+    })
+    return cur.fetchone()
+
+
+def promote(cur, event_id, limit=100):
+    """Move waitlisted attendees into free seats, oldest first.
+
+    Returns the promoted attendee ids. Entries whose attendee got a ticket
+    some other way are dropped without using a seat.
+    """
+    granted = _claim(cur, event_id, limit, respect_queue=False)
+    if not granted:
+        return []
+
+    remaining, promoted = granted, []
+    while remaining:
+        cur.execute("""
+            WITH next AS (
+                SELECT id FROM waitlist
+                WHERE event_id = %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ), popped AS (
+                DELETE FROM waitlist w USING next
+                WHERE w.id = next.id
+                RETURNING w.attendee_id
+            ), inserted AS (
+                INSERT INTO tickets (event_id, attendee_id)
+                SELECT %s, p.attendee_id FROM popped p
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM tickets_archive a WHERE a.event_id = %s AND a.attendee_id = p.attendee_id
+                )
+                ON CONFLICT (event_id, attendee_id) DO NOTHING
+                RETURNING attendee_id
+            )
+            SELECT (SELECT COUNT(*) FROM popped),
+                   COALESCE((SELECT array_agg(attendee_id) FROM inserted), '{}')
+        """, (event_id, remaining, event_id, event_id))
+        popped, inserted = cur.fetchone()
+        promoted.extend(inserted)
+        remaining -= len(inserted)
+        if not popped:
+            break
+
+    if remaining:
+        release(cur, event_id, remaining)
+    if promoted:
+        stats.tickets_added(cur, event_id, promoted)
+        versions.bump(cur, versions.event(event_id))
+        jobs.registered(cur, event_id, promoted)
+    return promoted
+
+
+def claim_for_bulk(cur, event_id, attendee_ids):
+    """Seats for a bulk registration: returns (granted, overflow) id lists"""
+    granted = _claim(cur, event_id, len(attendee_ids)) if attendee_ids else 0
+    granted = granted or 0
+    return attendee_ids[:granted], attendee_ids[granted:]
+
+
+def enqueue(cur, event_id, attendee_ids):
+    """Append attendees to the waitlist; returns how many were added"""
+    if not attendee_ids:
+        return 0
+    cur.execute("""
+        INSERT INTO waitlist (event_id, attendee_id)
+        SELECT %s, id FROM unnest(%s::int[]) WITH ORDINALITY AS r(id, position)
+        ORDER BY position
+        ON CONFLICT (event_id, attendee_id) DO NOTHING
+    """, (event_id, list(attendee_ids)))
+    return cur.rowcount
+
+
+def resync(cur):
+    """Recount every event's seats from tickets (after a bulk COPY, say)"""
+    cur.execute("""
+        INSERT INTO event_seats (event_id, taken)
+        SELECT e.id, COUNT(t.id)
+        FROM events e
+        LEFT JOIN tickets_history t ON t.event_id = e.id
+        GROUP BY e.id
+        ON CONFLICT (event_id) DO UPDATE SET taken = EXCLUDED.taken
+    """)
+
+
+def events_with_waitlist(cur):
+    cur.execute("SELECT DISTINCT event_id FROM waitlist")
+    return [row[0] for row in cur.fetchall()]
+
+
+def seat_summary(cur, event_id):
+    cur.execute("""
+        SELECT e.capacity, COALESCE(s.taken, 0),
+               (SELECT COUNT(*) FROM waitlist w WHERE w.event_id = e.id)
+        FROM events e
+        LEFT JOIN event_seats s ON s.event_id = e.id
+        WHERE e.id = %s
+    """, (event_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return {"capacity": row[0], "taken": row[1], "waitlisted": row[2]}
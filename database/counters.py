@@ -0,0 +1,66 @@
+"""Check and repair the denormalized counters (migration 0007).
+
+The triggers keep events.ticket_count, attendees.event_count and
+organizers.event_count exact in normal operation; this is the safety net
+for anything that bypassed them (triggers disabled for a bulk load,
+session_replication_role = replica, manual fixes). The scan runs in id
+ranges, one short transaction per range, so it never holds many row
+locks. A range is locked in id order before it is counted: a concurrent
+registration either committed before (and is counted) or waits and then
+applies its own increment on top of the repaired value.
+"""
+
+# table, colonne, table comptée (billets archivés compris), clé étrangère
+COUNTERS = (
+    ("events", "ticket_count", "tickets_history", "event_id"),
+    ("attendees", "event_count", "tickets_history", "attendee_id"),
+    ("organizers", "event_count", "events", "organizer_id"),
+)
+
+
+def _ranges(cur, table, batch):
+    cur.execute(f"SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), -1) FROM {table}")
+    low, high = cur.fetchone()
+    for start in range(low, high + 1, batch):
+        yield start, start + batch - 1
+
+
+def reconcile(conn, repair=False, batch=10000):
+    """Return {"table.column": [(id, stored, actual), ...]}, fixing them if asked.
+
+    Commits after each range when ``repair`` is set, rolls back otherwise.
+    """
+    drift = {}
+    cur = conn.cursor()
+    for table, column, source, key in COUNTERS:
+        found = drift.setdefault(f"{table}.{column}", [])
+        for start, end in list(_ranges(cur, table, batch)):
+            if repair:
+                cur.execute(
+                    f"SELECT id FROM {table} WHERE id BETWEEN %s AND %s ORDER BY id FOR UPDATE",
+                    (start, end)
+                )
+            cur.execute(f"""
+                SELECT x.id, x.{column}, COALESCE(c.n, 0)
+                FROM {table} x
+                LEFT JOIN (
+                    SELECT {key} AS id, COUNT(*) AS n FROM {source}
+                    WHERE {key} BETWEEN %s AND %s
+                    GROUP BY {key}
+                ) c ON c.id = x.id
+                WHERE x.id BETWEEN %s AND %s AND x.{column} <> COALESCE(c.n, 0)
+            """, (start, end, start, end))
+            rows = cur.fetchall()
+            found.extend(rows)
+            if repair and rows:
+                cur.execute(f"""
+                    UPDATE {table} x SET {column} = f.actual
+                    FROM unnest(%s::int[], %s::int[]) AS f(id, actual)
+                    WHERE x.id = f.id
+                """, ([row[0] for row in rows], [row[2] for row in rows]))
+            if repair:
+                conn.commit()
+            else:
+                conn.rollback()
+    cur.close()
+    return drift
@@ -0,0 +1,136 @@
+"""EXPLAIN-based regression check for the route queries in index.py.
+
+Each query below mirrors the statement a route runs on its hot path. The
+check fails when a plan contains a sequential scan on a table with at least
+``min_rows`` rows. With ``strict=True`` the planner is told to avoid seq
+scans (enable_seqscan = off), which makes the check meaningful on a small
+database: a seq scan that survives that setting means no usable index.
+"""
+import json
+
+ROUTE_QUERIES = [
+    ("index", """
+        SELECT e.id, e.name, e.date, e.location, e.description, o.name AS organizer
+        FROM events e
+        JOIN organizers o ON e.organizer_id = o.id
+        ORDER BY e.date ASC, e.id ASC
+        LIMIT 6
+    """, ()),
+    ("events", """
+        SELECT e.*, o.name as organizer_name
+        FROM events e
+        LEFT JOIN organizers o ON e.organizer_id = o.id
+        WHERE (e.date, e.id) < ('2024-12-01', 1000)
+        ORDER BY e.date DESC, e.id DESC
+        LIMIT 11
+    """, ()),
+    ("view_event", """
+        SELECT a.* FROM attendees a
+        JOIN tickets t ON a.id = t.attendee_id
+        WHERE t.event_id = %s
+        ORDER BY a.name
+    """, (1,)),
+    ("organizers", """
+        SELECT o.id, o.name, o.email, o.phone, o.created_at, o.event_count
+        FROM organizers o
+        WHERE (o.name, o.id) > ('M', 0)
+        ORDER BY o.name ASC, o.id ASC
+        LIMIT 11
+    """, ()),
+    ("delete_organizer", "SELECT event_count FROM organizers WHERE id = %s", (1,)),
+    ("attendees", """
+        SELECT a.id, a.name, a.email, a.phone, a.created_at, a.event_count
+        FROM attendees a
+        WHERE (a.name, a.id) > ('M', 0)
+        ORDER BY a.name ASC, a.id ASC
+        LIMIT 11
+    """, ()),
+    ("attendee_details", """
+        SELECT e.* FROM events e
+        JOIN tickets t ON e.id = t.event_id
+        WHERE t.attendee_id = %s
+        ORDER BY e.date
+    """, (1,)),
+    ("delete_attendee", "SELECT event_count FROM attendees WHERE id = %s", (1,)),
+    ("register_event", """
+        SELECT a.* FROM attendees a
+        JOIN tickets t ON a.id = t.attendee_id
+        WHERE t.event_id = %s AND TRUE
+        ORDER BY a.name ASC, a.id ASC
+        LIMIT 21
+    """, (1,)),
+    ("available_attendees", """
+        SELECT a.id, a.name, a.email FROM attendees a
+        WHERE (lower(a.name) LIKE %s OR lower(a.email) LIKE %s)
+          AND NOT EXISTS (
+              SELECT 1 FROM tickets t
+              WHERE t.event_id = %s AND t.attendee_id = a.id
+          )
+        ORDER BY a.name ASC, a.id ASC
+        LIMIT 21
+    """, ("ali%", "ali%", 1)),
+    ("search", """
+        SELECT d.kind, d.ref_id, d.title, d.subtitle,
+               GREATEST(
+                   ts_rank(d.document, to_tsquery('simple', %s)),
+                   word_similarity(%s, d.title)
+               )::float8 AS score
+        FROM search_documents d
+        WHERE d.kind = ANY(%s)
+          AND (d.document @@ to_tsquery('simple', %s) OR %s <%% d.title)
+        ORDER BY score DESC, d.kind DESC, d.ref_id DESC
+        LIMIT 21
+    """, ("paris:*", "paris", ["event", "attendee", "organizer"], "paris:*", "paris")),
+    ("api_v1 ids", """
+        SELECT e.id AS id, e.name AS name, o.name AS organizer_name
+        FROM events e LEFT JOIN organizers o ON o.id = e.organizer_id
+        WHERE e.id = ANY(%s)
+    """, ([1, 2, 3],)),
+    ("api_v1 tickets", """
+        SELECT t.id AS id, t.attendee_id AS attendee_id FROM tickets t
+        WHERE t.event_id = %s AND t.id > %s
+        ORDER BY t.id ASC
+        LIMIT 51
+    """, (1, 0)),
+]
+
+
+def _seq_scans(plan):
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+def _table_sizes(cur):
+    cur.execute("""
+        SELECT c.relname, c.reltuples::bigint
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()
+    """)
+    return dict(cur.fetchall())
+
+
+def check(conn, min_rows=10000, strict=False):
+    """Return [(route, table, rows)] for every offending seq scan"""
+    cur = conn.cursor()
+    if strict:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        min_rows = 0
+    sizes = _table_sizes(cur)
+
+    failures = []
+    for route, sql, params in ROUTE_QUERIES:
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        for table in _seq_scans(plan[0]["Plan"]):
+            rows = sizes.get(table, 0)
+            if rows >= min_rows:
+                failures.append((route, table, rows))
+
+    conn.rollback()
+    cur.close()
+    return failures
@@ -0,0 +1,89 @@
+import csv
+import io
+import itertools
+import json
+
+BATCH_SIZE = 2000
+
+EXPORTS = {
+    "events": """
+        SELECT e.id, e.name, e.date, e.location, e.description,
+               e.organizer_id, o.name AS organizer_name, e.created_at
+        FROM events e
+        LEFT JOIN organizers o ON e.organizer_id = o.id
+        ORDER BY e.id
+    """,
+    "attendees": """
+        SELECT id, name, email, phone, created_at
+        FROM attendees
+        ORDER BY id
+    """,
+    "organizers": """
+        SELECT id, name, email, phone, created_at
+        FROM organizers
+        ORDER BY id
+    """,
+    "tickets": """
+        SELECT t.id, t.event_id, t.attendee_id, a.name, a.email, a.phone,
+               t.registered_at
+        FROM tickets_history t
+        JOIN attendees a ON a.id = t.attendee_id
+        WHERE t.event_id = %s
+        ORDER BY t.id
+    """,
+}
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def iter_batches(conn, sql, params=(), batch_size=BATCH_SIZE):
+    """Yield the column names, then lists of rows, from a server-side cursor.
+
+    A named cursor keeps the result set in Postgres; only ``batch_size`` rows
+    are in Python memory at a time. The connection is released when the
+    generator finishes or is closed (client disconnect).
+    """
+    cur = conn.cursor(name="export")
+    cur.itersize = batch_size
+    try:
+        cur.execute(sql, params)
+        batch = cur.fetchmany(batch_size)
+        yield [col[0] for col in cur.description]
+        while batch:
+            yield batch
+            batch = cur.fetchmany(batch_size)
+    finally:
+        cur.close()
+        conn.rollback()
+        conn.close()
+
+
+def _csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in itertools.chain([[]], batches):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _ndjson_chunks(columns, batches):
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + "\n"
+            for row in batch
+        )
+
+
+def stream(conn, kind, fmt, params=()):
+    """Chunks of ``kind`` serialized as ``fmt`` ("csv" or "ndjson")"""
+    batches = iter_batches(conn, EXPORTS[kind], params)
+    columns = next(batches)
+    if fmt == "csv":
+        return _csv_chunks(columns, batches)
+    return _ndjson_chunks(columns, batches)
@@ -0,0 +1,209 @@
+"""CSV import pipeline: COPY into a staging table, validate in SQL, upsert.
+
+Rows are never parsed in Python: the file is streamed to Postgres with
+COPY FROM STDIN, validation and de-duplication are single set-based
+statements, and rejected rows are streamed back out with COPY TO STDOUT.
+"""
+import csv
+
+from database import stats, versions
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+DATE_PATTERN = r'^\d{4}-\d{2}-\d{2}$'
+
+COLUMNS = {
+    "attendees": ("name", "email", "phone"),
+    "events": ("name", "date", "location", "description", "organizer_id"),
+}
+REQUIRED = {
+    "attendees": ("name", "email"),
+    "events": ("name", "date", "location", "organizer_id"),
+}
+
+
+class CSVImportError(Exception):
+    """The file itself is unusable (missing or unknown columns)"""
+
+
+def _read_header(fileobj, kind):
+    header_line = fileobj.readline()
+    header = [col.strip().lower() for col in next(csv.reader([header_line]), [])]
+    unknown = [col for col in header if col not in COLUMNS[kind]]
+    missing = [col for col in REQUIRED[kind] if col not in header]
+    if unknown or missing:
+        raise CSVImportError(
+            f"colonnes inconnues: {', '.join(unknown) or '-'} ; "
+            f"colonnes manquantes: {', '.join(missing) or '-'}"
+        )
+    return header
+
+
+def _stage(cur, fileobj, kind):
+    header = _read_header(fileobj, kind)
+    columns = ", ".join(f"{col} TEXT" for col in COLUMNS[kind])
+    # line suit l'ordre du COPY : numéro de ligne dans le fichier source
+    # (en-tête non compris).
+    cur.execute(f"""
+        CREATE TEMP TABLE staging_{kind} (
+            line BIGSERIAL,
+            {columns},
+            reason TEXT
+        ) ON COMMIT DROP
+    """)
+    cur.copy_expert(
+        f"COPY staging_{kind} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv)",
+        fileobj
+    )
+
+
+def _write_rejects(cur, kind, reject_file):
+    cur.execute(f"SELECT COUNT(*) FROM staging_{kind} WHERE reason IS NOT NULL")
+    rejected = cur.fetchone()[0]
+    if rejected and reject_file is not None:
+        cur.copy_expert(f"""
+            COPY (
+                SELECT line + 1 AS line, {', '.join(COLUMNS[kind])}, reason
+                FROM staging_{kind} WHERE reason IS NOT NULL ORDER BY line
+            ) TO STDOUT WITH (FORMAT csv, HEADER true)
+        """, reject_file)
+    return rejected
+
+
+def import_attendees(conn, fileobj, reject_file=None):
+    """Upsert attendees by email. Returns counts; commits on success."""
+    cur = conn.cursor()
+    _stage(cur, fileobj, "attendees")
+
+    cur.execute("""
+        UPDATE staging_attendees SET
+            name = NULLIF(btrim(name), ''),
+            email = NULLIF(btrim(email), ''),
+            phone = NULLIF(btrim(phone), '')
+    """)
+    cur.execute("""
+        UPDATE staging_attendees SET reason = CASE
+            WHEN name IS NULL THEN 'nom manquant'
+            WHEN email IS NULL THEN 'email manquant'
+            WHEN email !~ %s THEN 'email invalide'
+            WHEN length(name) > 100 THEN 'nom trop long'
+            WHEN length(email) > 120 THEN 'email trop long'
+            WHEN length(phone) > 20 THEN 'téléphone trop long'
+        END
+    """, (EMAIL_PATTERN,))
+    # Même email plusieurs fois dans le fichier : la dernière ligne gagne.
+    cur.execute("""
+        UPDATE staging_attendees s SET reason = 'email en double dans le fichier'
+        FROM staging_attendees later
+        WHERE s.reason IS NULL AND later.reason IS NULL
+          AND later.email = s.email AND later.line > s.line
+    """)
+
+    cur.execute("""
+        WITH upserted AS (
+            INSERT INTO attendees (name, email, phone)
+            SELECT name, email, phone FROM staging_attendees
+            WHERE reason IS NULL
+            ON CONFLICT (email) DO UPDATE
+            SET name = EXCLUDED.name, phone = EXCLUDED.phone
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+    """)
+    inserted, updated = cur.fetchone()
+    stats.attendee_created(cur, inserted)
+    if updated:
+        versions.bump(cur, versions.ATTENDEES)
+
+    rejected = _write_rejects(cur, "attendees", reject_file)
+    conn.commit()
+    cur.close()
+    return {"inserted": inserted, "updated": updated, "rejected": rejected}
+
+
+def import_events(conn, fileobj, reject_file=None):
+    """Insert events, skipping exact duplicates. Returns counts; commits on success."""
+    cur = conn.cursor()
+    _stage(cur, fileobj, "events")
+
+    # Un cast ::date invalide lèverait une erreur : on le teste dans un bloc
+    # EXCEPTION, uniquement pour les lignes qui ont déjà la bonne forme.
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION pg_temp.is_date(value TEXT) RETURNS BOOLEAN AS $$
+        BEGIN
+            PERFORM value::date;
+            RETURN TRUE;
+        EXCEPTION WHEN others THEN
+            RETURN FALSE;
+        END
+        $$ LANGUAGE plpgsql STABLE
+    """)
+    cur.execute("""
+        UPDATE staging_events SET
+            name = NULLIF(btrim(name), ''),
+            date = NULLIF(btrim(date), ''),
+            location = NULLIF(btrim(location), ''),
+            description = NULLIF(description, ''),
+            organizer_id = NULLIF(btrim(organizer_id), '')
+    """)
+    cur.execute("""
+        UPDATE staging_events s SET reason = CASE
+            WHEN name IS NULL THEN 'nom manquant'
+            WHEN date IS NULL THEN 'date manquante'
+            WHEN location IS NULL THEN 'lieu manquant'
+            WHEN organizer_id IS NULL THEN 'organisateur manquant'
+            WHEN date !~ %s OR NOT pg_temp.is_date(date) THEN 'date invalide'
+            WHEN organizer_id !~ '^\\d{1,9}$' THEN 'organisateur invalide'
+            WHEN NOT EXISTS (SELECT 1 FROM organizers o WHERE o.id = s.organizer_id::int)
+                THEN 'organisateur inconnu'
+            WHEN length(name) > 200 THEN 'nom trop long'
+            WHEN length(location) > 200 THEN 'lieu trop long'
+        END
+    """, (DATE_PATTERN,))
+
+    # MATERIALIZED : les casts ne doivent voir que les lignes déjà validées,
+    # quel que soit l'ordre d'évaluation choisi par le planificateur.
+    cur.execute("""
+        WITH valid AS MATERIALIZED (
+            SELECT line, name, date, location, description, organizer_id
+            FROM staging_events
+            WHERE reason IS NULL
+        ),
+        typed AS (
+            SELECT DISTINCT ON (name, date::date, location, organizer_id::int)
+                   name, date::date AS date, location, description,
+                   organizer_id::int AS organizer_id
+            FROM valid
+            ORDER BY name, date::date, location, organizer_id::int, line DESC
+        ),
+        inserted AS (
+            INSERT INTO events (name, date, location, description, organizer_id)
+            SELECT t.name, t.date, t.location, t.description, t.organizer_id
+            FROM typed t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM events e
+                WHERE e.name = t.name AND e.date = t.date
+                  AND e.location = t.location AND e.organizer_id = t.organizer_id
+            )
+            RETURNING id
+        )
+        SELECT COUNT(*) FROM inserted
+    """)
+    inserted = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM staging_events WHERE reason IS NULL")
+    skipped = cur.fetchone()[0] - inserted
+    # Les compteurs par organisateur/mois sont reconstruits à la prochaine visite.
+    stats.mark_stale(cur)
+    if inserted:
+        versions.bump(cur, versions.EVENTS)
+
+    rejected = _write_rejects(cur, "events", reject_file)
+    conn.commit()
+    cur.close()
+    return {"inserted": inserted, "skipped": skipped, "rejected": rejected}
+
+
+IMPORTERS = {
+    "attendees": import_attendees,
+    "events": import_events,
+}
@@ -0,0 +1,208 @@
+"""Per-route SQL instrumentation.
+
+InstrumentedCursor times every statement and feeds a process-wide
+QueryStats registry keyed by Flask endpoint. The hot path is one
+perf_counter pair, a dict lookup and a few additions under a lock; the
+EXPLAIN for slow statements only runs past the threshold and at most once
+per statement per ``explain_interval``.
+"""
+import logging
+import threading
+import time
+
+import psycopg2
+from flask import has_request_context, request
+from psycopg2 import extensions
+
+logger = logging.getLogger("sge.sql")
+
+_normalized = {}
+
+
+def normalize(query):
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    text = _normalized.get(query)
+    if text is None:
+        text = " ".join(str(query).split())
+        if len(_normalized) < 4096:
+            _normalized[query] = text
+    return text
+
+
+def _current_route():
+    if has_request_context():
+        return request.endpoint or "-"
+    return "-"
+
+
+class _StatementStats:
+    __slots__ = ("calls", "total", "max", "rows")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+
+class _RouteStats:
+    __slots__ = ("requests", "queries", "db_time", "statements")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = {}
+
+
+class QueryStats:
+    def __init__(self, slow_threshold=0.2, explain_interval=60.0, top=10):
+        self.enabled = True
+        self.slow_threshold = slow_threshold
+        self.explain_interval = explain_interval
+        self.top = top
+        self._routes = {}
+        self._explained = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, statement, duration, rows):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = _RouteStats()
+            stats.queries += 1
+            stats.db_time += duration
+            entry = stats.statements.get(statement)
+            if entry is None:
+                entry = stats.statements[statement] = _StatementStats()
+            entry.calls += 1
+            entry.total += duration
+            entry.rows += max(rows, 0)
+            if duration > entry.max:
+                entry.max = duration
+
+    def record_request(self, route):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = _RouteStats()
+            stats.requests += 1
+
+    def should_explain(self, statement):
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(statement)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self._explained[statement] = now
+            return True
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._explained.clear()
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for route, stats in self._routes.items():
+                slowest = sorted(
+                    stats.statements.items(), key=lambda item: item[1].max, reverse=True
+                )[:self.top]
+                result[route] = {
+                    "requests": stats.requests,
+                    "queries": stats.queries,
+                    "queries_per_request": round(stats.queries / stats.requests, 2) if stats.requests else None,
+                    "db_time_ms": round(stats.db_time * 1000, 3),
+                    "db_time_ms_per_request": round(stats.db_time * 1000 / stats.requests, 3) if stats.requests else None,
+                    "slowest": [
+                        {
+                            "statement": statement,
+                            "calls": entry.calls,
+                            "max_ms": round(entry.max * 1000, 3),
+                            "mean_ms": round(entry.total * 1000 / entry.calls, 3),
+                            "rows": entry.rows,
+                        }
+                        for statement, entry in slowest
+                    ],
+                }
+            return result
+
+    def prometheus(self):
+        """Text exposition format (one series per route)"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, help_text, key, scale in (
+            ("sge_route_requests_total", "Requests served per route", "requests", 1),
+            ("sge_route_queries_total", "SQL statements executed per route", "queries", 1),
+            ("sge_route_db_seconds_total", "Time spent in SQL per route", "db_time_ms", 0.001),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for route, stats in sorted(snapshot.items()):
+                lines.append(f'{name}{{route="{route}"}} {stats[key] * scale:g}')
+        return "\n".join(lines) + "\n"
+
+
+query_stats = QueryStats()
+
+
+class InstrumentedCursor(extensions.cursor):
+    def _timed(self, method, query, *args):
+        if not query_stats.enabled:
+            return method(query, *args)
+        start = time.perf_counter()
+        try:
+            return method(query, *args)
+        finally:
+            duration = time.perf_counter() - start
+            statement = normalize(query)
+            query_stats.record(_current_route(), statement, duration, self.rowcount)
+            if duration >= query_stats.slow_threshold:
+                self._log_slow(statement, query, args, duration)
+
+    def execute(self, query, vars=None):
+        return self._timed(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(super().executemany, query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(super().copy_expert, sql, file, size)
+
+    def _log_slow(self, statement, query, args, duration):
+        plan = None
+        params = args[0] if args else None
+        explainable = (
+            self.name is None
+            and statement.split(" ", 1)[0].upper() in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+            and self.connection.get_transaction_status() != extensions.TRANSACTION_STATUS_INERROR
+        )
+        if explainable and query_stats.should_explain(statement):
+            try:
+                # Plain cursor: the EXPLAIN itself must not be recorded.
+                cur = self.connection.cursor(cursor_factory=extensions.cursor)
+                cur.execute("EXPLAIN " + str(query), params)
+                plan = "\n".join(row[0] for row in cur.fetchall())
+                cur.close()
+            except psycopg2.Error:
+                plan = None
+        logger.warning(
+            "slow query (%.1f ms) in %s: %s%s",
+            duration * 1000, _current_route(), statement,
+            "\n" + plan if plan else ""
+        )
+
+
+def init_app(app):
+    """Configure the registry and count requests per endpoint"""
+    query_stats.enabled = app.config.get("SQL_INSTRUMENTATION", True)
+    query_stats.slow_threshold = app.config.get("SQL_SLOW_QUERY_MS", 200) / 1000.0
+
+    @app.teardown_request
+    def count_request(exc):
+        if query_stats.enabled:
+            query_stats.record_request(_current_route())
+
+    return InstrumentedCursor
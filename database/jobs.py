@@ -0,0 +1,147 @@
+"""Postgres-backed job queue (table jobs, migration 0006).
+
+Producers enqueue inside their own transaction, like the stats hooks: a
+confirmation job exists if and only if the registration committed. Workers
+(services/jobs.py) claim ready jobs with FOR UPDATE SKIP LOCKED, so any
+number of them share the queue without blocking each other, and hold each
+claim for a lease; a worker that dies mid-batch loses its jobs back to the
+queue when the lease expires. Delivery is therefore at least once.
+"""
+import random
+
+from psycopg2.extras import Json
+
+CHANNEL = "jobs"
+
+REGISTRATION_CONFIRMATION = "registration_confirmation"
+EVENT_CHANGED = "event_changed"
+EVENT_UPDATE = "event_update"
+
+# Nouvel essai après 30 s, 1 min, 2 min... plafonné à une heure.
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+
+
+def enqueue(cur, kind, payloads, max_attempts=5):
+    """Queue one job per payload; workers are woken at commit"""
+    if not payloads:
+        return
+    cur.execute("""
+        INSERT INTO jobs (kind, payload, max_attempts)
+        SELECT %s, payload, %s FROM unnest(%s::jsonb[]) AS payload
+    """, (kind, max_attempts, [Json(payload) for payload in payloads]))
+    cur.execute("SELECT pg_notify(%s, '')", (CHANNEL,))
+
+
+def registered(cur, event_id, attendee_ids):
+    """Hook: confirmation (with .ics) for each new ticket"""
+    enqueue(cur, REGISTRATION_CONFIRMATION, [
+        {"event_id": event_id, "attendee_id": attendee_id} for attendee_id in attendee_ids
+    ])
+
+
+def event_changed(cur, event_id, changes):
+    """Hook: notify every attendee; fanned out by the worker, not the request"""
+    enqueue(cur, EVENT_CHANGED, [{"event_id": event_id, "changes": changes}])
+
+
+def claim(cur, batch, lease):
+    """Take up to ``batch`` ready jobs for ``lease`` seconds (caller commits)"""
+    cur.execute("""
+        WITH ready AS (
+            SELECT id FROM jobs
+            WHERE status = 'queued' AND run_at <= now()
+            ORDER BY run_at, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE jobs j
+        SET status = 'running', attempts = j.attempts + 1, started_at = now(),
+            locked_until = now() + make_interval(secs => %s)
+        FROM ready
+        WHERE j.id = ready.id
+        RETURNING j.id, j.kind, j.payload, j.attempts, j.max_attempts
+    """, (batch, lease))
+    return cur.fetchall()
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def finish(cur, done, failures):
+    """Mark ``done`` ids as done; retry or fail ``failures`` [(job, error)]"""
+    if done:
+        cur.execute("""
+            UPDATE jobs SET status = 'done', finished_at = now(), locked_until = NULL
+            WHERE id = ANY(%s)
+        """, (list(done),))
+    if failures:
+        ids = [job[0] for job, _ in failures]
+        errors = [str(error)[:1000] for _, error in failures]
+        delays = [backoff(job[3]) for job, _ in failures]
+        cur.execute("""
+            UPDATE jobs j
+            SET status = CASE WHEN j.attempts >= j.max_attempts THEN 'failed' ELSE 'queued' END,
+                finished_at = CASE WHEN j.attempts >= j.max_attempts THEN now() END,
+                run_at = now() + make_interval(secs => f.delay),
+                locked_until = NULL,
+                last_error = f.error
+            FROM unnest(%s::bigint[], %s::text[], %s::float8[]) AS f(id, error, delay)
+            WHERE j.id = f.id
+        """, (ids, errors, delays))
+
+
+def reap(cur):
+    """Requeue jobs whose worker let the lease expire; returns the count"""
+    cur.execute("""
+        UPDATE jobs
+        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            finished_at = CASE WHEN attempts >= max_attempts THEN now() END,
+            locked_until = NULL,
+            last_error = 'lease expired'
+        WHERE status = 'running' AND locked_until < now()
+    """)
+    return cur.rowcount
+
+
+def purge(cur, retention):
+    """Delete done jobs older than ``retention`` seconds (failed ones stay)"""
+    cur.execute("""
+        DELETE FROM jobs
+        WHERE status = 'done' AND finished_at < now() - make_interval(secs => %s)
+    """, (retention,))
+    return cur.rowcount
+
+
+def metrics(cur, window=300):
+    """Queue depth by status, backlog age, throughput and end-to-end latency"""
+    cur.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+    by_status = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    by_status.update(dict(cur.fetchall()))
+
+    cur.execute("""
+        SELECT EXTRACT(EPOCH FROM now() - MIN(run_at))
+        FROM jobs WHERE status = 'queued' AND run_at <= now()
+    """)
+    oldest = cur.fetchone()[0]
+
+    cur.execute("""
+        SELECT COUNT(*),
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM finished_at - created_at)),
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM finished_at - created_at)),
+               AVG(attempts)
+        FROM jobs
+        WHERE status = 'done' AND finished_at > now() - make_interval(secs => %s)
+    """, (window,))
+    done, p50, p95, attempts = cur.fetchone()
+    return {
+        "jobs": by_status,
+        "oldest_ready_seconds": round(float(oldest), 3) if oldest is not None else 0.0,
+        "window_seconds": window,
+        "done_per_second": round(done / window, 3),
+        "latency_p50_seconds": round(p50, 3) if p50 is not None else None,
+        "latency_p95_seconds": round(p95, 3) if p95 is not None else None,
+        "avg_attempts": round(float(attempts), 2) if attempts is not None else None,
+    }
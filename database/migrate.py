@@ -0,0 +1,192 @@
+"""Versioned SQL migrations tracked in the schema_version table.
+
+Migrations are the files ``database/migrations/NNNN_description.sql``,
+applied in order. A file starting with ``-- migrate: no-transaction`` is run
+statement by statement in autocommit mode, which CREATE INDEX CONCURRENTLY
+requires; every other file runs in a single transaction. A no-transaction
+migration that fails halfway is simply re-run, so its statements must be
+idempotent (IF NOT EXISTS).
+"""
+import os
+import re
+import time
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+FILENAME_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Verrou consultatif : deux déploiements ne migrent jamais en même temps.
+MIGRATE_LOCK_ID = 0x4D16
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    @property
+    def transactional(self):
+        return not self.read().lstrip().startswith(NO_TRANSACTION_MARKER)
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = FILENAME_PATTERN.match(filename)
+        if match:
+            migrations.append(Migration(
+                int(match.group(1)), match.group(2), os.path.join(directory, filename)
+            ))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("duplicate migration version in " + directory)
+    return migrations
+
+
+def split_statements(sql):
+    """Split a script on top-level semicolons (quotes and $$ bodies respected)"""
+    statements, current = [], []
+    in_quote = False
+    dollar_tag = None
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        if dollar_tag:
+            if sql.startswith(dollar_tag, i):
+                current.append(dollar_tag)
+                i += len(dollar_tag)
+                dollar_tag = None
+                continue
+        elif in_quote:
+            if char == "'":
+                in_quote = False
+        elif char == "'":
+            in_quote = True
+        elif char == "-" and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+            continue
+        elif char == "$":
+            match = re.match(r"\$\w*\$", sql[i:])
+            if match:
+                dollar_tag = match.group(0)
+                current.append(dollar_tag)
+                i += len(dollar_tag)
+                continue
+        elif char == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += 1
+            continue
+        current.append(char)
+        i += 1
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def ensure_version_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        )
+    """)
+
+
+def applied_versions(cur):
+    cur.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cur.fetchall()}
+
+
+def _drop_invalid_indexes(cur):
+    # Un CREATE INDEX CONCURRENTLY interrompu laisse un index INVALID que
+    # IF NOT EXISTS ne reconstruirait jamais.
+    cur.execute("""
+        SELECT i.indexrelid::regclass::text
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = current_schema()
+    """)
+    for (index_name,) in cur.fetchall():
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def _apply(conn, migration):
+    sql = migration.read()
+    start = time.monotonic()
+    cur = conn.cursor()
+    if migration.transactional:
+        cur.execute(sql)
+    else:
+        _drop_invalid_indexes(cur)
+        for statement in split_statements(sql):
+            cur.execute(statement)
+    duration_ms = int((time.monotonic() - start) * 1000)
+    cur.execute(
+        "INSERT INTO schema_version (version, name, duration_ms) VALUES (%s, %s, %s)",
+        (migration.version, migration.name, duration_ms)
+    )
+    cur.close()
+    return duration_ms
+
+
+def migrate(conn, target=None, echo=print):
+    """Apply pending migrations up to ``target`` (all by default).
+
+    ``conn`` must be a dedicated (non-pooled) connection: it is switched to
+    autocommit for the duration of the run.
+    """
+    conn.rollback()
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATE_LOCK_ID,))
+    try:
+        ensure_version_table(cur)
+        done = applied_versions(cur)
+        applied = []
+        for migration in discover():
+            if migration.version in done:
+                continue
+            if target is not None and migration.version > target:
+                break
+            echo(f"-> {migration.version:04d}_{migration.name}")
+            if migration.transactional:
+                conn.autocommit = False
+                try:
+                    duration_ms = _apply(conn, migration)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.autocommit = True
+            else:
+                duration_ms = _apply(conn, migration)
+            echo(f"   ok ({duration_ms} ms)")
+            applied.append(migration.version)
+        return applied
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATE_LOCK_ID,))
+        cur.close()
+
+
+def status(conn):
+    """[(version, name, applied)] for every known migration"""
+    cur = conn.cursor()
+    ensure_version_table(cur)
+    done = applied_versions(cur)
+    conn.commit()
+    cur.close()
+    return [(m.version, m.name, m.version in done) for m in discover()]
@@ -0,0 +1,27 @@
+-- migrate: no-transaction
+-- Index secondaires pour les requêtes des routes (voir database/explain_check.py).
+-- CONCURRENTLY : pas de verrou bloquant les écritures pendant la construction.
+
+-- attendee_details, delete_attendee, attendees (nombre d'inscriptions)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS tickets_attendee_id_idx
+    ON tickets (attendee_id);
+
+-- organizers (nombre d'événements), delete_organizer, dashboard
+CREATE INDEX CONCURRENTLY IF NOT EXISTS events_organizer_id_idx
+    ON events (organizer_id);
+
+-- index, events : tri et pagination par (date, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS events_date_id_idx
+    ON events (date, id);
+
+-- attendees, organizers, listes d'inscrits : tri et pagination par (name, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS attendees_name_id_idx
+    ON attendees (name, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS organizers_name_id_idx
+    ON organizers (name, id);
+
+-- available_attendees : recherche par préfixe insensible à la casse
+CREATE INDEX CONCURRENTLY IF NOT EXISTS attendees_lower_name_prefix_idx
+    ON attendees (lower(name) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS attendees_lower_email_prefix_idx
+    ON attendees (lower(email) text_pattern_ops);
@@ -0,0 +1,29 @@
+-- Capacité des événements et liste d'attente (voir database/capacity.py).
+-- capacity NULL : pas de limite. Le nombre de places prises est tenu dans
+-- event_seats, une ligne par événement verrouillée par chaque inscription :
+-- jamais de COUNT(*) sur tickets pour décider s'il reste une place.
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS capacity INTEGER
+    CHECK (capacity IS NULL OR capacity >= 0);
+
+CREATE TABLE IF NOT EXISTS event_seats (
+    event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,
+    taken INTEGER NOT NULL DEFAULT 0 CHECK (taken >= 0)
+);
+
+CREATE TABLE IF NOT EXISTS waitlist (
+    id BIGSERIAL PRIMARY KEY,
+    event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+    attendee_id INTEGER NOT NULL REFERENCES attendees(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (event_id, attendee_id)
+);
+-- Promotion dans l'ordre d'arrivée
+CREATE INDEX IF NOT EXISTS waitlist_event_id_idx ON waitlist (event_id, id);
+
+INSERT INTO event_seats (event_id, taken)
+SELECT e.id, COUNT(t.id)
+FROM events e
+LEFT JOIN tickets t ON t.event_id = e.id
+GROUP BY e.id
+ON CONFLICT (event_id) DO UPDATE SET taken = EXCLUDED.taken;
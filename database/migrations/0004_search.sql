@@ -0,0 +1,112 @@
+-- Recherche plein texte (voir database/search.py).
+-- Les tsvector vivent dans search_documents plutôt que dans des colonnes des
+-- tables : les routes font des SELECT * et les transporteraient à chaque
+-- ligne de liste. Des triggers tiennent la table à jour ; un seul index GIN
+-- couvre événements, participants et organisateurs.
+-- Configuration 'simple' (pas de racinisation) : noms propres, emails et
+-- textes mélangés ; les requêtes utilisent des préfixes (mot:*).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS search_documents (
+    kind VARCHAR(10) NOT NULL,
+    ref_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    subtitle TEXT,
+    document TSVECTOR NOT NULL,
+    PRIMARY KEY (kind, ref_id)
+);
+
+CREATE OR REPLACE FUNCTION search_event_document(name TEXT, location TEXT, description TEXT)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(location, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+$$ LANGUAGE sql IMMUTABLE;
+
+-- L'email entier et ses morceaux : « dupont » trouve jean.dupont@example.com
+CREATE OR REPLACE FUNCTION search_person_document(name TEXT, email TEXT)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('simple',
+               coalesce(email, '') || ' ' || regexp_replace(coalesce(email, ''), '[@._+-]+', ' ', 'g')
+           ), 'B')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION search_sync() RETURNS trigger AS $$
+DECLARE
+    doc_kind TEXT := TG_ARGV[0];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM search_documents WHERE kind = doc_kind AND ref_id = OLD.id;
+        RETURN OLD;
+    END IF;
+    IF doc_kind = 'event' THEN
+        INSERT INTO search_documents (kind, ref_id, title, subtitle, document)
+        VALUES (doc_kind, NEW.id, NEW.name, NEW.location,
+                search_event_document(NEW.name, NEW.location, NEW.description))
+        ON CONFLICT (kind, ref_id) DO UPDATE
+            SET title = EXCLUDED.title, subtitle = EXCLUDED.subtitle, document = EXCLUDED.document;
+    ELSE
+        INSERT INTO search_documents (kind, ref_id, title, subtitle, document)
+        VALUES (doc_kind, NEW.id, NEW.name, NEW.email,
+                search_person_document(NEW.name, NEW.email))
+        ON CONFLICT (kind, ref_id) DO UPDATE
+            SET title = EXCLUDED.title, subtitle = EXCLUDED.subtitle, document = EXCLUDED.document;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION search_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM search_documents WHERE kind = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS events_search_sync ON events;
+CREATE TRIGGER events_search_sync
+    AFTER INSERT OR DELETE OR UPDATE OF name, location, description ON events
+    FOR EACH ROW EXECUTE FUNCTION search_sync('event');
+DROP TRIGGER IF EXISTS events_search_truncate ON events;
+CREATE TRIGGER events_search_truncate
+    AFTER TRUNCATE ON events
+    FOR EACH STATEMENT EXECUTE FUNCTION search_truncate('event');
+
+DROP TRIGGER IF EXISTS attendees_search_sync ON attendees;
+CREATE TRIGGER attendees_search_sync
+    AFTER INSERT OR DELETE OR UPDATE OF name, email ON attendees
+    FOR EACH ROW EXECUTE FUNCTION search_sync('attendee');
+DROP TRIGGER IF EXISTS attendees_search_truncate ON attendees;
+CREATE TRIGGER attendees_search_truncate
+    AFTER TRUNCATE ON attendees
+    FOR EACH STATEMENT EXECUTE FUNCTION search_truncate('attendee');
+
+DROP TRIGGER IF EXISTS organizers_search_sync ON organizers;
+CREATE TRIGGER organizers_search_sync
+    AFTER INSERT OR DELETE OR UPDATE OF name, email ON organizers
+    FOR EACH ROW EXECUTE FUNCTION search_sync('organizer');
+DROP TRIGGER IF EXISTS organizers_search_truncate ON organizers;
+CREATE TRIGGER organizers_search_truncate
+    AFTER TRUNCATE ON organizers
+    FOR EACH STATEMENT EXECUTE FUNCTION search_truncate('organizer');
+
+-- Données existantes, puis index (plus rapide que de les maintenir pendant le chargement)
+INSERT INTO search_documents (kind, ref_id, title, subtitle, document)
+SELECT 'event', id, name, location, search_event_document(name, location, description) FROM events
+ON CONFLICT (kind, ref_id) DO NOTHING;
+INSERT INTO search_documents (kind, ref_id, title, subtitle, document)
+SELECT 'attendee', id, name, email, search_person_document(name, email) FROM attendees
+ON CONFLICT (kind, ref_id) DO NOTHING;
+INSERT INTO search_documents (kind, ref_id, title, subtitle, document)
+SELECT 'organizer', id, name, email, search_person_document(name, email) FROM organizers
+ON CONFLICT (kind, ref_id) DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS search_documents_document_idx
+    ON search_documents USING GIN (document);
+-- Fautes de frappe : similarité trigramme sur le nom
+CREATE INDEX IF NOT EXISTS search_documents_title_trgm_idx
+    ON search_documents USING GIN (title gin_trgm_ops);
+
+ANALYZE search_documents;
@@ -0,0 +1,10 @@
+-- Numéros de version des pages publiques mises en cache (voir database/versions.py).
+-- Une ligne par portée : 'events' (listes), 'organizers', 'attendees',
+-- 'event:<id>' (page d'un événement). Incrémentés dans la transaction qui
+-- modifie les données, donc visibles au même commit.
+
+CREATE TABLE IF NOT EXISTS cache_versions (
+    scope VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
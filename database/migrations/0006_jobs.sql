@@ -0,0 +1,24 @@
+-- File de tâches en arrière-plan (voir database/jobs.py et services/jobs.py).
+-- Les workers prennent les tâches prêtes avec FOR UPDATE SKIP LOCKED ; une
+-- tâche 'running' dont le bail (locked_until) a expiré est reprise.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(10) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    locked_until TIMESTAMPTZ,
+    last_error TEXT
+);
+-- Index partiels : chacun ne couvre que les lignes de son état, la table
+-- peut garder l'historique des tâches terminées sans ralentir la prise.
+CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (run_at, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS jobs_lease_idx ON jobs (locked_until) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS jobs_finished_idx ON jobs (finished_at) WHERE status IN ('done', 'failed');
@@ -0,0 +1,135 @@
+-- Compteurs dénormalisés : events.ticket_count, attendees.event_count,
+-- organizers.event_count. Tenus par des triggers au niveau instruction
+-- (tables de transition) : un INSERT multi-lignes, un COPY ou une
+-- suppression en cascade ne font qu'une mise à jour par ligne concernée,
+-- dans la même transaction. database/counters.py vérifie et répare les
+-- écarts (flask --app index counters-check).
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS ticket_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE attendees ADD COLUMN IF NOT EXISTS event_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE organizers ADD COLUMN IF NOT EXISTS event_count INTEGER NOT NULL DEFAULT 0;
+
+-- Applique des deltas agrégés, lignes verrouillées dans l'ordre des id.
+-- Remplacée par 0011 : FOR UPDATE entrait en conflit avec le FOR KEY SHARE
+-- des clés étrangères et interbloquait des inscriptions concurrentes.
+CREATE OR REPLACE FUNCTION counters_add(tbl TEXT, ids INTEGER[], deltas BIGINT[]) RETURNS void AS $$
+BEGIN
+    IF ids IS NULL THEN
+        RETURN;
+    END IF;
+    IF tbl = 'events' THEN
+        PERFORM 1 FROM events
+        WHERE id IN (SELECT d.id FROM unnest(ids, deltas) AS d(id, delta) WHERE d.delta <> 0)
+        ORDER BY id FOR UPDATE;
+        UPDATE events e SET ticket_count = e.ticket_count + d.delta
+        FROM unnest(ids, deltas) AS d(id, delta)
+        WHERE e.id = d.id AND d.delta <> 0;
+    ELSIF tbl = 'attendees' THEN
+        PERFORM 1 FROM attendees
+        WHERE id IN (SELECT d.id FROM unnest(ids, deltas) AS d(id, delta) WHERE d.delta <> 0)
+        ORDER BY id FOR UPDATE;
+        UPDATE attendees a SET event_count = a.event_count + d.delta
+        FROM unnest(ids, deltas) AS d(id, delta)
+        WHERE a.id = d.id AND d.delta <> 0;
+    ELSE
+        PERFORM 1 FROM organizers
+        WHERE id IN (SELECT d.id FROM unnest(ids, deltas) AS d(id, delta) WHERE d.delta <> 0)
+        ORDER BY id FOR UPDATE;
+        UPDATE organizers o SET event_count = o.event_count + d.delta
+        FROM unnest(ids, deltas) AS d(id, delta)
+        WHERE o.id = d.id AND d.delta <> 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- new_rows / old_rows n'existent que pour les opérations qui les déclarent :
+-- chaque branche ne lit que la table de transition de son opération.
+CREATE OR REPLACE FUNCTION counters_tickets() RETURNS trigger AS $$
+DECLARE
+    ids INTEGER[];
+    deltas BIGINT[];
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT array_agg(event_id), array_agg(n) INTO ids, deltas
+        FROM (SELECT event_id, COUNT(*) AS n FROM new_rows GROUP BY event_id) s;
+        PERFORM counters_add('events', ids, deltas);
+        SELECT array_agg(attendee_id), array_agg(n) INTO ids, deltas
+        FROM (SELECT attendee_id, COUNT(*) AS n FROM new_rows GROUP BY attendee_id) s;
+        PERFORM counters_add('attendees', ids, deltas);
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        SELECT array_agg(event_id), array_agg(-n) INTO ids, deltas
+        FROM (SELECT event_id, COUNT(*) AS n FROM old_rows GROUP BY event_id) s;
+        PERFORM counters_add('events', ids, deltas);
+        SELECT array_agg(attendee_id), array_agg(-n) INTO ids, deltas
+        FROM (SELECT attendee_id, COUNT(*) AS n FROM old_rows GROUP BY attendee_id) s;
+        PERFORM counters_add('attendees', ids, deltas);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Sur UPDATE, delta net par organisateur : les mises à jour de ticket_count
+-- (une par inscription) ne touchent pas la ligne de l'organisateur.
+CREATE OR REPLACE FUNCTION counters_events() RETURNS trigger AS $$
+DECLARE
+    ids INTEGER[];
+    deltas BIGINT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(organizer_id), array_agg(n) INTO ids, deltas
+        FROM (SELECT organizer_id, COUNT(*) AS n FROM new_rows
+              WHERE organizer_id IS NOT NULL GROUP BY organizer_id) s;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(organizer_id), array_agg(-n) INTO ids, deltas
+        FROM (SELECT organizer_id, COUNT(*) AS n FROM old_rows
+              WHERE organizer_id IS NOT NULL GROUP BY organizer_id) s;
+    ELSE
+        SELECT array_agg(organizer_id), array_agg(n) INTO ids, deltas
+        FROM (SELECT organizer_id, SUM(d) AS n
+              FROM (SELECT organizer_id, 1 AS d FROM new_rows
+                    UNION ALL SELECT organizer_id, -1 FROM old_rows) x
+              WHERE organizer_id IS NOT NULL
+              GROUP BY organizer_id HAVING SUM(d) <> 0) s;
+    END IF;
+    PERFORM counters_add('organizers', ids, deltas);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tickets_counters_insert ON tickets;
+CREATE TRIGGER tickets_counters_insert
+    AFTER INSERT ON tickets REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION counters_tickets();
+DROP TRIGGER IF EXISTS tickets_counters_delete ON tickets;
+CREATE TRIGGER tickets_counters_delete
+    AFTER DELETE ON tickets REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION counters_tickets();
+DROP TRIGGER IF EXISTS tickets_counters_update ON tickets;
+CREATE TRIGGER tickets_counters_update
+    AFTER UPDATE ON tickets REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION counters_tickets();
+
+DROP TRIGGER IF EXISTS events_counters_insert ON events;
+CREATE TRIGGER events_counters_insert
+    AFTER INSERT ON events REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION counters_events();
+DROP TRIGGER IF EXISTS events_counters_delete ON events;
+CREATE TRIGGER events_counters_delete
+    AFTER DELETE ON events REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION counters_events();
+DROP TRIGGER IF EXISTS events_counters_update ON events;
+CREATE TRIGGER events_counters_update
+    AFTER UPDATE ON events REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION counters_events();
+
+-- Valeurs initiales
+UPDATE events e SET ticket_count = c.n
+FROM (SELECT event_id, COUNT(*) AS n FROM tickets GROUP BY event_id) c
+WHERE e.id = c.event_id AND e.ticket_count <> c.n;
+UPDATE attendees a SET event_count = c.n
+FROM (SELECT attendee_id, COUNT(*) AS n FROM tickets GROUP BY attendee_id) c
+WHERE a.id = c.attendee_id AND a.event_count <> c.n;
+UPDATE organizers o SET event_count = c.n
+FROM (SELECT organizer_id, COUNT(*) AS n FROM events GROUP BY organizer_id) c
+WHERE o.id = c.organizer_id AND o.event_count <> c.n;
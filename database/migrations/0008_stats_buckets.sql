@@ -0,0 +1,26 @@
+-- Séries du tableau de bord par jour, semaine et mois (database/stats.py).
+-- Remplace stats_monthly_attendees : « attendees » compte les participants
+-- distincts du seau (un participant inscrit à deux événements de la même
+-- semaine compte une fois pour cette semaine), « tickets » les inscriptions.
+-- Une série jour/semaine/mois se lit sur la clé primaire, sans agrégat.
+
+CREATE TABLE IF NOT EXISTS stats_attendee_buckets (
+    unit TEXT NOT NULL CHECK (unit IN ('day', 'week', 'month')),
+    bucket DATE NOT NULL,
+    attendees INTEGER NOT NULL DEFAULT 0,
+    tickets INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (unit, bucket)
+);
+
+INSERT INTO stats_attendee_buckets (unit, bucket, attendees, tickets)
+SELECT u.unit, date_trunc(u.unit, e.date)::date, COUNT(DISTINCT t.attendee_id), COUNT(t.id)
+FROM events e
+LEFT JOIN tickets t ON t.event_id = e.id
+CROSS JOIN unnest(ARRAY['day', 'week', 'month']) AS u(unit)
+GROUP BY 1, 2
+ON CONFLICT (unit, bucket) DO NOTHING;
+
+DROP TABLE IF EXISTS stats_monthly_attendees;
+
+-- Top N des organisateurs (graphique « Événements par organisateur »)
+CREATE INDEX IF NOT EXISTS organizers_event_count_idx ON organizers (event_count DESC, id);
@@ -0,0 +1,210 @@
+-- Flux de changements : chaque instruction qui touche events, tickets,
+-- waitlist ou attendees ajoute des lignes à change_feed et les publie par
+-- NOTIFY sur le canal « changes », dans la même transaction (rien n'est
+-- publié si elle est annulée). Un écouteur par worker les diffuse en
+-- Server-Sent Events (services/changes.py) ; seq permet à un client qui se
+-- reconnecte de reprendre où il en était.
+--
+-- Triggers au niveau instruction, comme ceux de 0007 : un COPY ou une
+-- inscription groupée produit une ligne par événement touché, pas une par
+-- billet. Les charges ne contiennent que des identifiants et des compteurs.
+
+CREATE TABLE IF NOT EXISTS change_feed (
+    seq BIGSERIAL PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    topic TEXT NOT NULL,
+    payload JSONB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS change_feed_created_at_idx ON change_feed (created_at);
+
+-- Au-delà, une instruction publie un seul « reset » (les clients rechargent).
+CREATE OR REPLACE FUNCTION change_feed_max_topics() RETURNS INTEGER AS $$
+    SELECT 1000
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Un NOTIFY est limité à 8000 octets : au-delà, seul seq est envoyé et
+-- l'écouteur relit la ligne.
+CREATE OR REPLACE FUNCTION change_feed_emit(p_topic TEXT, p_payload JSONB) RETURNS void AS $$
+DECLARE
+    new_seq BIGINT;
+    message TEXT;
+BEGIN
+    INSERT INTO change_feed (topic, payload) VALUES (p_topic, p_payload) RETURNING seq INTO new_seq;
+    message := jsonb_build_object('seq', new_seq, 'topic', p_topic, 'payload', p_payload)::text;
+    IF octet_length(message) > 7900 THEN
+        message := jsonb_build_object('seq', new_seq)::text;
+    END IF;
+    PERFORM pg_notify('changes', message);
+END;
+$$ LANGUAGE plpgsql;
+
+-- kind : tickets ou waitlist ; une ligne par événement, attendee_ids tronqué
+-- à 100 (count reste exact).
+CREATE OR REPLACE FUNCTION change_feed_registrations(kind TEXT, op TEXT, rows JSONB) RETURNS void AS $$
+BEGIN
+    IF jsonb_array_length(rows) > change_feed_max_topics() THEN
+        PERFORM change_feed_emit('*', jsonb_build_object('kind', 'reset', 'table', kind));
+        RETURN;
+    END IF;
+    PERFORM change_feed_emit(
+        'event:' || (r ->> 'event_id'),
+        jsonb_build_object('kind', kind, 'op', op, 'event_id', (r ->> 'event_id')::int,
+                           'count', (r ->> 'count')::int, 'attendee_ids', r -> 'attendee_ids')
+    )
+    FROM jsonb_array_elements(rows) AS r;
+END;
+$$ LANGUAGE plpgsql;
+
+-- new_rows / old_rows n'existent que pour les opérations qui les déclarent
+-- (voir 0007), d'où une requête par branche. Un UPDATE est publié comme la
+-- suppression des anciens couples événement/participant et l'insertion
+-- des nouveaux.
+CREATE OR REPLACE FUNCTION change_feed_tickets() RETURNS trigger AS $$
+DECLARE
+    kind TEXT := CASE WHEN TG_TABLE_NAME = 'waitlist' THEN 'waitlist' ELSE 'tickets' END;
+    added JSONB;
+    removed JSONB;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(jsonb_build_object('event_id', event_id, 'count', n, 'attendee_ids', to_jsonb(ids[1:100])))
+        INTO added
+        FROM (SELECT event_id, COUNT(*) AS n, array_agg(attendee_id ORDER BY attendee_id) AS ids
+              FROM new_rows GROUP BY event_id) s;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(jsonb_build_object('event_id', event_id, 'count', n, 'attendee_ids', to_jsonb(ids[1:100])))
+        INTO removed
+        FROM (SELECT event_id, COUNT(*) AS n, array_agg(attendee_id ORDER BY attendee_id) AS ids
+              FROM old_rows GROUP BY event_id) s;
+    ELSE
+        SELECT jsonb_agg(jsonb_build_object('event_id', event_id, 'count', n, 'attendee_ids', to_jsonb(ids[1:100])))
+        INTO added
+        FROM (SELECT event_id, COUNT(*) AS n, array_agg(attendee_id ORDER BY attendee_id) AS ids
+              FROM (SELECT event_id, attendee_id FROM new_rows
+                    EXCEPT ALL SELECT event_id, attendee_id FROM old_rows) c
+              GROUP BY event_id) s;
+        SELECT jsonb_agg(jsonb_build_object('event_id', event_id, 'count', n, 'attendee_ids', to_jsonb(ids[1:100])))
+        INTO removed
+        FROM (SELECT event_id, COUNT(*) AS n, array_agg(attendee_id ORDER BY attendee_id) AS ids
+              FROM (SELECT event_id, attendee_id FROM old_rows
+                    EXCEPT ALL SELECT event_id, attendee_id FROM new_rows) c
+              GROUP BY event_id) s;
+    END IF;
+    IF removed IS NOT NULL THEN
+        PERFORM change_feed_registrations(kind, 'delete', removed);
+    END IF;
+    IF added IS NOT NULL THEN
+        PERFORM change_feed_registrations(kind, 'insert', added);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Les champs publics de l'événement voyagent avec le changement : la page
+-- se met à jour sans recharger.
+CREATE OR REPLACE FUNCTION change_feed_events() RETURNS trigger AS $$
+DECLARE
+    changed JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(jsonb_build_object('id', id, 'op', 'delete')) INTO changed FROM old_rows;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(jsonb_build_object(
+                   'id', id, 'op', 'insert', 'name', name, 'date', date,
+                   'location', location, 'capacity', capacity))
+        INTO changed FROM new_rows;
+    ELSE
+        SELECT jsonb_agg(jsonb_build_object(
+                   'id', n.id, 'op', 'update', 'name', n.name, 'date', n.date,
+                   'location', n.location, 'capacity', n.capacity))
+        INTO changed
+        FROM new_rows n JOIN old_rows o USING (id)
+        -- ticket_count (0007) change à chaque inscription : ces mises à
+        -- jour-là ne modifient pas l'événement.
+        WHERE (o.name, o.date, o.location, o.description, o.organizer_id, o.capacity)
+              IS DISTINCT FROM (n.name, n.date, n.location, n.description, n.organizer_id, n.capacity);
+    END IF;
+    IF changed IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF jsonb_array_length(changed) > change_feed_max_topics() THEN
+        PERFORM change_feed_emit('*', jsonb_build_object('kind', 'reset', 'table', 'events'));
+        RETURN NULL;
+    END IF;
+    PERFORM change_feed_emit('event:' || (c ->> 'id'), jsonb_build_object('kind', 'event') || c)
+    FROM jsonb_array_elements(changed) AS c;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Participants : une seule ligne par instruction (un import en ajoute des
+-- milliers), sur le sujet « attendees ».
+CREATE OR REPLACE FUNCTION change_feed_attendees() RETURNS trigger AS $$
+DECLARE
+    n BIGINT;
+    ids INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT COUNT(*), (array_agg(id ORDER BY id))[1:100] INTO n, ids FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT COUNT(*), (array_agg(id ORDER BY id))[1:100] INTO n, ids FROM old_rows;
+    ELSE
+        SELECT COUNT(*), (array_agg(n.id ORDER BY n.id))[1:100] INTO n, ids
+        FROM new_rows n JOIN old_rows o USING (id)
+        -- event_count (0007) bouge à chaque inscription : ignoré.
+        WHERE (o.name, o.email, o.phone) IS DISTINCT FROM (n.name, n.email, n.phone);
+    END IF;
+    IF n > 0 THEN
+        PERFORM change_feed_emit('attendees', jsonb_build_object(
+            'kind', 'attendees', 'op', lower(TG_OP), 'count', n, 'ids', to_jsonb(ids)));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tickets_change_feed_insert ON tickets;
+CREATE TRIGGER tickets_change_feed_insert
+    AFTER INSERT ON tickets REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_tickets();
+DROP TRIGGER IF EXISTS tickets_change_feed_delete ON tickets;
+CREATE TRIGGER tickets_change_feed_delete
+    AFTER DELETE ON tickets REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_tickets();
+DROP TRIGGER IF EXISTS tickets_change_feed_update ON tickets;
+CREATE TRIGGER tickets_change_feed_update
+    AFTER UPDATE ON tickets REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_tickets();
+
+DROP TRIGGER IF EXISTS waitlist_change_feed_insert ON waitlist;
+CREATE TRIGGER waitlist_change_feed_insert
+    AFTER INSERT ON waitlist REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_tickets();
+DROP TRIGGER IF EXISTS waitlist_change_feed_delete ON waitlist;
+CREATE TRIGGER waitlist_change_feed_delete
+    AFTER DELETE ON waitlist REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_tickets();
+
+DROP TRIGGER IF EXISTS events_change_feed_insert ON events;
+CREATE TRIGGER events_change_feed_insert
+    AFTER INSERT ON events REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_events();
+DROP TRIGGER IF EXISTS events_change_feed_delete ON events;
+CREATE TRIGGER events_change_feed_delete
+    AFTER DELETE ON events REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_events();
+DROP TRIGGER IF EXISTS events_change_feed_update ON events;
+CREATE TRIGGER events_change_feed_update
+    AFTER UPDATE ON events REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_events();
+
+DROP TRIGGER IF EXISTS attendees_change_feed_insert ON attendees;
+CREATE TRIGGER attendees_change_feed_insert
+    AFTER INSERT ON attendees REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_attendees();
+DROP TRIGGER IF EXISTS attendees_change_feed_delete ON attendees;
+CREATE TRIGGER attendees_change_feed_delete
+    AFTER DELETE ON attendees REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_attendees();
+DROP TRIGGER IF EXISTS attendees_change_feed_update ON attendees;
+CREATE TRIGGER attendees_change_feed_update
+    AFTER UPDATE ON attendees REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION change_feed_attendees();
@@ -0,0 +1,165 @@
+-- Billets partitionnés par plages d'event_id (tickets_partition_width()
+-- événements par partition, nommées tickets_p<début>). Les id d'événements
+-- suivent l'ordre de création, donc à peu près celui des dates : les
+-- partitions anciennes ne contiennent que des événements passés et peuvent
+-- être archivées (database/partitions.py).
+--
+-- Cette migration ne déplace aucune donnée : elle crée tickets_partitioned à
+-- côté de tickets et y recopie chaque écriture par un trigger. La copie de
+-- l'existant et la bascule se font ensuite en ligne :
+--     flask --app index tickets-partition
+
+CREATE OR REPLACE FUNCTION tickets_partition_width() RETURNS INTEGER AS $$
+    SELECT 1000
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE TABLE IF NOT EXISTS tickets_partitioned (
+    id INTEGER NOT NULL DEFAULT nextval('tickets_id_seq'),
+    event_id INTEGER REFERENCES events(id) ON DELETE CASCADE,
+    attendee_id INTEGER REFERENCES attendees(id) ON DELETE CASCADE,
+    registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Une clé unique doit contenir la clé de partition : pas de PRIMARY KEY
+    -- (id) sur la table mère, chaque partition a la sienne.
+    CONSTRAINT tickets_part_event_attendee_key UNIQUE (event_id, attendee_id)
+) PARTITION BY RANGE (event_id);
+CREATE INDEX IF NOT EXISTS tickets_part_attendee_id_idx ON tickets_partitioned (attendee_id);
+
+-- Billets d'un event_id sans partition (plage archivée, ou créée trop tard).
+CREATE TABLE IF NOT EXISTS tickets_default PARTITION OF tickets_partitioned (PRIMARY KEY (id)) DEFAULT;
+
+-- Partitions détachées de tickets ; peuvent vivre dans un autre tablespace.
+CREATE TABLE IF NOT EXISTS tickets_archive (
+    id INTEGER NOT NULL,
+    event_id INTEGER REFERENCES events(id) ON DELETE CASCADE,
+    attendee_id INTEGER REFERENCES attendees(id) ON DELETE CASCADE,
+    registered_at TIMESTAMP,
+    CONSTRAINT tickets_archive_event_attendee_key UNIQUE (event_id, attendee_id)
+) PARTITION BY RANGE (event_id);
+CREATE INDEX IF NOT EXISTS tickets_archive_attendee_id_idx ON tickets_archive (attendee_id);
+
+-- Les compteurs de 0007 incluent les billets archivés : la suppression en
+-- cascade d'un participant ou d'un événement doit aussi les décompter.
+DROP TRIGGER IF EXISTS tickets_archive_counters_delete ON tickets_archive;
+CREATE TRIGGER tickets_archive_counters_delete
+    AFTER DELETE ON tickets_archive REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION counters_tickets();
+
+-- Crée les partitions manquantes jusqu'à `ahead` plages au-delà du plus
+-- grand id d'événement. Une plage déjà archivée garde son nom et n'est pas
+-- recréée ; une plage dont des billets sont tombés dans tickets_default est
+-- laissée telle quelle (la créer échouerait).
+CREATE OR REPLACE FUNCTION tickets_ensure_partitions(ahead INTEGER) RETURNS INTEGER AS $$
+DECLARE
+    width INTEGER := tickets_partition_width();
+    parent REGCLASS;
+    high BIGINT;
+    low BIGINT := 0;
+    created INTEGER := 0;
+BEGIN
+    -- Avant la bascule, la table partitionnée s'appelle tickets_partitioned.
+    SELECT c.oid INTO parent FROM pg_class c
+    WHERE c.relname IN ('tickets', 'tickets_partitioned') AND c.relkind = 'p'
+      AND c.relnamespace = current_schema()::regnamespace;
+    IF parent IS NULL THEN
+        RETURN 0;
+    END IF;
+    SELECT (COALESCE(MAX(id), 0) / width + 1 + ahead) * width INTO high FROM events;
+    WHILE low < high LOOP
+        IF to_regclass(quote_ident('tickets_p' || low)) IS NULL
+           AND NOT EXISTS (SELECT 1 FROM tickets_default WHERE event_id >= low AND event_id < low + width) THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %s (PRIMARY KEY (id)) FOR VALUES FROM (%s) TO (%s)',
+                           'tickets_p' || low, parent, low, low + width);
+            created := created + 1;
+        END IF;
+        low := low + width;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT tickets_ensure_partitions(2);
+
+-- Billets actifs et archivés : ce que lisent les recomptages complets
+-- (statistiques, places, compteurs). Une vue suit la table et non son nom,
+-- d'où la fonction, rappelée après la bascule.
+CREATE OR REPLACE FUNCTION tickets_history_refresh() RETURNS void AS $$
+BEGIN
+    CREATE OR REPLACE VIEW tickets_history AS
+        SELECT id, event_id, attendee_id, registered_at FROM tickets
+        UNION ALL
+        SELECT id, event_id, attendee_id, registered_at FROM tickets_archive;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT tickets_history_refresh();
+
+-- Recopie des écritures pendant la migration. Même transaction que
+-- l'écriture : un instantané voit les deux tables dans le même état.
+CREATE OR REPLACE FUNCTION tickets_partition_mirror() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        TRUNCATE tickets_partitioned;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM tickets_partitioned
+        WHERE event_id = OLD.event_id AND attendee_id = OLD.attendee_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO tickets_partitioned (id, event_id, attendee_id, registered_at)
+        VALUES (NEW.id, NEW.event_id, NEW.attendee_id, NEW.registered_at)
+        ON CONFLICT (event_id, attendee_id) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tickets_partition_mirror ON tickets;
+CREATE TRIGGER tickets_partition_mirror
+    AFTER INSERT OR UPDATE OR DELETE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_partition_mirror();
+DROP TRIGGER IF EXISTS tickets_partition_mirror_truncate ON tickets;
+CREATE TRIGGER tickets_partition_mirror_truncate
+    AFTER TRUNCATE ON tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION tickets_partition_mirror();
+
+-- Bascule, une fois la copie terminée : l'ancienne table devient
+-- tickets_legacy (plus aucun trigger), la table partitionnée prend le nom
+-- tickets et les triggers de 0007 et 0009. L'appelant pose le verrou.
+CREATE OR REPLACE FUNCTION tickets_partition_swap() RETURNS void AS $$
+BEGIN
+    DROP TRIGGER tickets_partition_mirror ON tickets;
+    DROP TRIGGER tickets_partition_mirror_truncate ON tickets;
+    DROP TRIGGER tickets_counters_insert ON tickets;
+    DROP TRIGGER tickets_counters_delete ON tickets;
+    DROP TRIGGER tickets_counters_update ON tickets;
+    DROP TRIGGER tickets_change_feed_insert ON tickets;
+    DROP TRIGGER tickets_change_feed_delete ON tickets;
+    DROP TRIGGER tickets_change_feed_update ON tickets;
+
+    ALTER TABLE tickets RENAME TO tickets_legacy;
+    ALTER TABLE tickets_partitioned RENAME TO tickets;
+    ALTER SEQUENCE tickets_id_seq OWNED BY tickets.id;
+
+    CREATE TRIGGER tickets_counters_insert
+        AFTER INSERT ON tickets REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION counters_tickets();
+    CREATE TRIGGER tickets_counters_delete
+        AFTER DELETE ON tickets REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION counters_tickets();
+    CREATE TRIGGER tickets_counters_update
+        AFTER UPDATE ON tickets REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION counters_tickets();
+    CREATE TRIGGER tickets_change_feed_insert
+        AFTER INSERT ON tickets REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION change_feed_tickets();
+    CREATE TRIGGER tickets_change_feed_delete
+        AFTER DELETE ON tickets REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION change_feed_tickets();
+    CREATE TRIGGER tickets_change_feed_update
+        AFTER UPDATE ON tickets REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION change_feed_tickets();
+
+    PERFORM tickets_history_refresh();
+END;
+$$ LANGUAGE plpgsql;
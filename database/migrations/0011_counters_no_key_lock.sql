@@ -0,0 +1,40 @@
+-- counters_add (0007) verrouillait les lignes parentes FOR UPDATE. Or chaque
+-- INSERT dans tickets ou events a déjà pris FOR KEY SHARE sur ces mêmes
+-- lignes (contrôle de clé étrangère, et capacity._claim sur le
+-- participant) : deux inscriptions du même participant à deux événements
+-- s'attendaient mutuellement, et l'ordre des id n'y changeait rien puisque
+-- le KEY SHARE est pris avant, par l'INSERT.
+--
+-- FOR NO KEY UPDATE, le verrou que prend de toute façon l'UPDATE d'une
+-- colonne hors clé, ne bloque pas FOR KEY SHARE. L'ordre des id reste utile
+-- entre deux mises à jour de compteurs concurrentes.
+CREATE OR REPLACE FUNCTION counters_add(tbl TEXT, ids INTEGER[], deltas BIGINT[]) RETURNS void AS $$
+BEGIN
+    IF ids IS NULL THEN
+        RETURN;
+    END IF;
+    IF tbl = 'events' THEN
+        PERFORM 1 FROM events
+        WHERE id IN (SELECT d.id FROM unnest(ids, deltas) AS d(id, delta) WHERE d.delta <> 0)
+        ORDER BY id FOR NO KEY UPDATE;
+        UPDATE events e SET ticket_count = e.ticket_count + d.delta
+        FROM unnest(ids, deltas) AS d(id, delta)
+        WHERE e.id = d.id AND d.delta <> 0;
+    ELSIF tbl = 'attendees' THEN
+        PERFORM 1 FROM attendees
+        WHERE id IN (SELECT d.id FROM unnest(ids, deltas) AS d(id, delta) WHERE d.delta <> 0)
+        ORDER BY id FOR NO KEY UPDATE;
+        UPDATE attendees a SET event_count = a.event_count + d.delta
+        FROM unnest(ids, deltas) AS d(id, delta)
+        WHERE a.id = d.id AND d.delta <> 0;
+    ELSE
+        PERFORM 1 FROM organizers
+        WHERE id IN (SELECT d.id FROM unnest(ids, deltas) AS d(id, delta) WHERE d.delta <> 0)
+        ORDER BY id FOR NO KEY UPDATE;
+        UPDATE organizers o SET event_count = o.event_count + d.delta
+        FROM unnest(ids, deltas) AS d(id, delta)
+        WHERE o.id = d.id AND d.delta <> 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
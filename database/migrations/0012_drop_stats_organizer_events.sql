@@ -0,0 +1,4 @@
+-- Le tableau de bord lit organizers.event_count, tenu par les triggers de
+-- 0007 : stats_organizer_events n'avait plus de lecteur, et chaque écriture
+-- d'événement y payait un upsert de plus sur une ligne disputée.
+DROP TABLE IF EXISTS stats_organizer_events;
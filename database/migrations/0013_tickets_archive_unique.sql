@@ -0,0 +1,22 @@
+-- Une plage archivée n'a plus de partition dans tickets : ses nouveaux
+-- billets tombent dans tickets_default, dont la clé unique ne voit pas
+-- tickets_archive. Sans ce contrôle, un participant pouvait être inscrit une
+-- seconde fois à un événement archivé. L'archive ne reçoit de lignes qu'en
+-- rattachant une partition (database/partitions.py) : la vérification n'a
+-- pas de course avec une insertion concurrente.
+CREATE OR REPLACE FUNCTION tickets_default_archive_unique() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM tickets_archive
+               WHERE event_id = NEW.event_id AND attendee_id = NEW.attendee_id) THEN
+        RAISE unique_violation USING
+            MESSAGE = format('ticket (%s, %s) already in tickets_archive', NEW.event_id, NEW.attendee_id),
+            CONSTRAINT = 'tickets_archive_event_attendee_key';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tickets_default_archive_unique ON tickets_default;
+CREATE TRIGGER tickets_default_archive_unique
+    BEFORE INSERT OR UPDATE OF event_id, attendee_id ON tickets_default
+    FOR EACH ROW EXECUTE FUNCTION tickets_default_archive_unique();
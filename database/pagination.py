@@ -0,0 +1,106 @@
+import base64
+import binascii
+import json
+import time
+
+# Tables below this size are counted exactly; above it pg_class.reltuples
+# is close enough for a page count and costs nothing.
+EXACT_COUNT_THRESHOLD = 10000
+COUNT_CACHE_TTL = 60
+
+_count_cache = {}
+
+
+def encode_cursor(values, direction="next"):
+    payload = json.dumps([direction, list(values)], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return (values, direction) or (None, "next") for a missing/invalid cursor"""
+    if not token:
+        return None, "next"
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        return None, "next"
+    if direction not in ("next", "prev") or not isinstance(values, list):
+        return None, "next"
+    return values, direction
+
+
+def estimated_count(cur, table):
+    """Row count for ``table``, cached per worker for COUNT_CACHE_TTL seconds"""
+    now = time.monotonic()
+    cached = _count_cache.get(table)
+    if cached and now - cached[1] < COUNT_CACHE_TTL:
+        return cached[0]
+
+    cur.execute(
+        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+        (table,)
+    )
+    row = cur.fetchone()
+    count = row[0] if row else -1
+    # reltuples is -1 (or stale) until the table has been analyzed.
+    if count < EXACT_COUNT_THRESHOLD:
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        count = cur.fetchone()[0]
+
+    _count_cache[table] = (count, now)
+    return count
+
+
+def invalidate_count(table):
+    _count_cache.pop(table, None)
+
+
+class KeysetPage:
+    def __init__(self, rows, next_cursor, prev_cursor):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def fetch_keyset_page(cur, sql, columns, key, cursor, per_page,
+                      descending=False, params=()):
+    """Run ``sql`` as one keyset page.
+
+    ``sql`` must contain a ``{keyset}`` placeholder usable in a WHERE clause,
+    an ``{order}`` placeholder for the ORDER BY list and end with
+    ``LIMIT %s``. ``columns`` are the ordering columns (last one unique) and
+    ``key(row)`` extracts their values from a result row.
+    """
+    values, direction = decode_cursor(cursor)
+    if values is not None and len(values) != len(columns):
+        values, direction = None, "next"
+    backwards = direction == "prev"
+    desc = descending != backwards
+
+    if values is None:
+        keyset, keyset_params = "TRUE", ()
+    else:
+        op = "<" if desc else ">"
+        placeholders = ", ".join(["%s"] * len(columns))
+        keyset = f"({', '.join(columns)}) {op} ({placeholders})"
+        keyset_params = tuple(values)
+    order = ", ".join(f"{c} {'DESC' if desc else 'ASC'}" for c in columns)
+
+    cur.execute(
+        sql.format(keyset=keyset, order=order),
+        tuple(params) + keyset_params + (per_page + 1,)
+    )
+    rows = cur.fetchall()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, values is not None
+
+    next_cursor = encode_cursor(key(rows[-1]), "next") if rows and has_next else None
+    prev_cursor = encode_cursor(key(rows[0]), "prev") if rows and has_prev else None
+    return KeysetPage(rows, next_cursor, prev_cursor)
@@ -0,0 +1,194 @@
+"""Range partitions of tickets by event_id, and their archive (migration 0010).
+
+Migration 0010 creates tickets_partitioned next to tickets and a row
+trigger mirrors every write into it. ``backfill`` copies the existing rows
+in id ranges, one short transaction each, and ``swap`` exchanges the two
+tables under a brief exclusive lock; the old heap stays as tickets_legacy
+until dropped. The app keeps running on tickets throughout.
+
+A partition holds ``tickets_partition_width()`` consecutive event ids.
+Once every event of a range is older than the retention, ``archive``
+detaches its partition from tickets and attaches it to tickets_archive,
+optionally on another tablespace (a compressed volume, cheaper disks).
+Routes read tickets, so they only plan and scan the active partitions;
+full recounts (stats, seats, counters) read the tickets_history view.
+"""
+import re
+
+import psycopg2
+from psycopg2.extensions import quote_ident
+
+PARTITION_NAME = re.compile(r"^tickets_p(\d+)$")
+
+
+def state(cur):
+    """'legacy' (0010 not applied), 'migrating' or 'partitioned'"""
+    cur.execute("""
+        SELECT c.relname, c.relkind FROM pg_class c
+        WHERE c.relname IN ('tickets', 'tickets_partitioned')
+          AND c.relnamespace = current_schema()::regnamespace
+    """)
+    kinds = dict(cur.fetchall())
+    if kinds.get("tickets") == "p":
+        return "partitioned"
+    if "tickets_partitioned" in kinds:
+        return "migrating"
+    return "legacy"
+
+
+def ensure(cur, ahead=2):
+    """Create the partitions of the next ``ahead`` ranges; returns how many"""
+    cur.execute("SELECT tickets_ensure_partitions(%s)", (ahead,))
+    return cur.fetchone()[0]
+
+
+# ---------------------- migration ----------------------
+
+def backfill(conn, batch=50000, echo=print):
+    """Copy tickets into tickets_partitioned, ``batch`` ids per transaction.
+
+    FOR SHARE makes a concurrent delete or update of a row being copied
+    wait for the copy to commit, so the mirror trigger then applies it to
+    the copied row instead of the copy resurrecting it.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MIN(id), 1) - 1, COALESCE(MAX(id), 0) FROM tickets")
+    low, high = cur.fetchone()
+    conn.commit()
+    copied = 0
+    for start in range(low, high, batch):
+        cur.execute("""
+            INSERT INTO tickets_partitioned (id, event_id, attendee_id, registered_at)
+            SELECT id, event_id, attendee_id, registered_at FROM tickets
+            WHERE id > %s AND id <= %s
+            FOR SHARE
+            ON CONFLICT (event_id, attendee_id) DO NOTHING
+        """, (start, start + batch))
+        copied += cur.rowcount
+        conn.commit()
+        echo(f"  id <= {min(start + batch, high)} : {copied} billet(s) copié(s)")
+    cur.close()
+    return copied
+
+
+def verify(cur):
+    """(rows in tickets, rows in tickets_partitioned), from one snapshot"""
+    cur.execute("SELECT (SELECT COUNT(*) FROM tickets), (SELECT COUNT(*) FROM tickets_partitioned)")
+    return cur.fetchone()
+
+
+def swap(conn, lock_timeout=5.0):
+    """Rename tickets_partitioned to tickets and move the triggers over.
+
+    Waits at most ``lock_timeout`` seconds for the lock (LockNotAvailable
+    otherwise): queued behind a long query, the exclusive lock would block
+    every registration in the meantime.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SET LOCAL lock_timeout = %s", (f"{int(lock_timeout * 1000)}ms",))
+        cur.execute("LOCK TABLE tickets, tickets_partitioned IN ACCESS EXCLUSIVE MODE")
+        cur.execute("SELECT tickets_partition_swap()")
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    cur.execute("ANALYZE tickets")
+    conn.commit()
+    cur.close()
+
+
+# ---------------------- archive ----------------------
+
+def partitions(cur):
+    """[(name, parent, bounds, rows estimate, bytes, tablespace)] of tickets and the archive"""
+    cur.execute("""
+        SELECT c.relname, p.relname, pg_get_expr(c.relpartbound, c.oid),
+               GREATEST(c.reltuples, 0)::bigint, pg_total_relation_size(c.oid),
+               COALESCE(t.spcname, 'pg_default')
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        LEFT JOIN pg_tablespace t ON t.oid = c.reltablespace
+        WHERE p.relname IN ('tickets', 'tickets_partitioned', 'tickets_archive') AND p.relkind = 'p'
+          AND p.relnamespace = current_schema()::regnamespace
+        ORDER BY p.relname = 'tickets_archive', c.relname = 'tickets_default', length(c.relname), c.relname
+    """)
+    return cur.fetchall()
+
+
+def archivable(cur, older_than_days):
+    """Partitions of tickets whose events all happened ``older_than_days`` ago.
+
+    A range is only closed once the events id sequence has gone past it:
+    until then a new event could still land in it.
+    """
+    cur.execute("""
+        WITH p AS (
+            SELECT c.relname AS name, substr(c.relname, 10)::bigint AS low,
+                   tickets_partition_width() AS width
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'tickets'::regclass AND c.relname ~ '^tickets_p[0-9]+$'
+        )
+        SELECT p.name FROM p
+        WHERE p.low + p.width - 1 <= COALESCE(
+                  pg_sequence_last_value(pg_get_serial_sequence('events', 'id')::regclass), 0)
+          AND NOT EXISTS (
+              SELECT 1 FROM events e
+              WHERE e.id >= p.low AND e.id < p.low + p.width
+                AND e.date >= CURRENT_DATE - %s::int
+          )
+        ORDER BY p.low
+    """, (older_than_days,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def archive(conn, name, tablespace=None, lock_timeout=5.0):
+    """Move partition ``name`` from tickets to tickets_archive.
+
+    The bounds are first added as a CHECK constraint, validated without
+    blocking writes, so that attaching to tickets_archive needs no scan:
+    the exclusive lock on tickets is held only for two catalog updates.
+    Moving to ``tablespace`` rewrites the now archived table and its
+    indexes, which only blocks readers of tickets_history.
+    """
+    match = PARTITION_NAME.match(name)
+    if match is None:
+        raise ValueError(f"not a tickets range partition: {name}")
+    cur = conn.cursor()
+    cur.execute("SELECT tickets_partition_width()")
+    low = int(match.group(1))
+    high = low + cur.fetchone()[0]
+    timeout = f"{int(lock_timeout * 1000)}ms"
+    try:
+        # Déjà posée par une tentative précédente interrompue plus loin.
+        cur.execute("SELECT 1 FROM pg_constraint WHERE conname = %s", (f"{name}_bounds",))
+        if cur.fetchone() is None:
+            cur.execute("SET LOCAL lock_timeout = %s", (timeout,))
+            cur.execute(f"""
+                ALTER TABLE {name} ADD CONSTRAINT {name}_bounds
+                CHECK (event_id IS NOT NULL AND event_id >= {low} AND event_id < {high}) NOT VALID
+            """)
+            conn.commit()
+        cur.execute(f"ALTER TABLE {name} VALIDATE CONSTRAINT {name}_bounds")
+        conn.commit()
+
+        cur.execute("SET LOCAL lock_timeout = %s", (timeout,))
+        cur.execute(f"ALTER TABLE tickets DETACH PARTITION {name}")
+        cur.execute(f"ALTER TABLE tickets_archive ATTACH PARTITION {name} FOR VALUES FROM ({low}) TO ({high})")
+        conn.commit()
+
+        if tablespace:
+            cur.execute("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass", (name,))
+            indexes = [row[0] for row in cur.fetchall()]
+            tablespace = quote_ident(tablespace, cur)
+            cur.execute(f"ALTER TABLE {name} SET TABLESPACE {tablespace}")
+            for index in indexes:
+                cur.execute(f"ALTER INDEX {index} SET TABLESPACE {tablespace}")
+            conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,297 @@
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+class PooledConnection:
+    """Thin proxy around a psycopg2 connection handed out by the pool.
+
+    close() gives the connection back to the pool instead of closing the
+    socket, so existing ``conn.close()`` calls in the routes keep working.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+        # Routes close the connection themselves; when the checkout is owned
+        # by the app context the teardown handler does the real release.
+        self._owned_by_context = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        if self._owned_by_context:
+            return
+        self.release()
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool.putconn(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._raw.commit()
+        else:
+            self._raw.rollback()
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded, thread-safe psycopg2 connection pool (one per worker process)"""
+
+    def __init__(self, minconn=1, maxconn=10, timeout=5.0, max_idle=300.0,
+                 max_lifetime=3600.0, **conn_params):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.conn_params = conn_params
+
+        self._lock = threading.Condition()
+        self._idle = []           # [(conn, created_at, returned_at)]
+        self._created = {}        # id(conn) -> created_at
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+        for _ in range(minconn):
+            conn = self._connect()
+            self._idle.append((conn, self._created[id(conn)], time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.conn_params)
+        self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._created.pop(id(conn), None)
+        self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, created_at, returned_at):
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        # Only ping connections that sat idle long enough to have been cut
+        # by a firewall or a server restart.
+        if self.max_idle and now - returned_at > self.max_idle:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            with self._lock:
+                idle = self._reserve(deadline)
+            if idle is None:
+                break
+            # Ping outside the lock: a connection cut by a firewall can take
+            # seconds to fail, and every other checkout and return would wait.
+            conn, created_at, returned_at = idle
+            if self._is_healthy(conn, created_at, returned_at):
+                with self._lock:
+                    self._record_checkout(start)
+                return PooledConnection(self, conn)
+            with self._lock:
+                self._in_use -= 1
+                self._discard(conn)
+                self._lock.notify()
+
+        # Connect outside the lock so a slow handshake doesn't block returns.
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._record_checkout(start)
+        return PooledConnection(self, conn)
+
+    def _reserve(self, deadline):
+        """Under the lock: take an idle connection, or None once a slot is
+        reserved for a new one. The caller owns the slot either way."""
+        while True:
+            if self._idle:
+                self._in_use += 1
+                return self._idle.pop()
+            if self._in_use < self.maxconn:
+                self._in_use += 1
+                return None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._timeouts += 1
+                raise PoolTimeout(
+                    f"no database connection available after {self.timeout}s"
+                )
+            self._waiting += 1
+            try:
+                self._lock.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _record_checkout(self, start):
+        elapsed = time.monotonic() - start
+        self._checkouts += 1
+        self._checkout_time_total += elapsed
+        if elapsed > self._checkout_time_max:
+            self._checkout_time_max = elapsed
+
+    def putconn(self, conn):
+        broken = conn.closed
+        if not broken:
+            try:
+                # Never hand out a connection with a transaction left open.
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        with self._lock:
+            self._in_use -= 1
+            if broken:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, self._created.get(id(conn), time.monotonic()),
+                                   time.monotonic()))
+            self._lock.notify()
+
+    def closeall(self):
+        with self._lock:
+            for conn, _, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+
+    def stats(self):
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "pid": os.getpid(),
+                "max": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "checkout_ms_avg": round(self._checkout_time_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "checkout_ms_max": round(self._checkout_time_max * 1000, 3),
+            }
+
+
+class ProcessPool:
+    """One ConnectionPool per process for a given set of settings.
+
+    gunicorn forks workers after import, so a pool inherited from the master
+    process is dropped and rebuilt in the child. Calling the object returns
+    this process' pool, creating it on first use.
+    """
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        pid = os.getpid()
+        if self._pool is not None and self._pid == pid:
+            return self._pool
+        with self._lock:
+            if self._pool is None or self._pid != pid:
+                self._pool = ConnectionPool(**self.settings)
+                self._pid = pid
+        return self._pool
+
+
+def init_app(app, **conn_params):
+    """Bind one pooled connection per app context and return it on teardown.
+
+    With DB_REPLICAS set, ``get_connection()`` inside a read-only route
+    returns a replica connection instead (see database/routing.py);
+    ``get_connection(primary=True)`` always returns the primary.
+    """
+    from flask import g, has_app_context
+
+    from database import routing
+
+    # Un pool par application : deux apps d'un même processus (tests,
+    # benchmarks) gardent chacune leurs réglages.
+    pool = ProcessPool(
+        minconn=app.config.get("DB_POOL_MIN", 1),
+        maxconn=app.config.get("DB_POOL_MAX", 10),
+        timeout=app.config.get("DB_POOL_TIMEOUT", 5.0),
+        max_idle=app.config.get("DB_POOL_MAX_IDLE", 300.0),
+        max_lifetime=app.config.get("DB_POOL_MAX_LIFETIME", 3600.0),
+        **conn_params
+    )
+
+    router = routing.init_app(app, pool)
+
+    def get_connection(primary=False):
+        if not has_app_context():
+            return pool().getconn()
+        if not primary and router is not None and routing.use_replica():
+            # None en cache : aucun réplica sain, la requête lit sur le primaire.
+            if "_db_replica_conn" not in g:
+                g._db_replica_conn = router.getconn()
+                if g._db_replica_conn is not None:
+                    g._db_replica_conn._owned_by_context = True
+            if g._db_replica_conn is not None:
+                return g._db_replica_conn
+        conn = g.get("_db_conn")
+        if conn is None:
+            conn = pool().getconn()
+            conn._owned_by_context = True
+            g._db_conn = conn
+        return conn
+
+    @app.teardown_appcontext
+    def release_connection(exc):
+        for name in ("_db_conn", "_db_replica_conn"):
+            conn = g.pop(name, None)
+            if conn is not None:
+                conn.release()
+
+    app.extensions["db_pool"] = pool
+    app.extensions["db_replicas"] = router
+    app.extensions["db_connection"] = get_connection
+    return get_connection
@@ -0,0 +1,118 @@
+"""Column maps and queries behind the JSON API (api/v1.py).
+
+Each resource lists the fields a client may ask for, with the SQL that
+produces them and the join it needs. Only the requested fields are
+selected and only their joins are added, so a list of events without
+``description`` never reads the text column.
+"""
+from database.pagination import fetch_keyset_page
+
+
+class Resource:
+    def __init__(self, table, alias, fields, default, joins=None, filters=()):
+        self.table = table
+        self.alias = alias
+        # nom -> (expression SQL, jointure nécessaire ou None)
+        self.fields = fields
+        self.default = default
+        self.joins = joins or {}
+        self.filters = filters
+
+    def select(self, names):
+        """SELECT ... FROM ... JOIN ... for ``names`` (id is always included)"""
+        names = ["id"] + [name for name in names if name != "id"]
+        joins = []
+        for name in names:
+            join = self.fields[name][1]
+            if join is not None and join not in joins:
+                joins.append(join)
+        columns = ", ".join(f"{self.fields[name][0]} AS {name}" for name in names)
+        sql = f"SELECT {columns} FROM {self.table} {self.alias}"
+        for join in joins:
+            sql += " " + self.joins[join]
+        return names, sql
+
+
+RESOURCES = {
+    "events": Resource(
+        "events", "e",
+        {
+            "id": ("e.id", None),
+            "name": ("e.name", None),
+            "date": ("e.date", None),
+            "location": ("e.location", None),
+            "description": ("e.description", None),
+            "organizer_id": ("e.organizer_id", None),
+            "organizer_name": ("o.name", "organizer"),
+            "capacity": ("e.capacity", None),
+            "ticket_count": ("e.ticket_count", None),
+            "created_at": ("e.created_at", None),
+        },
+        default=("name", "date", "location", "organizer_id", "capacity"),
+        joins={
+            "organizer": "LEFT JOIN organizers o ON o.id = e.organizer_id",
+        },
+        filters=("organizer_id",),
+    ),
+    "organizers": Resource(
+        "organizers", "o",
+        {
+            "id": ("o.id", None),
+            "name": ("o.name", None),
+            "email": ("o.email", None),
+            "phone": ("o.phone", None),
+            "event_count": ("o.event_count", None),
+            "created_at": ("o.created_at", None),
+        },
+        default=("name", "email", "phone"),
+    ),
+    "attendees": Resource(
+        "attendees", "a",
+        {
+            "id": ("a.id", None),
+            "name": ("a.name", None),
+            "email": ("a.email", None),
+            "phone": ("a.phone", None),
+            "event_count": ("a.event_count", None),
+            "created_at": ("a.created_at", None),
+        },
+        default=("name", "email", "phone"),
+    ),
+    "tickets": Resource(
+        "tickets", "t",
+        {
+            "id": ("t.id", None),
+            "event_id": ("t.event_id", None),
+            "attendee_id": ("t.attendee_id", None),
+            "registered_at": ("t.registered_at", None),
+            "event_name": ("e.name", "event"),
+            "attendee_name": ("a.name", "attendee"),
+            "attendee_email": ("a.email", "attendee"),
+        },
+        default=("event_id", "attendee_id", "registered_at"),
+        joins={
+            "event": "JOIN events e ON e.id = t.event_id",
+            "attendee": "JOIN attendees a ON a.id = t.attendee_id",
+        },
+        filters=("event_id", "attendee_id"),
+    ),
+}
+
+
+def fetch_ids(cur, resource, names, ids):
+    """Rows for ``ids`` in one query, as (found dict by id, column names)"""
+    names, sql = resource.select(names)
+    cur.execute(sql + f" WHERE {resource.alias}.id = ANY(%s)", (list(ids),))
+    return {row[0]: row for row in cur.fetchall()}, names
+
+
+def fetch_page(cur, resource, names, filters, cursor, per_page):
+    """One keyset page ordered by id, with equality ``filters`` {field: value}"""
+    names, sql = resource.select(names)
+    where = [f"{resource.fields[field][0]} = %s" for field in filters]
+    sql += " WHERE " + " AND ".join(where + ["{keyset}"]) + " ORDER BY {order} LIMIT %s"
+    page = fetch_keyset_page(
+        cur, sql, (f"{resource.alias}.id",), lambda row: (row[0],),
+        cursor, per_page, params=tuple(filters.values())
+    )
+    return page, names
@@ -0,0 +1,204 @@
+"""Read-replica routing for the read-only routes.
+
+Routes decorated with ``read_only`` get their connection from a replica
+(DB_REPLICAS) on GET, round-robin over the replicas that passed their last
+health check. A replica is skipped when it cannot be reached or when its
+replay lag exceeds DB_REPLICA_MAX_LAG; with none left the route reads from
+the primary. After a request that may have written, the session stays on
+the primary for DB_STICKY_SECONDS, so the redirect that follows a POST
+always shows what was just written.
+
+Health checks run inline, at most once per DB_REPLICA_CHECK_INTERVAL per
+replica and process, by whichever request gets there first; no thread.
+"""
+import functools
+import itertools
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+from database.pool import ConnectionPool, PoolTimeout
+
+# Retard de rejeu en secondes ; 0 si le réplica a tout rejoué (un primaire
+# inactif ne fait pas croître le retard) ou si ce n'est pas un réplica.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END::float8
+"""
+
+
+class Replica:
+    def __init__(self, dsn, make_pool):
+        self.dsn = dsn
+        self.name = " ".join(f"{k}={v}" for k, v in parse_dsn(dsn).items() if k in ("host", "port", "dbname"))
+        self._make_pool = make_pool
+        self._pool = None
+        self._pool_pid = None
+        self._check_lock = threading.Lock()
+        self.healthy = True
+        self.lag = None
+        self.error = None
+        self.checked_at = 0.0
+        self.reads = 0
+
+    def pool(self):
+        # Même règle que database.pool.ProcessPool : un pool par processus.
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = self._make_pool()
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def mark_down(self, error):
+        self.healthy = False
+        self.error = str(error).strip()
+        self.checked_at = time.monotonic()
+
+
+class ReplicaRouter:
+    def __init__(self, dsns, make_pool, max_lag=5.0, check_interval=5.0):
+        self.replicas = [Replica(dsn, functools.partial(make_pool, dsn)) for dsn in dsns]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turn = itertools.count()
+        self.fallbacks = 0
+
+    def check(self, replica):
+        replica.checked_at = time.monotonic()
+        try:
+            conn = replica.pool().getconn()
+        except (psycopg2.Error, PoolTimeout) as exc:
+            replica.mark_down(exc)
+            return
+        try:
+            cur = conn.cursor()
+            cur.execute(LAG_SQL)
+            replica.lag = cur.fetchone()[0]
+            cur.close()
+            conn.rollback()
+        except psycopg2.Error as exc:
+            replica.mark_down(exc)
+        else:
+            replica.healthy = replica.lag <= self.max_lag
+            replica.error = None if replica.healthy else f"lag {replica.lag:.1f}s > {self.max_lag}s"
+        finally:
+            conn.release()
+
+    def _maybe_check(self, replica):
+        if time.monotonic() - replica.checked_at < self.check_interval:
+            return
+        # Un seul contrôle à la fois ; les autres requêtes gardent l'état connu.
+        if replica._check_lock.acquire(blocking=False):
+            try:
+                self.check(replica)
+            finally:
+                replica._check_lock.release()
+
+    def getconn(self):
+        """A pooled connection to the next healthy replica, or None"""
+        start = next(self._turn)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            self._maybe_check(replica)
+            if not replica.healthy:
+                continue
+            try:
+                conn = replica.pool().getconn()
+            except (psycopg2.Error, PoolTimeout) as exc:
+                replica.mark_down(exc)
+                continue
+            replica.reads += 1
+            return conn
+        self.fallbacks += 1
+        return None
+
+    def stats(self):
+        return {
+            "fallbacks": self.fallbacks,
+            "max_lag": self.max_lag,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag": replica.lag,
+                    "error": replica.error,
+                    "reads": replica.reads,
+                    "pool": replica.pool().stats(),
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+def read_only(view):
+    """Mark a route as safe to serve from a replica (GET/HEAD only)"""
+    from flask import g
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g._db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def use_replica():
+    """True inside a read-only GET that is not pinned to the primary"""
+    from flask import g, has_request_context, request, session
+
+    return (
+        has_request_context()
+        and request.method in ("GET", "HEAD")
+        and g.get("_db_read_only", False)
+        and session.get("_db_primary_until", 0) < time.time()
+    )
+
+
+def init_app(app, primary_pool):
+    """Replica router for ``app`` from DB_REPLICAS; None when unset"""
+    from flask import g, request, session
+    from flask_login import current_user
+
+    dsns = [dsn.strip() for dsn in app.config.get("DB_REPLICAS", "").split(";") if dsn.strip()]
+    if not dsns:
+        return None
+
+    def make_pool(dsn):
+        params = dict(primary_pool().conn_params)
+        params.update(parse_dsn(dsn))
+        # Garde-fou : un « réplica » qui serait en fait un primaire reste en lecture seule.
+        params.setdefault("options", "-c default_transaction_read_only=on")
+        params.setdefault("connect_timeout", 2)
+        return ConnectionPool(
+            minconn=0,
+            maxconn=app.config.get("DB_POOL_MAX", 10),
+            timeout=app.config.get("DB_POOL_TIMEOUT", 5.0),
+            max_idle=app.config.get("DB_POOL_MAX_IDLE", 300.0),
+            max_lifetime=app.config.get("DB_POOL_MAX_LIFETIME", 3600.0),
+            **params
+        )
+
+    sticky = app.config.get("DB_STICKY_SECONDS", 5.0)
+
+    @app.after_request
+    def stick_to_primary(response):
+        # Lecture de ses propres écritures : après une requête qui a pu écrire
+        # sur le primaire (tout POST, et les GET d'écriture comme
+        # /events/delete, réservés aux connectés), la session lit sur le
+        # primaire pendant ``sticky`` s. Les visiteurs anonymes ne reçoivent
+        # pas de cookie pour autant (pages publiques cachables).
+        if g.get("_db_conn") is None or g.get("_db_read_only", False):
+            return response
+        if request.method not in ("GET", "HEAD", "OPTIONS") or current_user.is_authenticated:
+            session["_db_primary_until"] = time.time() + sticky
+        return response
+
+    return ReplicaRouter(
+        dsns, make_pool,
+        max_lag=app.config.get("DB_REPLICA_MAX_LAG", 5.0),
+        check_interval=app.config.get("DB_REPLICA_CHECK_INTERVAL", 5.0)
+    )
@@ -0,0 +1,52 @@
+"""Ranked full-text search over events, attendees and organizers.
+
+Documents live in search_documents (migration 0004) and are kept current
+by triggers. A term matches on the tsvector, with every word treated as a
+prefix, or on trigram word similarity with the title, which catches typos.
+Results are ordered by score, then by (kind, ref_id), and paginated with
+keyset cursors like the lists.
+"""
+import re
+
+from database.pagination import KeysetPage, fetch_keyset_page
+
+KINDS = {"events": "event", "attendees": "attendee", "organizers": "organizer"}
+
+# pg_trgm's default word_similarity_threshold (0.6) misses most typos
+FUZZY_THRESHOLD = 0.4
+
+_WORD = re.compile(r"\w+")
+
+
+def tsquery_text(term):
+    """'conf paris' -> 'conf:* & paris:*' ; only word characters survive"""
+    return " & ".join(word + ":*" for word in _WORD.findall(term.lower()))
+
+
+def search(cur, term, kinds, cursor=None, per_page=20):
+    """One page of (kind, ref_id, title, subtitle, score) rows"""
+    query = tsquery_text(term)
+    if not query or not kinds:
+        return KeysetPage([], None, None)
+
+    cur.execute(
+        "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+        (str(FUZZY_THRESHOLD),)
+    )
+    return fetch_keyset_page(cur, """
+        SELECT * FROM (
+            SELECT d.kind, d.ref_id, d.title, d.subtitle,
+                   GREATEST(
+                       ts_rank(d.document, to_tsquery('simple', %s)),
+                       word_similarity(%s, d.title)
+                   )::float8 AS score
+            FROM search_documents d
+            WHERE d.kind = ANY(%s)
+              AND (d.document @@ to_tsquery('simple', %s) OR %s <%% d.title)
+        ) s
+        WHERE {keyset}
+        ORDER BY {order}
+        LIMIT %s
+    """, ("s.score", "s.kind", "s.ref_id"), lambda row: (row[4], row[0], row[1]),
+        cursor, per_page, descending=True,
+        params=(query, term, list(kinds), query, term))
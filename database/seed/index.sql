@@ -1,5 +1,21 @@
 -- Drop tables if they exist (for fresh start)
+-- Après le seed : flask --app index db-migrate (index secondaires, etc.)
+DROP TABLE IF EXISTS schema_version CASCADE;
+DROP TABLE IF EXISTS jobs CASCADE;
+DROP TABLE IF EXISTS cache_versions CASCADE;
+DROP TABLE IF EXISTS search_documents CASCADE;
+DROP TABLE IF EXISTS waitlist CASCADE;
+DROP TABLE IF EXISTS event_seats CASCADE;
+DROP TABLE IF EXISTS stats_state CASCADE;
+DROP TABLE IF EXISTS stats_attendee_buckets CASCADE;
+DROP TABLE IF EXISTS stats_monthly_attendees CASCADE;
+DROP TABLE IF EXISTS stats_event_tickets CASCADE;
+DROP TABLE IF EXISTS stats_organizer_events CASCADE;
+DROP TABLE IF EXISTS stats_totals CASCADE;
 DROP TABLE IF EXISTS tickets CASCADE;
+DROP TABLE IF EXISTS tickets_partitioned CASCADE;
+DROP TABLE IF EXISTS tickets_legacy CASCADE;
+DROP TABLE IF EXISTS tickets_archive CASCADE;
 DROP TABLE IF EXISTS events CASCADE;
 DROP TABLE IF EXISTS attendees CASCADE;
 DROP TABLE IF EXISTS organizers CASCADE;
@@ -34,6 +50,7 @@ CREATE TABLE attendees (
 );
 
 -- Create Tickets table (many-to-many relationship)
+-- Partitionnée ensuite par la migration 0010 et flask --app index tickets-partition
 CREATE TABLE tickets (
     id SERIAL PRIMARY KEY,
     event_id INTEGER REFERENCES events(id) ON DELETE CASCADE,
@@ -42,6 +59,31 @@ CREATE TABLE tickets (
     UNIQUE(event_id, attendee_id)
 );
 
+-- Dashboard summary tables (maintained by database/stats.py)
+CREATE TABLE stats_totals (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE stats_event_tickets (
+    event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,
+    ticket_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX stats_event_tickets_count_idx ON stats_event_tickets (ticket_count DESC);
+
+CREATE TABLE stats_attendee_buckets (
+    unit TEXT NOT NULL CHECK (unit IN ('day', 'week', 'month')),
+    bucket DATE NOT NULL,
+    attendees INTEGER NOT NULL DEFAULT 0,
+    tickets INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (unit, bucket)
+);
+
+CREATE TABLE stats_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    refreshed_at TIMESTAMP
+);
+
 -- Insert Organizers
 INSERT INTO organizers (name, email, phone) VALUES
 ('John Smith', 'john@email.com', '+1234567890'),
@@ -0,0 +1,189 @@
+"""Summary tables behind the dashboard.
+
+The single-statement writes (database/writes.py, database/capacity.py)
+update them in CTEs of the statement that changes the rows; the
+multi-statement paths (bulk registrations, waitlist promotion, CSV
+imports) call the hooks below in their transaction. The jobs worker
+rebuilds them in full once they are older than the configured staleness
+bound, or marked stale, which repairs anything that bypassed the hooks
+(psql, imports, ...). Requests only ever read them.
+"""
+
+# Identifiant du verrou consultatif pris pendant une reconstruction complète.
+REFRESH_LOCK_ID = 0x5747
+
+# Granularités de stats_attendee_buckets (noms acceptés par date_trunc)
+UNITS = ("day", "week", "month")
+
+
+def _add_total(cur, name, delta):
+    cur.execute("""
+        INSERT INTO stats_totals (name, value) VALUES (%s, %s)
+        ON CONFLICT (name) DO UPDATE SET value = stats_totals.value + EXCLUDED.value
+    """, (name, delta))
+
+
+# ---------------------- hooks ----------------------
+
+def attendee_created(cur, count=1):
+    _add_total(cur, "attendees", count)
+
+
+def tickets_added(cur, event_id, attendee_ids):
+    """Call after inserting tickets, with the ids actually inserted"""
+    if not attendee_ids:
+        return
+    cur.execute("""
+        UPDATE stats_event_tickets SET ticket_count = ticket_count + %s
+        WHERE event_id = %s
+    """, (len(attendee_ids), event_id))
+
+    # An attendee only counts once per bucket: skip those holding another
+    # ticket for an event in the same day / week / month.
+    cur.execute("""
+        WITH b AS (
+            SELECT e.id AS event_id, u.unit, date_trunc(u.unit, e.date)::date AS bucket,
+                   (date_trunc(u.unit, e.date) + ('1 ' || u.unit)::interval)::date AS bucket_end
+            FROM events e, unnest(%s::text[]) AS u(unit)
+            WHERE e.id = %s
+        ),
+        delta AS (
+            SELECT b.unit, b.bucket, COUNT(*) AS tickets,
+                   COUNT(*) FILTER (WHERE NOT EXISTS (
+                       SELECT 1 FROM tickets_history t
+                       JOIN events e2 ON e2.id = t.event_id
+                       WHERE t.attendee_id = a.id
+                         AND e2.id <> b.event_id
+                         AND e2.date >= b.bucket
+                         AND e2.date < b.bucket_end
+                   )) AS attendees
+            FROM b, unnest(%s::int[]) AS a(id)
+            GROUP BY b.unit, b.bucket
+        )
+        INSERT INTO stats_attendee_buckets (unit, bucket, attendees, tickets)
+        SELECT unit, bucket, attendees, tickets FROM delta
+        ON CONFLICT (unit, bucket)
+        DO UPDATE SET attendees = stats_attendee_buckets.attendees + EXCLUDED.attendees,
+                      tickets = stats_attendee_buckets.tickets + EXCLUDED.tickets
+    """, (list(UNITS), event_id, list(attendee_ids)))
+
+
+# ---------------------- rebuild / read ----------------------
+
+def refresh(cur):
+    """Rebuild every summary table from the base tables"""
+    # DELETE rather than TRUNCATE: readers keep seeing the old rows (MVCC)
+    # instead of queueing behind an ACCESS EXCLUSIVE lock.
+    for table in ("stats_totals", "stats_event_tickets", "stats_attendee_buckets"):
+        cur.execute(f"DELETE FROM {table}")
+    cur.execute("""
+        INSERT INTO stats_totals (name, value)
+        SELECT 'events', COUNT(*) FROM events
+        UNION ALL SELECT 'attendees', COUNT(*) FROM attendees
+        UNION ALL SELECT 'organizers', COUNT(*) FROM organizers
+    """)
+    cur.execute("""
+        INSERT INTO stats_event_tickets (event_id, ticket_count)
+        SELECT e.id, COUNT(t.id)
+        FROM events e
+        LEFT JOIN tickets_history t ON e.id = t.event_id
+        GROUP BY e.id
+    """)
+    cur.execute("""
+        INSERT INTO stats_attendee_buckets (unit, bucket, attendees, tickets)
+        SELECT u.unit, date_trunc(u.unit, e.date)::date, COUNT(DISTINCT t.attendee_id), COUNT(t.id)
+        FROM events e
+        LEFT JOIN tickets_history t ON e.id = t.event_id
+        CROSS JOIN unnest(%s::text[]) AS u(unit)
+        GROUP BY 1, 2
+    """, (list(UNITS),))
+    cur.execute("""
+        INSERT INTO stats_state (id, refreshed_at) VALUES (TRUE, NOW())
+        ON CONFLICT (id) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+    """)
+
+
+def mark_stale(cur):
+    """Ask for a full rebuild at the jobs worker's next maintenance (bulk loads, imports)"""
+    cur.execute("UPDATE stats_state SET refreshed_at = NULL")
+
+
+def refresh_if_stale(conn, max_staleness):
+    """Rebuild the summaries when stale or older than ``max_staleness`` seconds.
+
+    Run by the jobs worker's maintenance and ``flask stats-refresh``, never
+    by a request. Only one process rebuilds at a time; the others skip it.
+    Returns whether this call rebuilt them.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT refreshed_at IS NULL
+               OR refreshed_at < NOW() - %s * INTERVAL '1 second'
+        FROM stats_state RIGHT JOIN (SELECT TRUE AS id) one USING (id)
+    """, (max_staleness,))
+    stale = cur.fetchone()[0]
+    rebuilt = False
+    if stale:
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (REFRESH_LOCK_ID,))
+        rebuilt = cur.fetchone()[0]
+        if rebuilt:
+            refresh(cur)
+    conn.commit()
+    cur.close()
+    return rebuilt
+
+
+def load_totals(cur):
+    """The dashboard's headline numbers; the charts load from the API"""
+    cur.execute("SELECT name, value FROM stats_totals")
+    totals = dict(cur.fetchall())
+    return {
+        "total_events": totals.get("events", 0),
+        "total_attendees": totals.get("attendees", 0),
+        "total_organizers": totals.get("organizers", 0),
+    }
+
+
+def series(cur, unit, start, end):
+    """Buckets of ``unit`` from ``start`` to ``end`` (inclusive), zero-filled"""
+    cur.execute("""
+        SELECT g.bucket::date, COALESCE(s.attendees, 0), COALESCE(s.tickets, 0)
+        FROM generate_series(
+            date_trunc(%s, %s::date), date_trunc(%s, %s::date), ('1 ' || %s)::interval
+        ) AS g(bucket)
+        LEFT JOIN stats_attendee_buckets s ON s.unit = %s AND s.bucket = g.bucket::date
+        ORDER BY 1
+    """, (unit, start, unit, end, unit, unit))
+    rows = cur.fetchall()
+    return {
+        "buckets": [row[0] for row in rows],
+        "attendees": [row[1] for row in rows],
+        "tickets": [row[2] for row in rows],
+    }
+
+
+def top_organizers(cur, top):
+    """The ``top`` organizers by event count, and the events of all the others"""
+    cur.execute("""
+        SELECT name, event_count FROM organizers
+        ORDER BY event_count DESC, id
+        LIMIT %s
+    """, (top,))
+    rows = cur.fetchall()
+    # Compteurs tenus par trigger (migration 0007) : pas de COUNT sur events.
+    cur.execute("SELECT COALESCE(SUM(event_count), 0) FROM organizers")
+    other = cur.fetchone()[0] - sum(row[1] for row in rows)
+    return {"names": [row[0] for row in rows], "counts": [row[1] for row in rows], "other": other}
+
+
+def popular_events(cur, top):
+    cur.execute("""
+        SELECT e.id, e.name, s.ticket_count
+        FROM stats_event_tickets s
+        JOIN events e ON e.id = s.event_id
+        ORDER BY s.ticket_count DESC
+        LIMIT %s
+    """, (top,))
+    rows = cur.fetchall()
+    return {"ids": [row[0] for row in rows], "names": [row[1] for row in rows],
+            "counts": [row[2] for row in rows]}
@@ -0,0 +1,72 @@
+from database import capacity, jobs, stats, versions
+
+
+def register_many(cur, event_id, attendee_ids):
+    """Register every attendee in ``attendee_ids`` for ``event_id``.
+
+    Already registered attendees are skipped instead of aborting the batch,
+    and ids that match no attendee, or whose attendee is deleted
+    concurrently, are ignored rather than tripping the foreign key. Seats are claimed once for the whole batch, and whoever
+    does not fit goes on the waitlist in request order. Returns a dict of
+    counts, or None when the event does not exist. The caller commits.
+    """
+    cur.execute("""
+        WITH requested AS (
+            SELECT id, MIN(position) AS position
+            FROM unnest(%s::int[]) WITH ORDINALITY AS r(id, position)
+            GROUP BY id
+        ),
+        -- Verrou gardé jusqu'au commit : un participant supprimé en même
+        -- temps est attendu puis ignoré, au lieu de faire échouer l'INSERT
+        -- des billets sur la clé étrangère.
+        valid AS (
+            SELECT r.id, r.position FROM requested r JOIN attendees a ON a.id = r.id
+            ORDER BY a.id
+            FOR KEY SHARE OF a
+        )
+        SELECT EXISTS (SELECT 1 FROM events WHERE id = %s),
+               (SELECT COUNT(*) FROM requested),
+               (SELECT COUNT(*) FROM valid),
+               COALESCE((
+                   SELECT array_agg(v.id ORDER BY v.position) FROM valid v
+                   WHERE NOT EXISTS (
+                       -- Billets archivés compris : tickets_default ne les voit pas.
+                       SELECT 1 FROM tickets_history t WHERE t.event_id = %s AND t.attendee_id = v.id
+                   )
+               ), '{}')
+    """, (list(attendee_ids), event_id, event_id))
+    event_exists, requested, valid, candidates = cur.fetchone()
+    if not event_exists:
+        return None
+
+    seated, overflow = capacity.claim_for_bulk(cur, event_id, candidates)
+    inserted_ids = []
+    if seated:
+        cur.execute("""
+            INSERT INTO tickets (event_id, attendee_id)
+            SELECT %s, id FROM unnest(%s::int[]) AS r(id)
+            ON CONFLICT (event_id, attendee_id) DO NOTHING
+            RETURNING attendee_id
+        """, (event_id, seated))
+        inserted_ids = [row[0] for row in cur.fetchall()]
+        if len(inserted_ids) < len(seated):
+            # Inscrits entre-temps par une autre requête : places rendues.
+            capacity.release(cur, event_id, len(seated) - len(inserted_ids))
+        if inserted_ids:
+            cur.execute(
+                "DELETE FROM waitlist WHERE event_id = %s AND attendee_id = ANY(%s)",
+                (event_id, inserted_ids)
+            )
+    waitlisted = capacity.enqueue(cur, event_id, overflow)
+
+    stats.tickets_added(cur, event_id, inserted_ids)
+    jobs.registered(cur, event_id, inserted_ids)
+    if inserted_ids or waitlisted:
+        versions.bump(cur, versions.event(event_id))
+    return {
+        "requested": requested,
+        "inserted": len(inserted_ids),
+        "already_registered": valid - len(candidates),
+        "waitlisted": waitlisted,
+        "unknown": requested - valid,
+    }
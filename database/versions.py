@@ -0,0 +1,48 @@
+"""Version stamps behind the public page cache.
+
+Writers call ``bump`` inside their own transaction, the same way they call
+the stats hooks, so a page's version changes in the same commit as the data
+it shows. Readers load the stamps with one primary-key query and build
+their ETag and fragment cache key from them.
+"""
+EVENTS = "events"
+ORGANIZERS = "organizers"
+ATTENDEES = "attendees"
+
+
+def event(event_id):
+    return f"event:{event_id}"
+
+
+def bump(cur, *scopes):
+    # Ordre stable : deux transactions qui incrémentent les mêmes portées
+    # verrouillent les lignes dans le même ordre (pas d'interblocage).
+    cur.execute("""
+        INSERT INTO cache_versions (scope, version, updated_at)
+        SELECT scope, 1, clock_timestamp() FROM unnest(%s::text[]) AS scope
+        ON CONFLICT (scope) DO UPDATE
+        SET version = cache_versions.version + 1,
+            updated_at = GREATEST(cache_versions.updated_at, clock_timestamp())
+    """, (sorted(set(scopes)),))
+
+
+def bump_all(cur):
+    """After writes that bypassed the hooks (imports, bulk loads, psql)"""
+    cur.execute("""
+        UPDATE cache_versions
+        SET version = version + 1, updated_at = GREATEST(updated_at, clock_timestamp())
+    """)
+    bump(cur, EVENTS, ORGANIZERS, ATTENDEES)
+
+
+def load(cur, scopes):
+    """Return (versions tuple in ``scopes`` order, latest updated_at or None)"""
+    cur.execute("""
+        SELECT COALESCE(v.version, 0), v.updated_at
+        FROM unnest(%s::text[]) WITH ORDINALITY AS s(scope, position)
+        LEFT JOIN cache_versions v ON v.scope = s.scope
+        ORDER BY s.position
+    """, (list(scopes),))
+    rows = cur.fetchall()
+    stamps = [row[1] for row in rows if row[1] is not None]
+    return tuple(row[0] for row in rows), max(stamps) if stamps else None
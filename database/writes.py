@@ -0,0 +1,336 @@
+"""Write paths of index.py, one statement per mutation.
+
+Each write below is a single SQL statement: the row change and its side
+effects (stats_* summaries, cache_versions, jobs) are data-modifying CTEs
+of that statement, so they commit together without a check-then-act
+window between a SELECT and the write. ``run`` executes such a write in
+autocommit mode when the connection has no open transaction: the
+statement is its own transaction and the mutation costs one round trip
+(no BEGIN, no COMMIT). Single registrations are written the same way in
+database/capacity.py; writes spanning several statements (bulk
+registrations, waitlist promotion) run in a normal transaction.
+
+Either way ``run`` retries the whole write on serialization failure or
+deadlock; every write here is safe to replay since nothing of a failed
+attempt was committed.
+
+All CTEs of a statement see the same snapshot, taken before any of them
+ran: a CTE reading events after another one updated them still sees the
+old rows. The bucket recounts below therefore describe the events table
+as it will be (``after``) instead of reading it back.
+"""
+import logging
+import random
+import time
+
+from psycopg2 import errors, extensions
+
+from database import jobs, stats, versions
+
+logger = logging.getLogger("sge.writes")
+
+RETRIES = 3
+RETRY_BACKOFF = 0.02   # secondes, doublé à chaque nouvel essai (avec gigue)
+
+# Compteurs du processus, exposés sur /metrics.
+retry_counts = {"retried": 0, "gave_up": 0}
+
+_RETRYABLE = (errors.SerializationFailure, errors.DeadlockDetected)
+
+
+def single_statement(write):
+    """Mark a write that issues exactly one statement (autocommit-safe)"""
+    write.single_statement = True
+    return write
+
+
+def run(conn, write, *args, retries=RETRIES):
+    """Run ``write(cur, *args)``, commit, and return its result.
+
+    Retries up to ``retries`` times on serialization failure or deadlock,
+    after a short randomized backoff; other errors roll back and propagate.
+    """
+    raw = getattr(conn, "raw", conn)
+    # Transaction déjà ouverte (une lecture plus tôt dans la requête) : on
+    # écrit dedans plutôt que de payer un ROLLBACK pour passer en autocommit.
+    autocommit = (
+        getattr(write, "single_statement", False)
+        and raw.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+    )
+    attempt = 0
+    while True:
+        if autocommit:
+            raw.autocommit = True
+        cur = raw.cursor()
+        try:
+            result = write(cur, *args)
+            if not autocommit:
+                raw.commit()
+            return result
+        except _RETRYABLE as exc:
+            raw.rollback()
+            if attempt >= retries:
+                retry_counts["gave_up"] += 1
+                raise
+            attempt += 1
+            retry_counts["retried"] += 1
+            logger.info("%s: %s, retry %d/%d", write.__name__, exc.pgcode, attempt, retries)
+            time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+        except BaseException:
+            if not raw.closed:
+                raw.rollback()
+            raise
+        finally:
+            cur.close()
+            if autocommit:
+                raw.autocommit = False
+
+
+# ---------------------- CTE fragments ----------------------
+
+def _add_total(cte, name, sign, source):
+    # Une ligne seulement si la source en a : pas de verrou inutile sur la
+    # ligne très sollicitée de stats_totals quand rien n'a changé.
+    return f"""
+    {cte} AS (
+        INSERT INTO stats_totals (name, value)
+        SELECT '{name}', {sign}COUNT(*) FROM {source} HAVING COUNT(*) > 0
+        ON CONFLICT (name) DO UPDATE SET value = stats_totals.value + EXCLUDED.value
+    )"""
+
+
+def _bump(cte, scopes):
+    """``scopes`` yields one text scope per row; same upsert as versions.bump"""
+    return f"""
+    {cte} AS (
+        INSERT INTO cache_versions (scope, version, updated_at)
+        SELECT DISTINCT scope, 1, clock_timestamp() FROM ({scopes}) AS s(scope)
+        ORDER BY scope
+        ON CONFLICT (scope) DO UPDATE
+        SET version = cache_versions.version + 1,
+            updated_at = GREATEST(cache_versions.updated_at, clock_timestamp())
+    )"""
+
+
+def _recount_buckets(cte, days, after):
+    """Recount the buckets holding ``days``, over the events relation ``after``"""
+    return f"""
+    {cte} AS (
+        INSERT INTO stats_attendee_buckets (unit, bucket, attendees, tickets)
+        SELECT b.unit, b.bucket, COUNT(DISTINCT t.attendee_id), COUNT(t.id)
+        FROM (
+            SELECT DISTINCT u.unit, date_trunc(u.unit, d.day)::date AS bucket,
+                   (date_trunc(u.unit, d.day) + ('1 ' || u.unit)::interval)::date AS bucket_end
+            FROM ({days}) AS d(day), unnest(%(units)s::text[]) AS u(unit)
+            WHERE d.day IS NOT NULL
+        ) b
+        LEFT JOIN ({after}) e ON e.date >= b.bucket AND e.date < b.bucket_end
+        LEFT JOIN tickets_history t ON t.event_id = e.id
+        GROUP BY b.unit, b.bucket
+        ON CONFLICT (unit, bucket)
+        DO UPDATE SET attendees = EXCLUDED.attendees, tickets = EXCLUDED.tickets
+    )"""
+
+
+# ---------------------- events ----------------------
+
+@single_statement
+def create_event(cur, name, date, location, description, organizer_id, capacity):
+    """Insert the event with its stats and seat rows; returns its id"""
+    cur.execute(f"""
+        WITH created AS (
+            INSERT INTO events (name, date, location, description, organizer_id, capacity)
+            VALUES (%(name)s, %(date)s, %(location)s, %(description)s, %(organizer_id)s, %(capacity)s)
+            RETURNING id
+        ),
+        {_add_total("total", "events", "", "created")},
+        ticket_stats AS (
+            INSERT INTO stats_event_tickets (event_id, ticket_count)
+            SELECT id, 0 FROM created
+            ON CONFLICT (event_id) DO NOTHING
+        ),
+        seats AS (
+            INSERT INTO event_seats (event_id)
+            SELECT id FROM created
+            ON CONFLICT (event_id) DO NOTHING
+        ),
+        {_bump("bumped", "SELECT %(all_events)s FROM created UNION ALL SELECT %(event_scope)s || id FROM created")}
+        SELECT id FROM created
+    """, {
+        "name": name, "date": date, "location": location, "description": description,
+        "organizer_id": organizer_id, "capacity": capacity,
+        "all_events": versions.EVENTS, "event_scope": versions.event(""),
+    })
+    return cur.fetchone()[0]
+
+
+@single_statement
+def update_event(cur, event_id, name, date, location, description, organizer_id, capacity):
+    """Update the event and everything derived from it; False when not found.
+
+    Moving the date recounts both buckets; a new date or location queues an
+    event_changed job for the attendees (sent by ``flask jobs-worker``).
+    """
+    cur.execute(f"""
+        WITH updated AS (
+            UPDATE events e
+            SET name = %(name)s, date = %(date)s, location = %(location)s,
+                description = %(description)s, organizer_id = %(organizer_id)s,
+                capacity = %(capacity)s
+            FROM (SELECT id, date, location FROM events WHERE id = %(event_id)s FOR UPDATE) old
+            WHERE e.id = old.id
+            RETURNING e.id, old.date AS old_date, e.date,
+                      array_remove(ARRAY[
+                          CASE WHEN old.date <> e.date THEN 'date' END,
+                          CASE WHEN old.location IS DISTINCT FROM e.location THEN 'location' END
+                      ], NULL) AS changes
+        ),
+        {_recount_buckets(
+            "buckets",
+            "SELECT old_date FROM updated WHERE old_date <> date UNION SELECT date FROM updated WHERE old_date <> date",
+            "SELECT id, date FROM events WHERE id <> %(event_id)s UNION ALL SELECT id, date FROM updated"
+        )},
+        {_bump("bumped", "SELECT %(all_events)s FROM updated UNION ALL SELECT %(event_scope)s || id FROM updated")},
+        queued AS (
+            INSERT INTO jobs (kind, payload)
+            SELECT %(job_kind)s, jsonb_build_object('event_id', id, 'changes', to_jsonb(changes))
+            FROM updated WHERE cardinality(changes) > 0
+            RETURNING id
+        ),
+        -- Un CTE en lecture seule n'est évalué que s'il est référencé.
+        notified AS (
+            SELECT pg_notify(%(channel)s, '') FROM queued LIMIT 1
+        )
+        SELECT EXISTS (SELECT 1 FROM updated), (SELECT COUNT(*) FROM notified)
+    """, {
+        "event_id": event_id, "name": name, "date": date, "location": location,
+        "description": description, "organizer_id": organizer_id, "capacity": capacity,
+        "units": list(stats.UNITS), "all_events": versions.EVENTS,
+        "event_scope": versions.event(""), "job_kind": jobs.EVENT_CHANGED, "channel": jobs.CHANNEL,
+    })
+    return cur.fetchone()[0]
+
+
+@single_statement
+def delete_event(cur, event_id):
+    """Delete the event (tickets and waitlist cascade); False when not found"""
+    cur.execute(f"""
+        WITH deleted AS (
+            DELETE FROM events WHERE id = %(event_id)s
+            RETURNING id, date
+        ),
+        {_add_total("total", "events", "-", "deleted")},
+        {_recount_buckets(
+            "buckets", "SELECT date FROM deleted",
+            "SELECT id, date FROM events WHERE id <> %(event_id)s"
+        )},
+        {_bump("bumped", "SELECT %(all_events)s FROM deleted UNION ALL SELECT %(event_scope)s || id FROM deleted")}
+        SELECT EXISTS (SELECT 1 FROM deleted)
+    """, {
+        "event_id": event_id, "units": list(stats.UNITS),
+        "all_events": versions.EVENTS, "event_scope": versions.event(""),
+    })
+    return cur.fetchone()[0]
+
+
+# ---------------------- organizers / attendees ----------------------
+
+@single_statement
+def create_organizer(cur, name, email, phone):
+    cur.execute(f"""
+        WITH created AS (
+            INSERT INTO organizers (name, email, phone) VALUES (%s, %s, %s)
+            RETURNING id
+        ),
+        {_add_total("total", "organizers", "", "created")}
+        SELECT id FROM created
+    """, (name, email, phone))
+    return cur.fetchone()[0]
+
+
+@single_statement
+def update_organizer(cur, organizer_id, name, email, phone):
+    cur.execute(f"""
+        WITH updated AS (
+            UPDATE organizers SET name = %(name)s, email = %(email)s, phone = %(phone)s
+            WHERE id = %(id)s
+            RETURNING id
+        ),
+        {_bump("bumped", "SELECT %(scope)s FROM updated")}
+        SELECT EXISTS (SELECT 1 FROM updated)
+    """, {"id": organizer_id, "name": name, "email": email, "phone": phone,
+          "scope": versions.ORGANIZERS})
+    return cur.fetchone()[0]
+
+
+@single_statement
+def delete_organizer(cur, organizer_id):
+    """Delete an organizer without events.
+
+    Returns (deleted, has_events). Creating an event bumps the organizer's
+    event_count (trigger of migration 0007), so a delete racing an event
+    creation waits for it and then re-checks the count on the new row
+    version instead of cascading to an event it never saw.
+    """
+    cur.execute(f"""
+        WITH deleted AS (
+            DELETE FROM organizers o
+            WHERE o.id = %(id)s AND o.event_count = 0
+              AND NOT EXISTS (SELECT 1 FROM events e WHERE e.organizer_id = o.id)
+            RETURNING o.id
+        ),
+        {_add_total("total", "organizers", "-", "deleted")}
+        SELECT EXISTS (SELECT 1 FROM deleted),
+               NOT EXISTS (SELECT 1 FROM deleted)
+               AND EXISTS (SELECT 1 FROM organizers WHERE id = %(id)s)
+    """, {"id": organizer_id})
+    return cur.fetchone()
+
+
+@single_statement
+def create_attendee(cur, name, email, phone):
+    cur.execute(f"""
+        WITH created AS (
+            INSERT INTO attendees (name, email, phone) VALUES (%s, %s, %s)
+            RETURNING id
+        ),
+        {_add_total("total", "attendees", "", "created")}
+        SELECT id FROM created
+    """, (name, email, phone))
+    return cur.fetchone()[0]
+
+
+@single_statement
+def update_attendee(cur, attendee_id, name, email, phone):
+    cur.execute(f"""
+        WITH updated AS (
+            UPDATE attendees SET name = %(name)s, email = %(email)s, phone = %(phone)s
+            WHERE id = %(id)s
+            RETURNING id
+        ),
+        {_bump("bumped", "SELECT %(scope)s FROM updated")}
+        SELECT EXISTS (SELECT 1 FROM updated)
+    """, {"id": attendee_id, "name": name, "email": email, "phone": phone,
+          "scope": versions.ATTENDEES})
+    return cur.fetchone()[0]
+
+
+@single_statement
+def delete_attendee(cur, attendee_id):
+    """Delete an attendee without tickets; returns (deleted, has_tickets).
+
+    Same guard as delete_organizer, on the event_count (tickets) column.
+    """
+    cur.execute(f"""
+        WITH deleted AS (
+            DELETE FROM attendees a
+            WHERE a.id = %(id)s AND a.event_count = 0
+              AND NOT EXISTS (SELECT 1 FROM tickets t WHERE t.attendee_id = a.id)
+            RETURNING a.id
+        ),
+        {_add_total("total", "attendees", "-", "deleted")}
+        SELECT EXISTS (SELECT 1 FROM deleted),
+               NOT EXISTS (SELECT 1 FROM deleted)
+               AND EXISTS (SELECT 1 FROM attendees WHERE id = %(id)s)
+    """, {"id": attendee_id})
+    return cur.fetchone()
@@ -0,0 +1,53 @@
+"""gunicorn settings, overridable by the environment.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    GUNICORN_WORKER_CLASS=gevent GUNICORN_WORKER_CONNECTIONS=200 gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers load the app themselves (no preload): each one builds its own
+connection pool, and with WARMUP=1 opens it and compiles the templates
+before accepting requests. The time from fork to ready is logged per
+worker and reported on /admin/startup.
+"""
+import os
+import time
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2 * (os.cpu_count() or 1) + 1))
+# Avec "sync", /changes répond en polling (CHANGES_STREAM=auto) au lieu de
+# tenir un worker par onglet ouvert ; gthread ou gevent pour le flux continu.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+# gevent : requêtes simultanées par worker. Au-delà de DB_POOL_MAX, elles
+# attendent une connexion (DB_POOL_TIMEOUT) au lieu d'en ouvrir une de plus.
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 100))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Recyclage périodique des workers (fuites mémoire) ; 0 = jamais
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 0))
+preload_app = False
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+def post_fork(server, worker):
+    worker.sge_forked_at = time.perf_counter()
+    if worker_class == "gevent":
+        # psycopg2 bloque le worker entier sans callback d'attente coopératif.
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("gevent workers without psycogreen: database calls will block")
+        else:
+            patch_psycopg()
+
+
+def post_worker_init(worker):
+    boot = time.perf_counter() - worker.sge_forked_at
+    stats = worker.wsgi.extensions["startup"]
+    stats.worker_boot_seconds = boot
+    worker.log.info(
+        "worker %s ready in %.3fs (import %.3fs, create_app %.3fs, warm-up %s)",
+        worker.pid, boot, stats.import_seconds, stats.create_app_seconds,
+        f"{stats.warmup_seconds:.3f}s" if stats.warmup_seconds is not None else "off"
+    )
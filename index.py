@@ -1,25 +1,107 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+import functools
+import math
+import os
+import time
+
+_import_started = time.perf_counter()
+
+import click
+
+from flask import (
+    Flask, Response, render_template, request, redirect, url_for, flash, jsonify,
+    abort, send_from_directory, current_app
+)
+from flask.cli import AppGroup
 import psycopg2
 from flask_login import (
     LoginManager, login_user, logout_user, login_required,
     current_user, UserMixin
 )
-from werkzeug.security import check_password_hash
-
-app = Flask(__name__)
-app.secret_key = "super_secret_key"
-
-def get_db_connection():
-    return psycopg2.connect(
-        host="localhost",
-        database="event_management",
-        user="postgres",
-        password="root"
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import config
+from api.v1 import bp as api_v1
+from database import pool as db_pool
+from database.routing import read_only
+from database import capacity, jobs, search, stats, versions, writes
+from database import instrumentation
+from database.tickets import register_many
+from database.pagination import estimated_count, fetch_keyset_page, invalidate_count
+from services.cache import RedisBackend, TieredCache, TTLCache
+from services.changes import PUBLIC_PREFIXES, ChangeFeed
+from services.http_cache import PageCache
+from services.passwords import HashVerifier, VerifierBusy
+from services.ratelimit import LoginLimits, make_buckets, parse_rate
+from services.waitlist import WaitlistPromoter
+from services import startup
+
+# Les routes et les commandes sont déclarées au niveau du module, puis
+# attachées à chaque application par create_app() (en fin de fichier). Les
+# sous-systèmes rarement utilisés (import/export CSV, migrations, e-mails,
+# workers) sont importés dans les fonctions qui s'en servent.
+_routes = []
+commands = AppGroup("sge")
+
+def route(rule, **options):
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+def get_db_connection(primary=False):
+    return current_app.extensions["db_connection"](primary)
+
+# Objets propres à chaque application (voir create_app)
+page_cache = LocalProxy(lambda: current_app.extensions["page_cache"])
+user_cache = LocalProxy(lambda: current_app.extensions["user_cache"])
+# Les promotions de liste d'attente tournent hors requête, sur leur propre connexion.
+waitlist_promoter = LocalProxy(lambda: current_app.extensions["waitlist_promoter"])
+login_limits = LocalProxy(lambda: current_app.extensions["login_limits"])
+hash_verifier = LocalProxy(lambda: current_app.extensions["hash_verifier"])
+change_feed = LocalProxy(lambda: current_app.extensions["change_feed"])
+
+def paginate(cur, table, sql, columns, key, per_page, descending=False):
+    """Pagination par curseur (keyset) ; ?page= reste supporté en mode OFFSET.
+
+    ``sql`` contient les placeholders {keyset} et {order} et se termine par
+    LIMIT %s (voir database/pagination.py).
+    """
+    total = estimated_count(cur, table)
+    total_pages = (total + per_page - 1) // per_page
+    page = request.args.get('page', type=int)
+
+    if page is not None:
+        page = max(page, 1)
+        direction = 'DESC' if descending else 'ASC'
+        order = ", ".join(f"{c} {direction}" for c in columns)
+        cur.execute(
+            sql.format(keyset="TRUE", order=order) + " OFFSET %s",
+            (per_page, (page - 1) * per_page)
+        )
+        return {
+            "rows": cur.fetchall(),
+            "page": page,
+            "total_pages": total_pages,
+            "next_cursor": None,
+            "prev_cursor": None,
+        }
+
+    result = fetch_keyset_page(
+        cur, sql, columns, key, request.args.get('cursor'), per_page,
+        descending=descending
     )
+    return {
+        "rows": result.rows,
+        "page": None,
+        "total_pages": total_pages,
+        "next_cursor": result.next_cursor,
+        "prev_cursor": result.prev_cursor,
+    }
 
 # ---------------------- AUTH SETUP ----------------------
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = "login"  # redirection automatique si pas connecté
 login_manager.login_message = " Vous devez être connecté pour accéder à cette page."
 login_manager.login_message_category = "danger"
@@ -39,231 +121,432 @@ class User(UserMixin):
             return User(user[0], user[1], user[2], user[3])
         return None
 
+def invalidate_user(user_id):
+    """À appeler après toute modification d'un utilisateur"""
+    user_cache.delete(str(user_id))
+
 @login_manager.user_loader
 def load_user(user_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, username, email, password_hash FROM users WHERE id = %s",
-        (user_id,)
-    )
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
-    if row:
-        return User(*row)   # (id, username, email, password_hash)
-    return None
+    # Le hash du mot de passe n'est ni chargé ni mis en cache : seul login()
+    # en a besoin, et il passe par User.get_by_username.
+    row = user_cache.get(str(user_id))
+    if row is None:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, username, email FROM users WHERE id = %s",
+            (user_id,)
+        )
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        if row is None:
+            return None
+        row = list(row)
+        user_cache.set(str(user_id), row)
+    return User(row[0], row[1], row[2], None)   # (id, username, email, password_hash)
 # --------------------------------------------------------
 
 # ---------------------- LOGIN ROUTES ----------------------
-@app.route('/login', methods=['GET', 'POST'])
+def _login_throttled(wait):
+    # Réponse minimale : pendant une rafale, même le rendu du formulaire compte.
+    return Response(
+        "Trop de tentatives de connexion, réessayez dans quelques instants.\n",
+        status=429, mimetype="text/plain",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))}
+    )
+
+@route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-        user = User.get_by_username(username, cur)
-        cur.close()
-        conn.close()
+        # Limites vérifiées avant la base et le hash : une rafale coûte une
+        # réponse 429 par tentative, pas un calcul scrypt.
+        wait = login_limits.check(request.remote_addr or "-", username)
+        if wait:
+            return _login_throttled(wait)
 
-        if user and check_password_hash(user.password_hash, password):
+        # Connexion hors contexte, rendue au pool avant le hash (~100 ms) :
+        # une rafale de connexions n'épuise pas le pool.
+        conn = current_app.extensions["db_pool"]().getconn()
+        try:
+            cur = conn.cursor()
+            user = User.get_by_username(username, cur)
+            cur.close()
+        finally:
+            conn.close()
+
+        try:
+            valid = user is not None and hash_verifier.verify(user.password_hash, password)
+        except VerifierBusy:
+            return _login_throttled(1)
+
+        if valid:
             login_user(user)
             flash(' Connexion réussie!', 'success')
             next_page = request.args.get('next')
             return redirect(next_page or url_for('events'))
 
+        login_limits.failed(username)
         flash(" Nom d'utilisateur ou mot de passe incorrect.", 'error')
     return render_template('login.html')
 
-@app.route("/logout")
+@route("/logout")
 @login_required
 def logout():
+    invalidate_user(current_user.id)
     logout_user()
     flash("Vous avez été déconnecté.", "info")
     return redirect(url_for("login"))
 
-@app.route("/not_allowed")
+@route("/not_allowed")
 def not_allowed():
     return render_template("not_allowed.html"), 403
-# ----------------------------------------------------------
 
-# ---------------------- PUBLIC HOME ----------------------
-@app.route("/")
-def index():
-    # Page d'accueil simple paginée (liste d'événements)
-    page = request.args.get('page', 1, type=int)
-    per_page = 5
+@route("/admin/pool")
+@login_required
+def pool_stats():
+    pool = current_app.extensions["db_pool"]().stats()
+    if current_app.extensions["db_replicas"] is not None:
+        pool["routing"] = current_app.extensions["db_replicas"].stats()
+    return jsonify(pool)
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+@route("/admin/user_cache")
+@login_required
+def user_cache_stats():
+    return jsonify(user_cache.stats())
 
-    cur.execute("SELECT COUNT(*) FROM events")
-    total_events = cur.fetchone()[0]
+@route("/admin/waitlist")
+@login_required
+def waitlist_stats():
+    return jsonify(waitlist_promoter.stats())
 
-    total_pages = (total_events + per_page - 1) // per_page
-    offset = (page - 1) * per_page
+@route("/admin/page_cache")
+@login_required
+def page_cache_stats():
+    return jsonify(page_cache.stats())
 
-    cur.execute("""
-        SELECT e.id, e.name, e.date, e.location, e.description, o.name AS organizer
-        FROM events e
-        JOIN organizers o ON e.organizer_id = o.id
-        ORDER BY e.date
-        LIMIT %s OFFSET %s;
-    """, (per_page, offset))
+@route("/admin/startup")
+@login_required
+def startup_stats():
+    return jsonify(current_app.extensions["startup"].snapshot())
 
-    events_list = cur.fetchall()
+@route("/admin/login")
+@login_required
+def login_stats():
+    return jsonify(limits=login_limits.stats(), verifier=hash_verifier.stats())
+
+@route("/admin/jobs")
+@login_required
+def jobs_stats():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    queue_metrics = jobs.metrics(cur)
     cur.close()
     conn.close()
+    return jsonify(queue_metrics)
 
-    return render_template(
-        "index.html",
-        events=events_list,
-        page=page,
-        total_pages=total_pages
-    )
+@route("/admin/sql")
+@login_required
+def sql_stats():
+    # Agrégats par route : nombre de requêtes, temps SQL, requêtes les plus lentes
+    if request.args.get("reset"):
+        instrumentation.query_stats.reset()
+    return jsonify(instrumentation.query_stats.snapshot())
 
-# ---------------------- EVENTS ----------------------
-@app.route("/events")
-def events():
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
+@route("/admin/changes")
+@login_required
+def changes_stats():
+    return jsonify(change_feed.stats())
+
+@route("/metrics")
+def metrics():
+    # Format texte Prometheus ; uniquement des compteurs, pas de texte SQL.
+    pool = current_app.extensions["db_pool"]().stats()
+    lines = [instrumentation.query_stats.prometheus()]
+    for key in ("in_use", "idle", "waiting", "max"):
+        lines.append(f"# TYPE sge_db_pool_{key} gauge\nsge_db_pool_{key} {pool[key]}\n")
+    router = current_app.extensions["db_replicas"]
+    if router is not None:
+        routing_stats = router.stats()
+        lines.append(f"# TYPE sge_db_replica_fallbacks_total counter\nsge_db_replica_fallbacks_total {routing_stats['fallbacks']}\n")
+        lines.append("# TYPE sge_db_replica_healthy gauge\n# TYPE sge_db_replica_lag_seconds gauge\n")
+        for replica in routing_stats["replicas"]:
+            label = replica["name"].replace('"', "'")
+            lines.append(f'sge_db_replica_healthy{{replica="{label}"}} {int(replica["healthy"])}\n')
+            if replica["lag"] is not None:
+                lines.append(f'sge_db_replica_lag_seconds{{replica="{label}"}} {replica["lag"]}\n')
+
+    verifier = hash_verifier.stats()
+    limits = login_limits.stats()
+    lines.append("# TYPE sge_login_rejected_total counter\n")
+    for reason, count in (("rate_ip", limits["throttled_ip"]), ("rate_user", limits["throttled_user"]),
+                          ("hash_busy", verifier["rejected"] + verifier["timeouts"])):
+        lines.append(f'sge_login_rejected_total{{reason="{reason}"}} {count}\n')
+    lines.append(f"# TYPE sge_login_hash_in_flight gauge\nsge_login_hash_in_flight {verifier['in_flight']}\n")
+
+    boot = current_app.extensions["startup"].snapshot()
+    lines.append("# TYPE sge_startup_seconds gauge\n")
+    for phase in ("import", "create_app", "warmup", "worker_boot", "first_request"):
+        if boot[f"{phase}_s"] is not None:
+            lines.append(f'sge_startup_seconds{{phase="{phase}"}} {boot[f"{phase}_s"]}\n')
+
+    feed = change_feed.stats()
+    lines.append(f"# TYPE sge_change_feed_subscribers gauge\nsge_change_feed_subscribers {feed['subscribers']}\n")
+    for key in ("delivered", "overflows", "reconnects"):
+        lines.append(f"# TYPE sge_change_feed_{key}_total counter\nsge_change_feed_{key}_total {feed[key]}\n")
+
+    lines.append("# TYPE sge_write_retries_total counter\n")
+    for outcome, count in writes.retry_counts.items():
+        lines.append(f'sge_write_retries_total{{outcome="{outcome}"}} {count}\n')
 
     conn = get_db_connection()
     cur = conn.cursor()
-
-    cur.execute("SELECT COUNT(*) FROM events")
-    total_events = cur.fetchone()[0]
-    total_pages = (total_events + per_page - 1) // per_page
-    offset = (page - 1) * per_page
-
-    cur.execute("""
-        SELECT e.*, o.name as organizer_name
-        FROM events e
-        LEFT JOIN organizers o ON e.organizer_id = o.id
-        ORDER BY e.date DESC
-        LIMIT %s OFFSET %s
-    """, (per_page, offset))
-
-    events_list = cur.fetchall()
+    queue = jobs.metrics(cur)
     cur.close()
     conn.close()
+    lines.append("# TYPE sge_jobs gauge\n")
+    for status, count in queue["jobs"].items():
+        lines.append(f'sge_jobs{{status="{status}"}} {count}\n')
+    lines.append(f"# TYPE sge_jobs_oldest_ready_seconds gauge\nsge_jobs_oldest_ready_seconds {queue['oldest_ready_seconds']}\n")
+    lines.append(f"# TYPE sge_jobs_done_per_second gauge\nsge_jobs_done_per_second {queue['done_per_second']}\n")
+    lines.append("# TYPE sge_jobs_latency_seconds gauge\n")
+    for quantile in ("p50", "p95"):
+        value = queue[f"latency_{quantile}_seconds"]
+        if value is not None:
+            lines.append(f'sge_jobs_latency_seconds{{quantile="0.{quantile[1:]}"}} {value}\n')
+    return Response("".join(lines), mimetype="text/plain; version=0.0.4")
+# ----------------------------------------------------------
 
-    return render_template(
-        "events.html",
-        events=events_list,
-        page=page,
-        total_pages=total_pages
-    )
+# ---------------------- CHANGE FEED ----------------------
+_RESET = "event: reset\ndata: {}\n\n"
+
+def _can_stream():
+    mode = current_app.config["CHANGES_STREAM"]
+    if mode == "auto":
+        # gthread et gevent le posent ; un worker sync, non.
+        return bool(request.environ.get("wsgi.multithread"))
+    return mode == "1"
+
+@route("/changes")
+def changes_stream():
+    """Server-Sent Events, ex. /changes?topic=event:42&topic=attendees
+
+    Sans session, seuls les sujets event:<id> sont ouverts. En se
+    reconnectant, le navigateur envoie Last-Event-ID et le flux reprend
+    après ce changement ; un ``reset`` demande de recharger la page.
+    """
+    topics = request.args.getlist("topic")
+    if not topics or len(topics) > 20:
+        abort(400)
+    public = not current_user.is_authenticated
+    if public and not all(t.startswith(PUBLIC_PREFIXES) and not t.endswith("*") for t in topics):
+        abort(401)
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_seq = int(last_id) if last_id else None
+    except ValueError:
+        abort(400)
+
+    feed = change_feed._get_current_object()
+    if not _can_stream():
+        # Worker sync : un flux le bloquerait jusqu'à CHANGES_STREAM_SECONDS.
+        # On rend ce qui a changé et la position ; EventSource se reconnecte
+        # après « retry » avec Last-Event-ID.
+        changes, position = feed.read_since(topics, last_seq)
+        retry = int(current_app.config["CHANGES_POLL_INTERVAL"] * 1000)
+        if changes is None:
+            body = _RESET
+        else:
+            body = "".join(change.sse(public) for change in changes) + f"id: {position}\n\n"
+        return Response(f"retry: {retry}\n\n" + body, mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache"})
+
+    heartbeat = current_app.config["CHANGES_HEARTBEAT"]
+    deadline = time.monotonic() + current_app.config["CHANGES_STREAM_SECONDS"]
+
+    # Sans stream_with_context : le contexte de la requête, et la connexion
+    # qu'il a pu prendre au pool, sont rendus avant le premier octet.
+    def stream():
+        yield "retry: 3000\n\n"
+        subscription, backlog = feed.subscribe(topics, last_seq)
+        try:
+            if backlog is None:
+                yield _RESET
+                return
+            replayed = set()
+            for change in backlog:
+                replayed.add(change.seq)
+                yield change.sse(public)
+            while time.monotonic() < deadline:
+                change = subscription.get(min(heartbeat, max(deadline - time.monotonic(), 0)))
+                if subscription.overflowed:
+                    yield _RESET
+                    return
+                if change is None:
+                    yield ": keepalive\n\n"
+                elif change.seq not in replayed:
+                    yield change.sse(public)
+        finally:
+            feed.unsubscribe(subscription)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-@app.route("/events/<int:event_id>")
-def view_event(event_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
+# ---------------------- PUBLIC HOME ----------------------
+@route("/")
+@read_only
+def index():
+    # Page d'accueil simple paginée (liste d'événements)
+    per_page = 5
 
-    cur.execute("""
-        SELECT e.*, o.name as organizer_name
-        FROM events e
-        LEFT JOIN organizers o ON e.organizer_id = o.id
-        WHERE e.id = %s
-    """, (event_id,))
-    event = cur.fetchone()
+    def build(cur):
+        pagination = paginate(cur, "events", """
+            SELECT e.id, e.name, e.date, e.location, e.description, o.name AS organizer
+            FROM events e
+            JOIN organizers o ON e.organizer_id = o.id
+            WHERE {keyset}
+            ORDER BY {order}
+            LIMIT %s
+        """, ("e.date", "e.id"), lambda row: (row[2], row[0]), per_page)
+        return dict(events=pagination.pop("rows"), **pagination)
+
+    return page_cache.render(
+        get_db_connection(), "index.html", "_index_content.html",
+        (versions.EVENTS, versions.ORGANIZERS), build
+    )
 
-    cur.execute("""
-        SELECT a.* FROM attendees a
-        JOIN tickets t ON a.id = t.attendee_id
-        WHERE t.event_id = %s
-        ORDER BY a.name
-    """, (event_id,))
-    registered_attendees = cur.fetchall()
+# ---------------------- EVENTS ----------------------
+@route("/events")
+@read_only
+def events():
+    per_page = 10
 
-    cur.close()
-    conn.close()
+    def build(cur):
+        pagination = paginate(cur, "events", """
+            SELECT e.*, o.name as organizer_name
+            FROM events e
+            LEFT JOIN organizers o ON e.organizer_id = o.id
+            WHERE {keyset}
+            ORDER BY {order}
+            LIMIT %s
+        """, ("e.date", "e.id"), lambda row: (row[2], row[0]), per_page, descending=True)
+        return dict(events=pagination.pop("rows"), **pagination)
+
+    return page_cache.render(
+        get_db_connection(), "events.html", "_events_content.html",
+        (versions.EVENTS, versions.ORGANIZERS), build
+    )
 
-    if event is None:
-        flash(" Événement non trouvé!", "danger")
-        return redirect(url_for("events"))
+@route("/events/<int:event_id>")
+@read_only
+def view_event(event_id):
+    def build(cur):
+        cur.execute("""
+            SELECT e.*, o.name as organizer_name
+            FROM events e
+            LEFT JOIN organizers o ON e.organizer_id = o.id
+            WHERE e.id = %s
+        """, (event_id,))
+        event = cur.fetchone()
+        if event is None:
+            flash(" Événement non trouvé!", "danger")
+            return redirect(url_for("events"))
+
+        # Noms, e-mails et téléphones : jamais dans la version anonyme, que
+        # les caches partagés peuvent garder (services/http_cache.py).
+        attendees = None
+        if current_user.is_authenticated:
+            cur.execute("""
+                SELECT a.* FROM attendees a
+                JOIN tickets t ON a.id = t.attendee_id
+                WHERE t.event_id = %s
+                ORDER BY a.name
+            """, (event_id,))
+            attendees = cur.fetchall()
+        return dict(
+            title=event[1],
+            event=event,
+            attendees=attendees,
+            seats=capacity.seat_summary(cur, event_id)
+        )
 
-    return render_template(
-        "view_event.html",
-        event=event,
-        registered_attendees=registered_attendees
+    return page_cache.render(
+        get_db_connection(), "view_event.html", "_view_event_content.html",
+        (versions.event(event_id), versions.ORGANIZERS, versions.ATTENDEES), build
     )
 
 # ---------------------- EVENTS CRUD (protected) ----------------------
-@app.route("/create_event", methods=["GET", "POST"])
+@route("/create_event", methods=["GET", "POST"])
 @login_required
 def create_event():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name FROM organizers ORDER BY name;")
-    organizers = cur.fetchall()
-
     if request.method == "POST":
         name = request.form["name"]
         date = request.form["date"]
         location = request.form["location"]
         description = request.form["description"]
         organizer_id = request.form["organizer_id"]
+        # Vide : pas de limite de places
+        event_capacity = request.form.get("capacity", type=int)
 
         if not name or not date or not location or not organizer_id:
             flash(" All fields except description are required!", "danger")
-            cur.close()
-            conn.close()
+            return redirect(url_for("create_event"))
+        if event_capacity is not None and event_capacity < 0:
+            flash(" La capacité doit être positive.", "danger")
             return redirect(url_for("create_event"))
 
-        cur.execute(
-            "INSERT INTO events (name, date, location, description, organizer_id) VALUES (%s, %s, %s, %s, %s)",
-            (name, date, location, description, organizer_id),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        writes.run(get_db_connection(), writes.create_event,
+                   name, date, location, description, organizer_id, event_capacity)
+        invalidate_count("events")
         flash(" Event added successfully!", "success")
         return redirect(url_for("index"))
 
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM organizers ORDER BY name;")
+    organizers = cur.fetchall()
     cur.close()
     conn.close()
     return render_template("create_event.html", organizers=organizers)
 
-@app.route("/events/delete/<int:event_id>")
+@route("/events/delete/<int:event_id>")
 @login_required
 def delete_event(event_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM events WHERE id = %s", (event_id,))
-    conn.commit()
-    cur.close()
-    conn.close()
+    writes.run(get_db_connection(), writes.delete_event, event_id)
+    invalidate_count("events")
     flash(" Event deleted!", "info")
     return redirect(url_for("index"))
 
-@app.route("/events/update/<int:event_id>", methods=["GET", "POST"])
+@route("/events/update/<int:event_id>", methods=["GET", "POST"])
 @login_required
 def update_event(event_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name FROM organizers ORDER BY name;")
-    organizers = cur.fetchall()
-
     if request.method == "POST":
         name = request.form["name"]
         date = request.form["date"]
         location = request.form["location"]
         description = request.form["description"]
         organizer_id = request.form["organizer_id"]
-
-        cur.execute(
-            "UPDATE events SET name=%s, date=%s, location=%s, description=%s, organizer_id=%s WHERE id=%s",
-            (name, date, location, description, organizer_id, event_id),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        event_capacity = request.form.get("capacity", type=int)
+        if event_capacity is not None and event_capacity < 0:
+            flash(" La capacité doit être positive.", "danger")
+            return redirect(url_for("update_event", event_id=event_id))
+
+        # Les inscrits sont prévenus par le worker (flask jobs-worker).
+        changed = writes.run(get_db_connection(), writes.update_event, event_id,
+                             name, date, location, description, organizer_id, event_capacity)
+        # Une capacité relevée peut libérer des places pour la liste d'attente.
+        if changed:
+            waitlist_promoter.submit(event_id)
         flash(" Event updated!", "success")
         return redirect(url_for("index"))
 
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM organizers ORDER BY name;")
+    organizers = cur.fetchall()
     cur.execute("SELECT * FROM events WHERE id = %s", (event_id,))
     event = cur.fetchone()
     cur.close()
@@ -271,41 +554,33 @@ def update_event(event_id):
     return render_template("edit_event.html", event=event, organizers=organizers)
 
 # ---------------------- ORGANIZERS (protected) ----------------------
-@app.route("/organizers")
+@route("/organizers")
+@read_only
 @login_required
 def organizers():
-    page = request.args.get('page', 1, type=int)
     per_page = 10
 
     conn = get_db_connection()
     cur = conn.cursor()
 
-    cur.execute("SELECT COUNT(*) FROM organizers")
-    total_organizers = cur.fetchone()[0]
-    total_pages = (total_organizers + per_page - 1) // per_page
-    offset = (page - 1) * per_page
-
-    cur.execute("""
-        SELECT o.*, COUNT(e.id) as event_count
+    pagination = paginate(cur, "organizers", """
+        SELECT o.id, o.name, o.email, o.phone, o.created_at, o.event_count
         FROM organizers o
-        LEFT JOIN events e ON o.id = e.organizer_id
-        GROUP BY o.id
-        ORDER BY o.name ASC
-        LIMIT %s OFFSET %s
-    """, (per_page, offset))
+        WHERE {keyset}
+        ORDER BY {order}
+        LIMIT %s
+    """, ("o.name", "o.id"), lambda row: (row[1], row[0]), per_page)
 
-    organizers_list = cur.fetchall()
     cur.close()
     conn.close()
 
     return render_template(
         "organizers.html",
-        organizers=organizers_list,
-        page=page,
-        total_pages=total_pages
+        organizers=pagination.pop("rows"),
+        **pagination
     )
 
-@app.route("/create_organizer", methods=["GET", "POST"])
+@route("/create_organizer", methods=["GET", "POST"])
 @login_required
 def create_organizer():
     if request.method == "POST":
@@ -313,102 +588,74 @@ def create_organizer():
         email = request.form["email"]
         phone = request.form.get("phone", "")
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO organizers (name, email, phone) VALUES (%s, %s, %s)",
-            (name, email, phone)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        writes.run(get_db_connection(), writes.create_organizer, name, email, phone)
+        invalidate_count("organizers")
 
         flash(" Organisateur créé avec succès!", "success")
         return redirect(url_for("organizers"))
 
     return render_template("create_organizer.html")
 
-@app.route("/organizers/update/<int:organizer_id>", methods=["GET", "POST"])
+@route("/organizers/update/<int:organizer_id>", methods=["GET", "POST"])
 @login_required
 def update_organizer(organizer_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
     if request.method == "POST":
         name = request.form["name"]
         email = request.form["email"]
         phone = request.form.get("phone")
-        cur.execute(
-            "UPDATE organizers SET name=%s, email=%s, phone=%s WHERE id=%s",
-            (name, email, phone, organizer_id),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        writes.run(get_db_connection(), writes.update_organizer, organizer_id, name, email, phone)
         flash(" Organizer updated!", "success")
         return redirect(url_for("organizers"))
 
+    conn = get_db_connection()
+    cur = conn.cursor()
     cur.execute("SELECT * FROM organizers WHERE id=%s", (organizer_id,))
     organizer = cur.fetchone()
     cur.close()
     conn.close()
     return render_template("edit_organizer.html", organizer=organizer)
 
-@app.route("/organizers/delete/<int:organizer_id>")
+@route("/organizers/delete/<int:organizer_id>")
 @login_required
 def delete_organizer(organizer_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    cur.execute("SELECT COUNT(*) FROM events WHERE organizer_id = %s", (organizer_id,))
-    event_count = cur.fetchone()[0]
-
-    if event_count > 0:
+    deleted, has_events = writes.run(get_db_connection(), writes.delete_organizer, organizer_id)
+    if has_events:
         flash(" Impossible de supprimer cet organisateur car il a des événements associés.", "danger")
+    elif not deleted:
+        flash(" Organisateur non trouvé!", "danger")
     else:
-        cur.execute("DELETE FROM organizers WHERE id = %s", (organizer_id,))
-        conn.commit()
+        invalidate_count("organizers")
         flash(" Organisateur supprimé avec succès!", "success")
-
-    cur.close()
-    conn.close()
     return redirect(url_for("organizers"))
 
 # ---------------------- ATTENDEES (protected) ----------------------
-@app.route("/attendees")
+@route("/attendees")
+@read_only
 @login_required
 def attendees():
-    page = request.args.get('page', 1, type=int)
     per_page = 10
 
     conn = get_db_connection()
     cur = conn.cursor()
 
-    cur.execute("SELECT COUNT(*) FROM attendees")
-    total_attendees = cur.fetchone()[0]
-    total_pages = (total_attendees + per_page - 1) // per_page
-    offset = (page - 1) * per_page
-
-    cur.execute("""
-        SELECT a.*, COUNT(t.event_id) as event_count
+    pagination = paginate(cur, "attendees", """
+        SELECT a.id, a.name, a.email, a.phone, a.created_at, a.event_count
         FROM attendees a
-        LEFT JOIN tickets t ON a.id = t.attendee_id
-        GROUP BY a.id
-        ORDER BY a.name ASC
-        LIMIT %s OFFSET %s
-    """, (per_page, offset))
+        WHERE {keyset}
+        ORDER BY {order}
+        LIMIT %s
+    """, ("a.name", "a.id"), lambda row: (row[1], row[0]), per_page)
 
-    attendees_list = cur.fetchall()
     cur.close()
     conn.close()
 
     return render_template(
         "attendees.html",
-        attendees=attendees_list,
-        page=page,
-        total_pages=total_pages
+        attendees=pagination.pop("rows"),
+        **pagination
     )
 
-@app.route("/create_attendee", methods=["GET", "POST"])
+@route("/create_attendee", methods=["GET", "POST"])
 @login_required
 def create_attendee():
     if request.method == "POST":
@@ -416,46 +663,34 @@ def create_attendee():
         email = request.form["email"]
         phone = request.form.get("phone")
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO attendees (name, email, phone) VALUES (%s, %s, %s)",
-            (name, email, phone),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        writes.run(get_db_connection(), writes.create_attendee, name, email, phone)
+        invalidate_count("attendees")
         flash(" Attendee created successfully!", "success")
         return redirect(url_for("attendees"))
 
     return render_template("create_attendee.html")
 
-@app.route("/attendees/update/<int:attendee_id>", methods=["GET", "POST"])
+@route("/attendees/update/<int:attendee_id>", methods=["GET", "POST"])
 @login_required
 def update_attendee(attendee_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
     if request.method == "POST":
         name = request.form["name"]
         email = request.form["email"]
         phone = request.form.get("phone")
-        cur.execute(
-            "UPDATE attendees SET name=%s, email=%s, phone=%s WHERE id=%s",
-            (name, email, phone, attendee_id),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        writes.run(get_db_connection(), writes.update_attendee, attendee_id, name, email, phone)
         flash("✏️ Attendee updated!", "success")
         return redirect(url_for("attendees"))
 
+    conn = get_db_connection()
+    cur = conn.cursor()
     cur.execute("SELECT * FROM attendees WHERE id=%s", (attendee_id,))
     attendee = cur.fetchone()
     cur.close()
     conn.close()
     return render_template("edit_attendee.html", attendee=attendee)
 
-@app.route("/attendees/<int:attendee_id>")
+@route("/attendees/<int:attendee_id>")
+@read_only
 @login_required
 def attendee_details(attendee_id):
     conn = get_db_connection()
@@ -485,113 +720,119 @@ def attendee_details(attendee_id):
         registered_events=registered_events
     )
 
-# ---------------------- DASHBOARD (protected) ----------------------
-@app.route("/dashboard")
-@login_required
-def dashboard():
+# ---------------------- SEARCH ----------------------
+_SEARCH_URLS = {
+    "event": ("view_event", "event_id"),
+    "attendee": ("attendee_details", "attendee_id"),
+    "organizer": ("update_organizer", "organizer_id"),
+}
+
+def _search_page():
+    """Résultats d'une recherche ; participants et organisateurs réservés aux connectés"""
+    term = request.args.get('q', '').strip()[:200]
+    allowed = search.KINDS if current_user.is_authenticated else {"events": "event"}
+    wanted = request.args.get('kind', '')
+    kinds = [allowed[wanted]] if wanted in allowed else list(allowed.values())
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
     conn = get_db_connection()
     cur = conn.cursor()
-
-    cur.execute("SELECT COUNT(*) FROM events")
-    total_events = cur.fetchone()[0]
-
-    cur.execute("SELECT COUNT(*) FROM attendees")
-    total_attendees = cur.fetchone()[0]
-
-    cur.execute("SELECT COUNT(*) FROM organizers")
-    total_organizers = cur.fetchone()[0]
-
-    cur.execute("""
-        SELECT o.name, COUNT(e.id)
-        FROM organizers o
-        LEFT JOIN events e ON o.id = e.organizer_id
-        GROUP BY o.id, o.name
-        ORDER BY o.name
-    """)
-    organizer_stats = cur.fetchall()
-    organizer_names = [row[0] for row in organizer_stats] or []
-    events_per_organizer = [row[1] for row in organizer_stats] or []
-
-    cur.execute("""
-        SELECT e.name, COUNT(t.id)
-        FROM events e
-        LEFT JOIN tickets t ON e.id = t.event_id
-        GROUP BY e.id, e.name
-        ORDER BY COUNT(t.id) DESC
-        LIMIT 5
-    """)
-    popular_events = cur.fetchall()
-    popular_event_names = [row[0] for row in popular_events] or []
-    popular_event_counts = [row[1] for row in popular_events] or []
-
-    cur.execute("""
-        SELECT TO_CHAR(date_trunc('month', e.date), 'Mon YYYY') as month,
-               COUNT(DISTINCT t.attendee_id)
-        FROM events e
-        LEFT JOIN tickets t ON e.id = t.event_id
-        WHERE e.date >= NOW() - INTERVAL '1 year'
-        GROUP BY date_trunc('month', e.date)
-        ORDER BY date_trunc('month', e.date)
-    """)
-    monthly_stats = cur.fetchall()
-    months = [row[0] for row in monthly_stats] or []
-    attendees_over_time = [row[1] for row in monthly_stats] or []
-
+    page = search.search(cur, term, kinds, request.args.get('cursor'), limit)
     cur.close()
     conn.close()
 
+    results = []
+    for kind, ref_id, title, subtitle, score in page.rows:
+        endpoint, arg = _SEARCH_URLS[kind]
+        results.append({
+            "kind": kind,
+            "id": ref_id,
+            "title": title,
+            "subtitle": subtitle,
+            "score": round(score, 4),
+            "url": url_for(endpoint, **{arg: ref_id}),
+        })
+    return term, wanted, results, page
+
+@route("/search")
+def search_view():
+    term, kind, results, page = _search_page()
     return render_template(
-        "stats.html",
-        total_events=total_events,
-        total_attendees=total_attendees,
-        total_organizers=total_organizers,
-        organizer_names=organizer_names,
-        events_per_organizer=events_per_organizer,
-        popular_event_names=popular_event_names,
-        popular_event_counts=popular_event_counts,
-        months=months,
-        attendees_over_time=attendees_over_time
+        "search.html",
+        q=term,
+        kind=kind,
+        results=results,
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor
     )
 
-# ---------------------- REGISTRATION (protected) ----------------------
-@app.route("/register_event/<int:event_id>", methods=["GET", "POST"])
+@route("/api/search")
+def search_api():
+    term, kind, results, page = _search_page()
+    return jsonify({
+        "results": results,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    })
+
+# ---------------------- DASHBOARD (protected) ----------------------
+@route("/dashboard")
+@read_only
 @login_required
-def register_event(event_id):
+def dashboard():
+    # Agrégats tenus à jour par les écritures, reconstruits par le worker de
+    # tâches : la page ne fait que les lire.
     conn = get_db_connection()
     cur = conn.cursor()
+    totals = stats.load_totals(cur)
+    cur.close()
+    conn.close()
+
+    # Les graphiques chargent leurs séries via /api/v1/stats/*.
+    return render_template("stats.html", **totals)
 
+# ---------------------- REGISTRATION (protected) ----------------------
+@route("/register_event/<int:event_id>", methods=["GET", "POST"])
+@login_required
+def register_event(event_id):
     if request.method == "POST":
-        attendee_id = request.form.get("attendee_id")
-        try:
-            cur.execute(
-                "INSERT INTO tickets (event_id, attendee_id) VALUES (%s, %s)",
-                (event_id, attendee_id)
-            )
-            conn.commit()
+        attendee_id = request.form.get("attendee_id", type=int)
+        if attendee_id is None:
+            flash(" Veuillez choisir un participant.", "danger")
+            return redirect(url_for("register_event", event_id=event_id))
+        status = writes.run(get_db_connection(), capacity.register, event_id, attendee_id)
+        if status == capacity.REGISTERED:
             flash(" Successfully registered for event!", "success")
-        except psycopg2.IntegrityError:
+        elif status == capacity.WAITLISTED:
+            flash(" Événement complet : participant ajouté à la liste d'attente.", "info")
+        elif status == capacity.ALREADY_WAITLISTED:
+            flash(" Déjà en liste d'attente pour cet événement.", "info")
+        elif status == capacity.ALREADY_REGISTERED:
             flash(" Already registered for this event!", "danger")
-        cur.close()
-        conn.close()
+        else:
+            flash(" Événement ou participant introuvable.", "danger")
         return redirect(url_for("view_event", event_id=event_id))
 
+    conn = get_db_connection()
+    cur = conn.cursor()
     cur.execute("SELECT * FROM events WHERE id = %s", (event_id,))
     event = cur.fetchone()
+    if event is None:
+        cur.close()
+        conn.close()
+        flash(" Événement non trouvé!", "danger")
+        return redirect(url_for("events"))
 
-    cur.execute("""
-        SELECT * FROM attendees
-        WHERE id NOT IN (SELECT attendee_id FROM tickets WHERE event_id = %s)
-        ORDER BY name
-    """, (event_id,))
-    available_attendees = cur.fetchall()
-
-    cur.execute("""
+    # Les participants disponibles sont chargés à la demande par
+    # available_attendees() ; seuls les inscrits sont paginés ici.
+    registered = fetch_keyset_page(cur, """
         SELECT a.* FROM attendees a
         JOIN tickets t ON a.id = t.attendee_id
-        WHERE t.event_id = %s
-        ORDER BY a.name
-    """, (event_id,))
-    registered_attendees = cur.fetchall()
+        WHERE t.event_id = %s AND {keyset}
+        ORDER BY {order}
+        LIMIT %s
+    """, ("a.name", "a.id"), lambda row: (row[1], row[0]),
+        request.args.get('cursor'), 20, params=(event_id,))
 
     cur.close()
     conn.close()
@@ -599,44 +840,580 @@ def register_event(event_id):
     return render_template(
         "register_event.html",
         event=event,
-        available_attendees=available_attendees,
-        registered_attendees=registered_attendees
+        registered_attendees=registered.rows,
+        next_cursor=registered.next_cursor,
+        prev_cursor=registered.prev_cursor
     )
 
-@app.route("/unregister_event/<int:event_id>/<int:attendee_id>")
+def _like_prefix(term):
+    escaped = term.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+@route("/api/events/<int:event_id>/available_attendees")
 @login_required
-def unregister_event(event_id, attendee_id):
+def available_attendees(event_id):
+    """Recherche par préfixe (nom ou email) des participants non inscrits"""
+    term = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute(
-        "DELETE FROM tickets WHERE event_id = %s AND attendee_id = %s",
-        (event_id, attendee_id)
-    )
-    conn.commit()
+    if term:
+        pattern = _like_prefix(term)
+        name_filter, params = "(lower(a.name) LIKE %s OR lower(a.email) LIKE %s)", (pattern, pattern)
+    else:
+        name_filter, params = "TRUE", ()
+    page = fetch_keyset_page(cur, """
+        SELECT a.id, a.name, a.email FROM attendees a
+        WHERE """ + name_filter + """
+          AND NOT EXISTS (
+              SELECT 1 FROM tickets t
+              WHERE t.event_id = %s AND t.attendee_id = a.id
+          )
+          AND {keyset}
+        ORDER BY {order}
+        LIMIT %s
+    """, ("a.name", "a.id"), lambda row: (row[1], row[0]),
+        request.args.get('cursor'), limit, params=params + (event_id,))
     cur.close()
     conn.close()
+
+    return jsonify({
+        "results": [{"id": r[0], "name": r[1], "email": r[2]} for r in page.rows],
+        "next_cursor": page.next_cursor,
+    })
+
+# Bornes d'un INTEGER PostgreSQL : au-delà, la requête échouerait (DataError).
+_INT4_MIN, _INT4_MAX = -2**31, 2**31 - 1
+
+def _bulk_attendee_ids():
+    """Ids envoyés en liste de formulaire, en JSON ou dans un fichier CSV.
+
+    Renvoie (ids, invalides), ou None si le corps JSON n'est pas un objet
+    dont ``attendee_ids`` est une liste d'entiers.
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        ids = payload.get("attendee_ids", []) if isinstance(payload, dict) else None
+        # bool est un int en Python : true ne doit pas valoir l'id 1.
+        if not isinstance(ids, list) or not all(
+            type(value) is int and _INT4_MIN <= value <= _INT4_MAX for value in ids
+        ):
+            return None
+        return ids, 0
+
+    ids = request.form.getlist("attendee_ids")
+    # Zone de texte : ids séparés par des virgules, espaces ou retours ligne
+    ids.extend(request.form.get("attendee_ids_text", "").replace(",", " ").split())
+
+    upload = request.files.get("file")
+    if upload and upload.filename:
+        import csv
+        import io
+
+        reader = csv.reader(io.TextIOWrapper(upload.stream, encoding="utf-8-sig"))
+        column = 0
+        for line_no, row in enumerate(reader):
+            if not row:
+                continue
+            if line_no == 0 and "attendee_id" in row:
+                column = row.index("attendee_id")
+                continue
+            if column < len(row):
+                ids.append(row[column])
+
+    attendee_ids, invalid = [], 0
+    for value in ids:
+        try:
+            attendee_id = int(value.strip())
+        except ValueError:
+            invalid += 1
+            continue
+        if _INT4_MIN <= attendee_id <= _INT4_MAX:
+            attendee_ids.append(attendee_id)
+        else:
+            invalid += 1
+    return attendee_ids, invalid
+
+@route("/register_event/<int:event_id>/bulk", methods=["POST"])
+@login_required
+def register_event_bulk(event_id):
+    parsed = _bulk_attendee_ids()
+    if parsed is None:
+        return jsonify({"error": "attendee_ids must be a list of integers"}), 400
+    attendee_ids, invalid = parsed
+
+    result = writes.run(get_db_connection(), register_many, event_id, attendee_ids)
+
+    if result is None:
+        if request.is_json:
+            return jsonify({"error": "event not found"}), 404
+        flash(" Événement non trouvé!", "danger")
+        return redirect(url_for("events"))
+
+    result["invalid"] = invalid
+    if request.is_json:
+        return jsonify(result)
+
+    flash(
+        f" {result['inserted']} inscrit(s), {result['already_registered']} déjà inscrit(s), "
+        f"{result['waitlisted']} en liste d'attente, {result['unknown'] + invalid} ignoré(s).",
+        "success"
+    )
+    return redirect(url_for("view_event", event_id=event_id))
+
+@route("/unregister_event/<int:event_id>/<int:attendee_id>")
+@login_required
+def unregister_event(event_id, attendee_id):
+    removed, has_waitlist = writes.run(get_db_connection(), capacity.unregister, event_id, attendee_id)
+    if removed and has_waitlist:
+        waitlist_promoter.submit(event_id)
     flash(" Successfully unregistered from event!", "info")
     return redirect(url_for("view_event", event_id=event_id))
 
-@app.route("/attendees/delete/<int:attendee_id>", methods=["POST"])
+@route("/attendees/delete/<int:attendee_id>", methods=["POST"])
 @login_required
 def delete_attendee(attendee_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    cur.execute("SELECT COUNT(*) FROM tickets WHERE attendee_id = %s", (attendee_id,))
-    ticket_count = cur.fetchone()[0]
-
-    if ticket_count > 0:
+    deleted, has_tickets = writes.run(get_db_connection(), writes.delete_attendee, attendee_id)
+    if has_tickets:
         flash("⚠️ Impossible de supprimer ce participant car il est inscrit à des événements.", "danger")
+    elif not deleted:
+        flash("Participant non trouvé!", "danger")
     else:
-        cur.execute("DELETE FROM attendees WHERE id = %s", (attendee_id,))
-        conn.commit()
+        invalidate_count("attendees")
         flash("🗑️ Participant supprimé avec succès!", "success")
+    return redirect(url_for("attendees"))
+
+# ---------------------- EXPORT (protected) ----------------------
+def _export_response(kind, fmt, filename, params=()):
+    from database import export
+
+    if fmt not in export.FORMATS:
+        abort(404)
+    # Connexion dédiée : elle reste ouverte pendant tout le streaming et est
+    # rendue au pool par le générateur, pas par le teardown de la requête.
+    conn = current_app.extensions["db_pool"]().getconn()
+    chunks = export.stream(conn, kind, fmt, params)
+    return Response(
+        chunks,
+        mimetype=export.FORMATS[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{fmt}",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+@route("/export/<any(events, attendees, organizers):kind>.<fmt>")
+@login_required
+def export_table(kind, fmt):
+    return _export_response(kind, fmt, kind)
 
+@route("/export/events/<int:event_id>/tickets.<fmt>")
+@login_required
+def export_event_tickets(event_id, fmt):
+    return _export_response("tickets", fmt, f"event_{event_id}_tickets", (event_id,))
+
+# ---------------------- IMPORT (protected) ----------------------
+def _run_import(kind, fileobj, reject_path):
+    """Lance l'import ; le fichier de rejet n'est conservé que s'il sert"""
+    from database.imports import IMPORTERS
+
+    conn = get_db_connection()
+    with open(reject_path, "w", newline="", encoding="utf-8") as reject_file:
+        try:
+            result = IMPORTERS[kind](conn, fileobj, reject_file)
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_count(kind)
+    if not result["rejected"]:
+        os.remove(reject_path)
+    return result
+
+@route("/import/<any(attendees, events):kind>", methods=["GET", "POST"])
+@login_required
+def import_csv(kind):
+    import io
+    import uuid
+
+    from database.imports import CSVImportError
+
+    result = None
+    reject_token = None
+
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash(" Veuillez choisir un fichier CSV.", "danger")
+            return redirect(url_for("import_csv", kind=kind))
+
+        reject_token = uuid.uuid4().hex
+        reject_path = os.path.join(current_app.config["IMPORT_REJECT_DIR"], f"rejects_{reject_token}.csv")
+        fileobj = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        try:
+            result = _run_import(kind, fileobj, reject_path)
+        except (CSVImportError, UnicodeDecodeError, psycopg2.DataError) as e:
+            if os.path.exists(reject_path):
+                os.remove(reject_path)
+            flash(f" Import impossible : {e}", "danger")
+            return redirect(url_for("import_csv", kind=kind))
+        if not result["rejected"]:
+            reject_token = None
+        flash(f" Import terminé : {result['inserted']} ligne(s) ajoutée(s).", "success")
+
+    return render_template("import.html", kind=kind, result=result, reject_token=reject_token)
+
+@route("/import/rejects/<token>.csv")
+@login_required
+def import_rejects(token):
+    if not token.isalnum():
+        abort(404)
+    return send_from_directory(
+        current_app.config["IMPORT_REJECT_DIR"], f"rejects_{token}.csv", as_attachment=True
+    )
+
+@commands.command("import-csv")
+@click.argument("kind", type=click.Choice(["attendees", "events"]))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--rejects", type=click.Path(dir_okay=False),
+              help="Fichier des lignes rejetées (défaut : <path>.rejects.csv)")
+def import_csv_command(kind, path, rejects):
+    """Importe un CSV de participants ou d'événements via COPY."""
+    from database.imports import CSVImportError
+
+    reject_path = rejects or f"{path}.rejects.csv"
+    start = time.perf_counter()
+    with open(path, newline="", encoding="utf-8-sig") as fileobj:
+        try:
+            result = _run_import(kind, fileobj, reject_path)
+        except CSVImportError as e:
+            raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - start
+
+    total = sum(result.values())
+    click.echo(", ".join(f"{key}: {value}" for key, value in result.items()))
+    click.echo(f"{total} lignes en {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} lignes/s)")
+    if result["rejected"]:
+        click.echo(f"Rejets : {reject_path}")
+
+# ---------------------- MIGRATIONS (CLI) ----------------------
+def _direct_connection():
+    # Hors pool : migrate() passe la connexion en autocommit.
+    return psycopg2.connect(**current_app.extensions["db_pool"]().conn_params)
+
+@commands.command("db-migrate")
+@click.option("--target", type=int, help="Version maximale à appliquer")
+@click.option("--status", "show_status", is_flag=True, help="Affiche l'état sans rien appliquer")
+def db_migrate_command(target, show_status):
+    """Applique les migrations de database/migrations/."""
+    from database import migrate
+
+    conn = _direct_connection()
+    try:
+        if show_status:
+            for version, name, applied in migrate.status(conn):
+                click.echo(f"{'x' if applied else ' '} {version:04d}_{name}")
+            return
+        applied = migrate.migrate(conn, target=target, echo=click.echo)
+        click.echo(f"{len(applied)} migration(s) appliquée(s).")
+    finally:
+        conn.close()
+
+@commands.command("db-explain-check")
+@click.option("--min-rows", default=10000, show_default=True,
+              help="Taille minimale d'une table pour qu'un seq scan compte")
+@click.option("--strict", is_flag=True,
+              help="enable_seqscan = off : détecte l'absence d'index même sur une petite base")
+def db_explain_check_command(min_rows, strict):
+    """Échoue si une requête de route fait un seq scan sur une grande table."""
+    from database import explain_check
+
+    conn = _direct_connection()
+    try:
+        failures = explain_check.check(conn, min_rows=min_rows, strict=strict)
+    finally:
+        conn.close()
+    for route, table, rows in failures:
+        click.echo(f"{route}: Seq Scan on {table} (~{rows} rows)", err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo(f"{len(explain_check.ROUTE_QUERIES)} requêtes vérifiées, aucun seq scan.")
+
+# ---------------------- WAITLIST (CLI) ----------------------
+@commands.command("promote-waitlist")
+def promote_waitlist_command():
+    """Promeut les listes d'attente de tous les événements ayant des places libres.
+
+    Rattrapage après un redémarrage : les promotions en file dans un worker
+    arrêté sont perdues, pas les inscriptions en liste d'attente.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    event_ids = capacity.events_with_waitlist(cur)
     cur.close()
     conn.close()
-    return redirect(url_for("attendees"))
+    before = waitlist_promoter.promoted
+    for event_id in event_ids:
+        waitlist_promoter.promote_event(event_id)
+    click.echo(f"{waitlist_promoter.promoted - before} participant(s) promu(s) "
+               f"sur {len(event_ids)} événement(s).")
+
+@commands.command("stats-refresh")
+@click.option("--force", is_flag=True, help="Reconstruit même si les agrégats sont récents")
+def stats_refresh_command(force):
+    """Reconstruit les agrégats du tableau de bord s'ils sont périmés.
+
+    Le worker de tâches le fait déjà à chaque maintenance ; utile sans
+    worker, ou juste après un chargement en masse.
+    """
+    conn = _direct_connection()
+    try:
+        rebuilt = stats.refresh_if_stale(conn, 0 if force else current_app.config["STATS_MAX_STALENESS"])
+    finally:
+        conn.close()
+    click.echo("Agrégats reconstruits." if rebuilt else "Agrégats à jour (ou reconstruction en cours ailleurs).")
+
+# ---------------------- COUNTERS (CLI) ----------------------
+@commands.command("counters-check")
+@click.option("--repair", is_flag=True, help="Corrige les compteurs faux")
+@click.option("--batch", default=10000, show_default=True, help="Lignes par transaction")
+def counters_check_command(repair, batch):
+    """Vérifie ticket_count / event_count contre les tables sources.
+
+    Sans --repair, échoue (code 1) au premier écart : utilisable en supervision.
+    """
+    from database import counters
+
+    conn = _direct_connection()
+    try:
+        drift = counters.reconcile(conn, repair=repair, batch=batch)
+    finally:
+        conn.close()
+    total = 0
+    for name, rows in drift.items():
+        total += len(rows)
+        for row_id, stored, actual in rows[:20]:
+            click.echo(f"{name} id={row_id}: {stored} au lieu de {actual}", err=True)
+        if len(rows) > 20:
+            click.echo(f"{name}: ... {len(rows) - 20} autre(s)", err=True)
+    if total and not repair:
+        raise SystemExit(1)
+    click.echo(f"{total} écart(s){' corrigé(s)' if repair else ''}.")
+
+# ---------------------- TICKETS PARTITIONS (CLI) ----------------------
+def _echo_partitions(cur):
+    from database import partitions
+
+    for name, parent, bounds, rows, size, tablespace in partitions.partitions(cur):
+        click.echo(f"{parent:<16} {name:<18} {bounds:<40} ~{rows:>10} lignes "
+                   f"{size / 2**20:>9.1f} Mo  {tablespace}")
+
+@commands.command("tickets-partition")
+@click.option("--batch", default=50000, show_default=True, help="Billets copiés par transaction")
+@click.option("--lock-timeout", default=5.0, show_default=True,
+              help="Attente maximale (s) du verrou de la bascule")
+@click.option("--drop-legacy", is_flag=True, help="Supprime tickets_legacy après la bascule")
+@click.option("--status", "show_status", is_flag=True, help="Affiche les partitions sans rien changer")
+def tickets_partition_command(batch, lock_timeout, drop_legacy, show_status):
+    """Copie les billets dans la table partitionnée (migration 0010) puis bascule.
+
+    Les écritures continuent pendant la copie ; la bascule ne prend le
+    verrou exclusif que le temps de renommer les tables.
+    """
+    from database import partitions
+
+    conn = _direct_connection()
+    try:
+        cur = conn.cursor()
+        current = partitions.state(cur)
+        if current == "legacy":
+            raise click.ClickException("migration 0010 non appliquée : flask --app index db-migrate")
+        if current == "migrating" and not show_status:
+            copied = partitions.backfill(conn, batch=batch, echo=click.echo)
+            legacy_rows, partitioned_rows = partitions.verify(cur)
+            conn.commit()
+            if legacy_rows != partitioned_rows:
+                raise click.ClickException(
+                    f"{legacy_rows} billet(s) dans tickets, {partitioned_rows} dans tickets_partitioned : "
+                    "bascule annulée, relancer la commande"
+                )
+            try:
+                partitions.swap(conn, lock_timeout=lock_timeout)
+            except psycopg2.errors.LockNotAvailable:
+                raise click.ClickException("verrou de la bascule non obtenu, relancer la commande")
+            click.echo(f"{copied} billet(s) copié(s), tickets est partitionnée.")
+        elif not show_status:
+            click.echo(f"{partitions.ensure(cur)} partition(s) créée(s).")
+            conn.commit()
+        if drop_legacy and partitions.state(cur) == "partitioned":
+            cur.execute("DROP TABLE IF EXISTS tickets_legacy")
+            conn.commit()
+            click.echo("tickets_legacy supprimée.")
+        _echo_partitions(cur)
+        conn.rollback()
+    finally:
+        conn.close()
+
+@commands.command("tickets-archive")
+@click.option("--older-than", type=int, help="Âge (jours) des événements à archiver [TICKETS_ARCHIVE_DAYS]")
+@click.option("--tablespace", help="Tablespace des partitions archivées [TICKETS_ARCHIVE_TABLESPACE]")
+@click.option("--lock-timeout", default=5.0, show_default=True,
+              help="Attente maximale (s) du verrou sur tickets")
+@click.option("--dry-run", is_flag=True, help="Liste les partitions à archiver sans rien changer")
+def tickets_archive_command(older_than, tablespace, lock_timeout, dry_run):
+    """Archive les partitions de billets dont tous les événements sont passés.
+
+    À lancer par cron. Les pages ne lisent plus ces billets ; statistiques,
+    compteurs et exports les lisent via tickets_history.
+    """
+    from database import partitions
+
+    older_than = current_app.config["TICKETS_ARCHIVE_DAYS"] if older_than is None else older_than
+    tablespace = tablespace or current_app.config["TICKETS_ARCHIVE_TABLESPACE"] or None
+    conn = _direct_connection()
+    try:
+        cur = conn.cursor()
+        if partitions.state(cur) != "partitioned":
+            raise click.ClickException("tickets n'est pas encore partitionnée : flask --app index tickets-partition")
+        names = partitions.archivable(cur, older_than)
+        conn.rollback()
+        for name in names:
+            if dry_run:
+                click.echo(f"à archiver : {name}")
+                continue
+            start = time.perf_counter()
+            try:
+                partitions.archive(conn, name, tablespace=tablespace, lock_timeout=lock_timeout)
+            except psycopg2.errors.LockNotAvailable:
+                raise click.ClickException(f"{name} : verrou non obtenu, relancer la commande")
+            click.echo(f"{name} archivée en {time.perf_counter() - start:.2f}s")
+        if names and not dry_run:
+            # Les pages des événements archivés ne listent plus leurs inscrits.
+            versions.bump_all(cur)
+            conn.commit()
+        click.echo(f"{len(names)} partition(s){' à archiver' if dry_run else ' archivée(s)'}.")
+    finally:
+        conn.close()
+
+# ---------------------- JOBS (CLI) ----------------------
+def _mail_sender_factory():
+    from services import mail
+
+    if current_app.config["MAIL_BACKEND"] == "smtp":
+        return functools.partial(
+            mail.make_sender, "smtp",
+            host=current_app.config["SMTP_HOST"],
+            port=current_app.config["SMTP_PORT"],
+            username=current_app.config["SMTP_USERNAME"],
+            password=current_app.config["SMTP_PASSWORD"],
+            starttls=current_app.config["SMTP_STARTTLS"]
+        )
+    return functools.partial(mail.make_sender, "file", directory=current_app.config["MAIL_OUTBOX_DIR"])
+
+@commands.command("jobs-worker")
+@click.option("--processes", default=2, show_default=True, help="Nombre de processus worker")
+@click.option("--batch", default=50, show_default=True, help="Tâches prises par lot")
+@click.option("--lease", default=300, show_default=True,
+              help="Secondes avant qu'une tâche prise par un worker mort soit reprise")
+@click.option("--once", is_flag=True, help="Traite les tâches prêtes puis s'arrête")
+def jobs_worker_command(processes, batch, lease, once):
+    """Envoie les confirmations d'inscription et les avis de modification."""
+    from services.jobs import Worker as JobWorker, run_pool as run_job_workers
+
+    settings = dict(
+        connect=functools.partial(psycopg2.connect, **current_app.extensions["db_pool"]().conn_params),
+        sender_factory=_mail_sender_factory(),
+        mail_from=current_app.config["MAIL_FROM"],
+        batch=batch,
+        lease=lease,
+        retention=current_app.config["JOBS_RETENTION"],
+        feed_retention=current_app.config["CHANGES_RETENTION"],
+        partitions_ahead=current_app.config["TICKETS_PARTITIONS_AHEAD"],
+        stats_max_staleness=current_app.config["STATS_MAX_STALENESS"]
+    )
+    if once:
+        click.echo(f"{JobWorker(**settings).drain()} tâche(s) traitée(s).")
+        return
+    run_job_workers(processes, **settings)
+
+# ---------------------- APPLICATION ----------------------
+_import_seconds = time.perf_counter() - _import_started
+
+def create_app(overrides=None):
+    """Application configurée par l'environnement (config.py).
+
+    ``overrides`` complète la configuration (tests, benchmarks). Avec
+    WARMUP=1, le pool est ouvert et les templates compilés avant de rendre
+    la main (voir services/startup.py).
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.update(config.from_env())
+    app.config.update(overrides or {})
+    config.check(app.config)
+    if app.config["PROXY_FIX"]:
+        # Sans cela, remote_addr est celle du proxy : tous les clients
+        # partageraient le seau par IP de la connexion.
+        hops = app.config["PROXY_FIX"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+    if app.config["JINJA_CACHE_DIR"]:
+        os.makedirs(app.config["JINJA_CACHE_DIR"], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["JINJA_CACHE_DIR"])
+
+    db_pool.init_app(
+        app,
+        cursor_factory=instrumentation.init_app(app),
+        **config.connection_params(app.config)
+    )
+    app.extensions["page_cache"] = PageCache(
+        TTLCache(maxsize=app.config["HTTP_FRAGMENT_CACHE_SIZE"], ttl=app.config["HTTP_FRAGMENT_CACHE_TTL"]),
+        cdn_max_age=app.config["HTTP_CDN_MAX_AGE"],
+        enabled=app.config["HTTP_CACHE"]
+    )
+    app.extensions["user_cache"] = TieredCache(
+        TTLCache(maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"]),
+        RedisBackend(
+            app.config["USER_CACHE_REDIS_URL"], prefix="sge:user:",
+            ttl=app.config["USER_CACHE_SHARED_TTL"]
+        ) if app.config["USER_CACHE_REDIS_URL"] else None
+    )
+    app.extensions["waitlist_promoter"] = WaitlistPromoter(
+        lambda: app.extensions["db_pool"]().getconn()
+    )
+
+    # Un LISTEN par worker, sur sa propre connexion ; les flux SSE n'en
+    # prennent aucune au pool.
+    app.extensions["change_feed"] = ChangeFeed(
+        connect=functools.partial(psycopg2.connect, **config.connection_params(app.config)),
+        get_connection=lambda: app.extensions["db_pool"]().getconn(),
+        buffer=app.config["CHANGES_BUFFER"],
+        queue_size=app.config["CHANGES_QUEUE"]
+    )
+
+    app.extensions["login_limits"] = LoginLimits(
+        ip=make_buckets(parse_rate(app.config["LOGIN_RATE_IP"]),
+                        app.config["LOGIN_RATE_REDIS_URL"], prefix="sge:rl:ip:"),
+        user=make_buckets(parse_rate(app.config["LOGIN_RATE_USER"]),
+                          app.config["LOGIN_RATE_REDIS_URL"], prefix="sge:rl:user:")
+    )
+    app.extensions["hash_verifier"] = HashVerifier(
+        workers=app.config["LOGIN_HASH_WORKERS"],
+        queue=app.config["LOGIN_HASH_QUEUE"],
+        timeout=app.config["LOGIN_HASH_TIMEOUT"]
+    )
+
+    login_manager.init_app(app)
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.register_blueprint(api_v1)
+    for command in commands.commands.values():
+        app.cli.add_command(command)
+
+    startup_timings = startup.init_app(app, _import_seconds)
+    startup_timings.create_app_seconds = time.perf_counter() - started
+    if app.config["WARMUP"]:
+        startup.warm_up(app)
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5002)
+    create_app().run(debug=True, port=5002)
@@ -0,0 +1,67 @@
+"""Query helpers for the ORM models with their loading strategy spelled out.
+
+The relationships in your_model.py are lazy selects, so touching
+``event.organizer`` or ``event.tickets`` inside a loop costs one query per
+row. These helpers load what a list or detail page needs up front: counts
+are the denormalized counter columns, to-one relationships come from a
+join, and collections from one ``selectinload`` query (``WHERE ... IN``).
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import configure_mappers, joinedload, selectinload
+
+from models.your_model import db, Attendee, Event, Organizer, Ticket
+
+# Les backrefs (Event.organizer, Ticket.event, ...) n'existent qu'une fois
+# les mappers configurés ; les options ci-dessous en ont besoin à l'import.
+configure_mappers()
+
+
+def list_events(limit=100, offset=0):
+    """Events by date with organizer and attendee_count: one query"""
+    return db.session.scalars(
+        select(Event)
+        .options(joinedload(Event.organizer))
+        .order_by(Event.date, Event.id)
+        .limit(limit)
+        .offset(offset)
+    ).all()
+
+
+def get_event(event_id):
+    """Event with organizer and tickets -> attendees: two queries"""
+    return db.session.scalars(
+        select(Event)
+        .options(
+            joinedload(Event.organizer),
+            selectinload(Event.tickets).joinedload(Ticket.attendee),
+        )
+        .where(Event.id == event_id)
+    ).first()
+
+
+def list_organizers(limit=100, offset=0):
+    """Organizers by name with event_count: one query"""
+    return db.session.scalars(
+        select(Organizer)
+        .order_by(Organizer.name, Organizer.id)
+        .limit(limit)
+        .offset(offset)
+    ).all()
+
+
+def get_organizer(organizer_id):
+    """Organizer with its events (and their attendee_count): two queries"""
+    return db.session.scalars(
+        select(Organizer)
+        .options(selectinload(Organizer.events))
+        .where(Organizer.id == organizer_id)
+    ).first()
+
+
+def get_attendee(attendee_id):
+    """Attendee with tickets -> events: two queries"""
+    return db.session.scalars(
+        select(Attendee)
+        .options(selectinload(Attendee.tickets).joinedload(Ticket.event))
+        .where(Attendee.id == attendee_id)
+    ).first()
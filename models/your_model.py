@@ -3,6 +3,14 @@ from datetime import datetime
 
 db = SQLAlchemy()
 
+# Compteurs dénormalisés (migration 0007), tenus par les triggers de la base :
+# lister N événements avec leur nombre de participants reste une seule requête,
+# sans sous-requête ni chargement des tickets (voir models/queries.py). Valeur
+# par défaut côté serveur : l'ORM ne les écrit jamais, il les relit.
+def _counter(*name):
+    return db.Column(*name, db.Integer, nullable=False, server_default='0',
+                     server_onupdate=db.FetchedValue())
+
 class Organizer(db.Model):
     __tablename__ = 'organizers'
     
@@ -11,6 +19,7 @@ class Organizer(db.Model):
     email = db.Column(db.String(120), nullable=False, unique=True)
     phone = db.Column(db.String(20), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    event_count = _counter()
     
     # Relationship
     events = db.relationship('Event', backref='organizer', cascade='all, delete-orphan')
@@ -28,16 +37,13 @@ class Event(db.Model):
     description = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     organizer_id = db.Column(db.Integer, db.ForeignKey('organizers.id', ondelete='CASCADE'), nullable=False)
+    attendee_count = _counter('ticket_count')
     
     # Relationships
     tickets = db.relationship('Ticket', backref='event', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Event {self.name}>'
-    
-    @property
-    def attendee_count(self):
-        return len(self.tickets)
 
 class Attendee(db.Model):
     __tablename__ = 'attendees'
@@ -47,6 +53,7 @@ class Attendee(db.Model):
     email = db.Column(db.String(120), nullable=False, unique=True)
     phone = db.Column(db.String(20), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    event_count = _counter()
     
     # Relationships
     tickets = db.relationship('Ticket', backref='attendee', cascade='all, delete-orphan')
@@ -66,4 +73,4 @@ class Ticket(db.Model):
     __table_args__ = (db.UniqueConstraint('event_id', 'attendee_id', name='unique_event_attendee'),)
     
     def __repr__(self):
-        return f'<Ticket Event:{self.event_id} Attendee:{self.attendee_id}>'
\ No newline at end of file
+        return f'<Ticket Event:{self.event_id} Attendee:{self.attendee_id}>'
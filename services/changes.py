@@ -0,0 +1,270 @@
+"""Change feed: one LISTEN per worker, fanned out to Server-Sent Events.
+
+The triggers of migration 0009 append to change_feed and NOTIFY "changes"
+in the writing transaction. Each worker process runs a single listener
+thread on its own autocommit connection; every notification is parsed and
+serialized once, kept in a ring buffer and pushed to the queues of the
+subscribers whose topics match. A stream never holds a pool connection.
+
+Notifications arrive in commit order, which is not always seq order (a
+transaction can take a seq and commit after a later one). A client
+resuming with Last-Event-ID therefore replays what this worker delivered
+after that entry, when the ring buffer still has it; otherwise it reads
+``seq > last`` from change_feed, which can miss a row committed late
+around the disconnect. That is harmless here: pages re-render from what
+they receive, and a ``reset`` tells them to reload.
+"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from collections import deque
+
+import psycopg2
+
+logger = logging.getLogger("sge.changes")
+
+CHANNEL = "changes"
+
+# Sujets lisibles sans session : la page publique d'un événement. Les
+# identifiants de participants n'y sont envoyés qu'aux utilisateurs connectés.
+PUBLIC_PREFIXES = ("event:",)
+PRIVATE_FIELDS = ("attendee_ids", "ids")
+
+
+def topic_matches(patterns, topic):
+    """``event:*`` matches every event; ``*`` (reset) reaches everyone"""
+    if topic == "*":
+        return True
+    for pattern in patterns:
+        if pattern == topic or (pattern.endswith("*") and topic.startswith(pattern[:-1])):
+            return True
+    return False
+
+
+class Change:
+    __slots__ = ("seq", "topic", "kind", "data", "public_data")
+
+    def __init__(self, seq, topic, payload):
+        self.seq = seq
+        self.topic = topic
+        self.kind = "reset" if payload.get("kind") == "reset" else "change"
+        # Sérialisé une fois, quel que soit le nombre d'abonnés.
+        payload = dict(payload, seq=seq, topic=topic)
+        self.data = json.dumps(payload, separators=(",", ":"))
+        public = {k: v for k, v in payload.items() if k not in PRIVATE_FIELDS}
+        self.public_data = (
+            self.data if len(public) == len(payload) else json.dumps(public, separators=(",", ":"))
+        )
+
+    def sse(self, public=False):
+        data = self.public_data if public else self.data
+        return f"id: {self.seq}\nevent: {self.kind}\ndata: {data}\n\n"
+
+
+class Subscription:
+    def __init__(self, topics, maxsize):
+        self.topics = topics
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def push(self, change):
+        if self.overflowed or not topic_matches(self.topics, change.topic):
+            return
+        try:
+            self.queue.put_nowait(change)
+        except queue.Full:
+            # Client trop lent : il recevra un reset plutôt qu'un trou.
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeFeed:
+    """Per-process listener; started lazily, and again after a fork.
+
+    ``connect`` opens the listener's own connection (held for the life of
+    the process, so outside the pool); ``get_connection`` lends a pooled
+    one for the occasional backlog read.
+    """
+
+    def __init__(self, connect, get_connection, buffer=1000, queue_size=256, poll=5.0):
+        self.connect = connect
+        self.get_connection = get_connection
+        self.buffer_size = buffer
+        self.queue_size = queue_size
+        self.poll = poll
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._buffer = deque(maxlen=buffer)
+        self._thread = None
+        self._pid = None
+        self.last_seq = None
+        self.delivered = 0
+        self.overflows = 0
+        self.reconnects = 0
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._subscribers = set()
+            self._buffer = deque(maxlen=self.buffer_size)
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    # ---------------------- listener ----------------------
+
+    def _run(self):
+        delay = 1.0
+        while True:
+            try:
+                self._listen()
+            except (psycopg2.Error, OSError):
+                self.reconnects += 1
+                logger.exception("change feed listener lost, reconnecting in %.0fs", delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            else:
+                delay = 1.0
+
+    def _listen(self):
+        conn = self.connect()
+        try:
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CHANNEL}")
+            # Écouteur (re)démarré : ce qui a été validé pendant la coupure.
+            if self.last_seq is not None:
+                for row in self._read_after(cur, self.last_seq):
+                    self._publish(Change(*row))
+            while True:
+                if select.select([conn], [], [], self.poll)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        self._notified(cur, conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def _notified(self, cur, payload):
+        message = json.loads(payload)
+        if "topic" not in message:
+            # Charge trop grosse pour NOTIFY : relue dans la table.
+            cur.execute("SELECT seq, topic, payload FROM change_feed WHERE seq = %s", (message["seq"],))
+            row = cur.fetchone()
+            if row is None:
+                return
+            self._publish(Change(*row))
+            return
+        self._publish(Change(message["seq"], message["topic"], message["payload"]))
+
+    def _publish(self, change):
+        with self._lock:
+            self._buffer.append(change)
+            self.last_seq = change.seq
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            was_overflowed = subscription.overflowed
+            subscription.push(change)
+            if subscription.overflowed and not was_overflowed:
+                self.overflows += 1
+        self.delivered += 1
+
+    @staticmethod
+    def _read_after(cur, seq, limit=1000):
+        cur.execute("""
+            SELECT seq, topic, payload FROM change_feed
+            WHERE seq > %s ORDER BY seq LIMIT %s
+        """, (seq, limit))
+        return cur.fetchall()
+
+    # ---------------------- subscribers ----------------------
+
+    def subscribe(self, topics, last_seq=None):
+        """Returns (subscription, backlog); backlog is None when the client
+        must reload because its position is no longer available"""
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self._start()
+        subscription = Subscription(topics, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            buffered = list(self._buffer)
+        if last_seq is None:
+            return subscription, []
+
+        for position, change in enumerate(buffered):
+            if change.seq == last_seq:
+                return subscription, [
+                    c for c in buffered[position + 1:] if topic_matches(topics, c.topic)
+                ]
+        return subscription, self._backlog_from_table(topics, last_seq)
+
+    def _backlog_from_table(self, topics, last_seq):
+        return self._read_table(topics, last_seq)[0]
+
+    def _read_table(self, topics, last_seq):
+        """(changes after ``last_seq`` matching ``topics``, seq of the last
+        row read); (None, None) when the position was purged. Without a
+        position, the current end of the feed and no change."""
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            if last_seq is None:
+                cur.execute("SELECT COALESCE(MAX(seq), 0) FROM change_feed")
+                position = cur.fetchone()[0]
+                conn.rollback()
+                return [], position
+            cur.execute("SELECT MIN(seq) FROM change_feed")
+            oldest = cur.fetchone()[0]
+            if oldest is None:
+                return [], last_seq
+            # Des numéros manquent aussi après un rollback : au pire un
+            # rechargement de trop.
+            if oldest > last_seq + 1:
+                return None, None   # purgé : le client doit recharger
+            rows = self._read_after(cur, last_seq, self.buffer_size + 1)
+            conn.rollback()
+        finally:
+            conn.close()
+        if len(rows) > self.buffer_size:
+            return None, None
+        position = rows[-1][0] if rows else last_seq
+        return [c for c in (Change(*row) for row in rows) if topic_matches(topics, c.topic)], position
+
+    def read_since(self, topics, last_seq=None):
+        """One-shot read for servers that cannot hold a stream open (sync
+        workers): returns (changes, position) like subscribe's backlog, from
+        the table, with no subscription and no listener thread."""
+        return self._read_table(topics, last_seq)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "buffered": len(self._buffer),
+            "last_seq": self.last_seq,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "reconnects": self.reconnects,
+            "running": bool(self._thread and self._thread.is_alive() and self._pid == os.getpid()),
+        }
+
+
+def purge(cur, retention):
+    """Delete feed rows older than ``retention`` seconds (run by the jobs worker)"""
+    cur.execute(
+        "DELETE FROM change_feed WHERE created_at < now() - make_interval(secs => %s)",
+        (retention,)
+    )
+    return cur.rowcount
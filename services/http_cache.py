@@ -0,0 +1,103 @@
+"""Conditional GETs and a rendered-fragment cache for the public pages.
+
+A page depends on a few version scopes (see database/versions.py). From
+their stamps come a weak ETag and Last-Modified, so a revalidation that
+matches costs one primary-key query and no rendering. Otherwise the
+user-independent part of the page (a ``_*_content.html`` fragment) comes
+from an LRU cache keyed by URL, versions and audience (anonymous or
+logged in), and only the layout (nav, flash messages) is rendered per
+request. Anonymous responses may be kept by a shared cache, so their
+fragments must not carry personal data: pages leave attendee details out
+of them, as the change feed does.
+"""
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime
+
+from flask import make_response, render_template, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+from database import versions
+
+
+class PageCache:
+    def __init__(self, fragments, cdn_max_age=60, enabled=True):
+        self.fragments = fragments
+        self.cdn_max_age = cdn_max_age
+        self.enabled = enabled
+        self.not_modified = 0
+
+    def render(self, conn, page, fragment, scopes, build):
+        """Render ``page`` around ``fragment``.
+
+        ``build(cur)`` returns the fragment's template context (an optional
+        ``title`` key goes to the page instead) or a response to return as
+        is, e.g. a redirect for a missing event.
+        """
+        cur = conn.cursor()
+        if not self.enabled:
+            context = build(cur)
+            cur.close()
+            if not isinstance(context, dict):
+                return context
+            title = context.pop("title", None)
+            return render_template(page, fragment=Markup(render_template(fragment, **context)), title=title)
+
+        stamps, last_modified = versions.load(cur, scopes)
+        user = current_user.get_id() if current_user.is_authenticated else None
+        audience = "public" if user is None else "member"
+        key = (request.endpoint, request.full_path, stamps, audience)
+        etag = hashlib.sha1(repr((key, user)).encode()).hexdigest()[:20]
+        # Un message flash en attente doit être affiché, pas remplacé par un 304.
+        has_flashes = bool(session.get("_flashes"))
+
+        if not has_flashes and self._is_fresh(etag, last_modified):
+            cur.close()
+            self.not_modified += 1
+            return self._headers(make_response("", 304), etag, last_modified, user, has_flashes)
+
+        cached = self.fragments.get(key)
+        if cached is None:
+            context = build(cur)
+            if not isinstance(context, dict):
+                cur.close()
+                return context
+            title = context.pop("title", None)
+            cached = (Markup(render_template(fragment, **context)), title)
+            self.fragments.set(key, cached)
+        cur.close()
+
+        response = make_response(render_template(page, fragment=cached[0], title=cached[1]))
+        return self._headers(response, etag, last_modified, user, has_flashes)
+
+    def _is_fresh(self, etag, last_modified):
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        if last_modified is not None and request.if_modified_since is not None:
+            return last_modified.replace(microsecond=0) <= request.if_modified_since
+        return False
+
+    def _headers(self, response, etag, last_modified, user, has_flashes):
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.headers["Last-Modified"] = format_datetime(
+                last_modified.astimezone(timezone.utc), usegmt=True
+            )
+        if has_flashes:
+            response.headers["Cache-Control"] = "private, no-store"
+        elif user is None:
+            # Anonyme : un CDN / reverse proxy peut garder la page cdn_max_age
+            # secondes ; le navigateur revalide à chaque fois (304).
+            response.headers["Cache-Control"] = (
+                f"public, max-age=0, s-maxage={self.cdn_max_age}, stale-while-revalidate=30"
+            )
+        else:
+            response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+        return response
+
+    def stats(self):
+        stats = self.fragments.stats()
+        stats["not_modified"] = self.not_modified
+        return stats
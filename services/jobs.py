@@ -0,0 +1,250 @@
+"""Worker processes for the job queue in database/jobs.py.
+
+Each worker claims a batch, groups it by kind and hands every group to a
+handler; mail handlers build all the messages of the group and give them to
+the sender in one call (one SMTP connection per batch). Failed jobs are
+retried with exponential backoff, then kept as 'failed'. ``run_pool`` keeps
+N worker processes alive; they are spawned, not forked, so none of them
+inherits the web app's pooled connections.
+"""
+import logging
+import multiprocessing
+import select
+import signal
+import time
+
+from psycopg2 import errors
+from psycopg2.extras import Json
+
+from database import jobs, partitions, stats
+from services import changes, mail
+
+logger = logging.getLogger("sge.jobs")
+
+
+def _recipients(cur, batch):
+    """(job, event dict, attendee dict) for jobs whose ticket still exists"""
+    cur.execute("""
+        SELECT j.id, e.id, e.name, e.date, e.location, e.description, a.id, a.name, a.email
+        FROM unnest(%s::bigint[], %s::int[], %s::int[]) AS j(id, event_id, attendee_id)
+        JOIN tickets t ON t.event_id = j.event_id AND t.attendee_id = j.attendee_id
+        JOIN events e ON e.id = j.event_id
+        JOIN attendees a ON a.id = j.attendee_id
+    """, (
+        [job[0] for job in batch],
+        [job[2]["event_id"] for job in batch],
+        [job[2]["attendee_id"] for job in batch],
+    ))
+    by_id = {job[0]: job for job in batch}
+    for row in cur.fetchall():
+        event = dict(zip(("id", "name", "date", "location", "description"), row[1:6]))
+        attendee = dict(zip(("id", "name", "email"), row[6:9]))
+        yield by_id[row[0]], event, attendee
+
+
+def _send(worker, cur, batch, build):
+    # Désinscrits ou supprimés entre-temps : rien à envoyer, la tâche est faite.
+    pending = [(job, build(job, event, attendee)) for job, event, attendee in _recipients(cur, batch)]
+    if not pending:
+        return []
+    errors = worker.sender.send_batch([message for _, message in pending])
+    worker.sent += sum(1 for error in errors if error is None)
+    return [(job, error) for (job, _), error in zip(pending, errors) if error is not None]
+
+
+def send_confirmations(worker, cur, batch):
+    return _send(worker, cur, batch, lambda job, event, attendee: mail.confirmation(
+        worker.mail_from, event, attendee
+    ))
+
+
+def send_event_updates(worker, cur, batch):
+    return _send(worker, cur, batch, lambda job, event, attendee: mail.event_update(
+        worker.mail_from, event, attendee, job[2].get("changes", []), job[2].get("sequence", 0)
+    ))
+
+
+def fan_out_event_changes(worker, cur, batch):
+    """One event_update job per ticket, in a single INSERT per changed event"""
+    for job_id, _, payload, _, _ in batch:
+        # SEQUENCE du .ics : l'id de la tâche croît à chaque modification.
+        cur.execute("""
+            INSERT INTO jobs (kind, payload)
+            SELECT %s, jsonb_build_object(
+                'event_id', t.event_id, 'attendee_id', t.attendee_id,
+                'changes', %s::jsonb, 'sequence', %s
+            )
+            FROM tickets t WHERE t.event_id = %s
+        """, (jobs.EVENT_UPDATE, Json(payload.get("changes", [])), job_id,
+              payload["event_id"]))
+    cur.execute("SELECT pg_notify(%s, '')", (jobs.CHANNEL,))
+    return []
+
+
+HANDLERS = {
+    jobs.REGISTRATION_CONFIRMATION: send_confirmations,
+    jobs.EVENT_UPDATE: send_event_updates,
+    jobs.EVENT_CHANGED: fan_out_event_changes,
+}
+
+
+class Worker:
+    def __init__(self, connect, sender_factory, mail_from, batch=50, lease=300,
+                 poll=5.0, retention=86400, feed_retention=86400, partitions_ahead=2,
+                 stats_max_staleness=300.0, maintenance_every=60.0):
+        self.connect = connect
+        self.sender_factory = sender_factory
+        self.mail_from = mail_from
+        self.batch = batch
+        self.lease = lease
+        self.poll = poll
+        self.retention = retention
+        self.feed_retention = feed_retention
+        self.partitions_ahead = partitions_ahead
+        self.stats_max_staleness = stats_max_staleness
+        self.maintenance_every = maintenance_every
+        self.sender = None
+        self.processed = 0
+        self.failed = 0
+        self.sent = 0
+
+    def process(self, conn, batch):
+        """Run the handlers for one claimed batch and record the outcome"""
+        cur = conn.cursor()
+        groups = {}
+        for job in batch:
+            groups.setdefault(job[1], []).append(job)
+
+        failures = []
+        for kind, group in groups.items():
+            handler = HANDLERS.get(kind)
+            if handler is None:
+                failures.extend((job, f"unknown job kind {kind!r}") for job in group)
+                continue
+            try:
+                failures.extend(handler(self, cur, group))
+                conn.commit()
+            except Exception as exc:
+                conn.rollback()
+                logger.exception("%s: batch of %d failed", kind, len(group))
+                failures.extend((job, repr(exc)) for job in group)
+
+        failed_ids = {job[0] for job, _ in failures}
+        jobs.finish(cur, [job[0] for job in batch if job[0] not in failed_ids], failures)
+        conn.commit()
+        cur.close()
+        self.processed += len(batch) - len(failures)
+        self.failed += len(failures)
+
+    def run_once(self, conn):
+        """Claim and process one batch; returns the number of jobs taken"""
+        cur = conn.cursor()
+        batch = jobs.claim(cur, self.batch, self.lease)
+        conn.commit()
+        cur.close()
+        if batch:
+            self.process(conn, batch)
+        return len(batch)
+
+    def maintain(self, conn):
+        cur = conn.cursor()
+        reaped = jobs.reap(cur)
+        purged = jobs.purge(cur, self.retention)
+        feed_purged = changes.purge(cur, self.feed_retention)
+        conn.commit()
+        # Créer une partition verrouille tickets : on n'attend pas derrière
+        # une longue requête, ce sera pour la maintenance suivante.
+        try:
+            cur.execute("SET LOCAL lock_timeout = '1s'")
+            created = partitions.ensure(cur, self.partitions_ahead)
+            conn.commit()
+        except errors.LockNotAvailable:
+            conn.rollback()
+            created = 0
+        cur.close()
+        # Hors requête : la reconstruction complète peut prendre des secondes.
+        rebuilt = stats.refresh_if_stale(conn, self.stats_max_staleness)
+        logger.info("processed=%d failed=%d sent=%d reaped=%d purged=%d feed_purged=%d partitions=%d "
+                    "stats_rebuilt=%d", self.processed, self.failed, self.sent, reaped, purged,
+                    feed_purged, created, rebuilt)
+
+    def drain(self):
+        """Process until no job is ready (cron, tests); returns the jobs taken"""
+        conn = self.connect()
+        self.sender = self.sender_factory()
+        try:
+            self.maintain(conn)
+            total = 0
+            while True:
+                taken = self.run_once(conn)
+                if not taken:
+                    return total
+                total += taken
+        finally:
+            conn.close()
+
+    def run(self, stop):
+        conn = self.connect()
+        # Connexion dédiée en autocommit : les NOTIFY y arrivent hors transaction.
+        listener = self.connect()
+        listener.autocommit = True
+        listener.cursor().execute(f"LISTEN {jobs.CHANNEL}")
+        self.sender = self.sender_factory()
+        next_maintenance = 0.0
+        try:
+            while not stop.is_set():
+                if time.monotonic() >= next_maintenance:
+                    self.maintain(conn)
+                    next_maintenance = time.monotonic() + self.maintenance_every
+                if self.run_once(conn):
+                    continue
+                if select.select([listener], [], [], self.poll)[0]:
+                    listener.poll()
+                    listener.notifies.clear()
+        finally:
+            listener.close()
+            conn.close()
+
+
+def _worker_main(stop, worker_kwargs):
+    # Le parent gère Ctrl-C et transmet l'arrêt par ``stop``.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    Worker(**worker_kwargs).run(stop)
+
+
+def run_pool(processes, **worker_kwargs):
+    """Keep ``processes`` workers running until SIGINT/SIGTERM.
+
+    ``connect`` and ``sender_factory`` must be picklable (e.g.
+    functools.partial) since the workers are spawned.
+    """
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    # Pas de stop.set() dans le gestionnaire : il interromprait le parent
+    # pendant qu'il tient le verrou de ``stop`` (interblocage).
+    signals = []
+    signal.signal(signal.SIGTERM, lambda *_: signals.append(signal.SIGTERM))
+
+    def start(index):
+        process = context.Process(
+            target=_worker_main, args=(stop, worker_kwargs), name=f"jobs-worker-{index}"
+        )
+        process.start()
+        return process
+
+    workers = [start(i) for i in range(processes)]
+    try:
+        while not signals:
+            time.sleep(1.0)
+            for i, process in enumerate(workers):
+                if not process.is_alive() and not signals:
+                    logger.warning("%s exited with %s, restarting", process.name, process.exitcode)
+                    workers[i] = start(i)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    for process in workers:
+        process.join(timeout=worker_kwargs.get("poll", 5.0) + 30)
+        if process.is_alive():
+            process.terminate()
@@ -0,0 +1,129 @@
+"""Outgoing mail: confirmation / update messages and pluggable senders.
+
+A sender takes a whole batch and returns one error (or None) per message,
+so the job worker can retry only what failed. SMTPSender reuses a single
+connection for the batch; FileSender writes .eml files to a directory and
+stands in for a mail server in development and tests.
+"""
+import os
+import smtplib
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+
+def _ics_escape(text):
+    return (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def ics(event, sequence=0):
+    """iCalendar invitation for an all-day event (events only have a date)"""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//SGE//Gestion des evenements//FR",
+        "METHOD:PUBLISH",
+        "BEGIN:VEVENT",
+        # UID stable : une mise à jour remplace l'entrée existante du calendrier.
+        f"UID:event-{event['id']}@sge",
+        f"SEQUENCE:{sequence}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{event['date']:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{event['date'] + timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{_ics_escape(event['name'])}",
+        f"LOCATION:{_ics_escape(event['location'])}",
+        f"DESCRIPTION:{_ics_escape(event['description'])}",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _message(sender, attendee, subject, body, event, sequence):
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = attendee["email"]
+    message["Subject"] = subject
+    message.set_content(body)
+    message.add_attachment(
+        ics(event, sequence).encode(), maintype="text", subtype="calendar",
+        filename=f"event-{event['id']}.ics"
+    )
+    return message
+
+
+def confirmation(sender, event, attendee):
+    return _message(
+        sender, attendee, f"Inscription confirmée : {event['name']}",
+        f"Bonjour {attendee['name']},\n\n"
+        f"Votre inscription à « {event['name']} » est confirmée.\n"
+        f"Date : {event['date']:%d/%m/%Y}\nLieu : {event['location']}\n\n"
+        "L'invitation est jointe (fichier .ics).\n",
+        event, 0
+    )
+
+
+def event_update(sender, event, attendee, changes, sequence):
+    details = []
+    if "date" in changes:
+        details.append(f"Nouvelle date : {event['date']:%d/%m/%Y}")
+    if "location" in changes:
+        details.append(f"Nouveau lieu : {event['location']}")
+    return _message(
+        sender, attendee, f"Changement : {event['name']}",
+        f"Bonjour {attendee['name']},\n\n"
+        f"L'événement « {event['name']} » auquel vous êtes inscrit a changé.\n"
+        + "\n".join(details) + "\n\nL'invitation jointe met à jour votre calendrier.\n",
+        event, sequence
+    )
+
+
+class SMTPSender:
+    def __init__(self, host="localhost", port=25, username=None, password=None,
+                 starttls=False, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def send_batch(self, messages):
+        errors = [None] * len(messages)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            for i, message in enumerate(messages):
+                try:
+                    smtp.send_message(message)
+                except smtplib.SMTPRecipientsRefused as exc:
+                    errors[i] = exc
+                except smtplib.SMTPDataError as exc:
+                    # 4xx : temporaire, la tâche sera retentée ; la connexion reste utilisable.
+                    errors[i] = exc
+        return errors
+
+
+class FileSender:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def send_batch(self, messages):
+        os.makedirs(self.directory, exist_ok=True)
+        for message in messages:
+            path = os.path.join(self.directory, f"{uuid.uuid4().hex}.eml")
+            with open(path, "wb") as f:
+                f.write(message.as_bytes())
+        return [None] * len(messages)
+
+
+def make_sender(backend, **options):
+    """``backend`` is "smtp" or "file" (MAIL_BACKEND)"""
+    if backend == "smtp":
+        return SMTPSender(**options)
+    if backend == "file":
+        return FileSender(**options)
+    raise ValueError(f"unknown mail backend: {backend}")
@@ -0,0 +1,114 @@
+"""Password-hash verification on a bounded pool of threads.
+
+A scrypt check costs ~100 ms of CPU. Run inline, a burst of logins keeps
+every request thread busy hashing and page views queue behind them. Here
+at most ``workers`` checks run at once per process (hashlib releases the
+GIL, so other requests keep running) and at most ``queue`` more wait for a
+slot; beyond that ``verify`` raises VerifierBusy at once and the login
+answers 429 instead of piling up.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash
+
+
+def _executor_class():
+    # Workers gevent : threading est patché et un « thread » y serait une
+    # greenlet qui bloquerait la boucle pendant le hash ; gevent fournit un
+    # exécuteur sur de vrais threads.
+    try:
+        from gevent import monkey
+    except ImportError:
+        return ThreadPoolExecutor
+    if monkey.is_module_patched("threading"):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor
+    return ThreadPoolExecutor
+
+
+class VerifierBusy(Exception):
+    """Raised when the verification queue is full or the wait timed out"""
+
+
+class HashVerifier:
+    def __init__(self, workers=1, queue=4, timeout=5.0):
+        self.workers = workers
+        self.queue = queue
+        self.timeout = timeout
+        self._slots = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.verified = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.hash_seconds_total = 0.0
+
+    def _start(self):
+        # Créé au premier usage, et de nouveau après un fork : les threads du
+        # processus parent n'existent pas dans le worker.
+        with self._lock:
+            if self._pid != os.getpid():
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+                self._executor = _executor_class()(self.workers)
+                self._pid = os.getpid()
+                self.in_flight = 0
+
+    def _check(self, password_hash, password):
+        start = time.perf_counter()
+        try:
+            return check_password_hash(password_hash, password)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.hash_seconds_total += elapsed
+
+    def verify(self, password_hash, password):
+        if self.workers <= 0:
+            return self._check(password_hash, password)
+        if self._pid != os.getpid():
+            self._start()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise VerifierBusy("password verification queue is full")
+        with self._lock:
+            self.in_flight += 1
+        future = None
+        try:
+            future = self._executor.submit(self._check, password_hash, password)
+            ok = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # La vérification continue en arrière-plan et garde sa place.
+            with self._lock:
+                self.timeouts += 1
+            future.add_done_callback(lambda _: self._release())
+            raise VerifierBusy("password verification timed out")
+        except BaseException:
+            self._release()
+            raise
+        self._release()
+        with self._lock:
+            self.verified += 1
+        return ok
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue": self.queue,
+                "in_flight": self.in_flight,
+                "verified": self.verified,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "hash_ms_avg": round(self.hash_seconds_total / self.verified * 1000, 1) if self.verified else 0.0,
+            }
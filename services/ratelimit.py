@@ -0,0 +1,153 @@
+"""Token buckets for the login rate limits, with an optional Redis tier.
+
+A bucket holds up to ``burst`` tokens and refills at ``rate`` tokens per
+second. ``take(key)`` spends one and returns 0.0, or returns how many
+seconds to wait if the bucket is empty; ``take(key, cost=0)`` only checks.
+The local buckets are per worker process (an LRU, so a flood of distinct
+keys cannot grow it without bound); with a Redis URL every worker shares
+the same buckets and the local ones are used only while Redis is down.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("sge.ratelimit")
+
+
+def parse_rate(value):
+    """"10/60" -> (rate per second, burst); "" or "0" disables the limit"""
+    if not value or value == "0":
+        return None
+    count, _, seconds = value.partition("/")
+    count, seconds = float(count), float(seconds or 1)
+    return count / seconds, count
+
+
+class TokenBuckets:
+    def __init__(self, rate, burst, maxsize=100000):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()   # clé -> (jetons, instant de la dernière mise à jour)
+        self._lock = threading.Lock()
+
+    def take(self, key, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= max(cost, 1):
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (max(cost, 1) - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Un seau oublié est un seau plein : l'éviction ne fait qu'assouplir.
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Même calcul que TokenBuckets.take, atomique côté Redis, sur l'horloge du serveur.
+_TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local need = math.max(cost, 1)
+local wait = 0
+if tokens >= need then
+    tokens = tokens - cost
+else
+    wait = (need - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisTokenBuckets:
+    """Buckets shared by every worker; ``redis`` is imported only when used"""
+
+    def __init__(self, url, rate, burst, prefix="sge:rl:"):
+        import redis
+
+        self._error = redis.RedisError
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.script = self.client.register_script(_TAKE_SCRIPT)
+        self.prefix = prefix
+        self.rate = rate
+        self.burst = burst
+        self.local = TokenBuckets(rate, burst)
+        self.errors = 0
+
+    def take(self, key, cost=1):
+        try:
+            return float(self.script(keys=[self.prefix + key], args=[self.rate, self.burst, cost]))
+        except self._error as exc:
+            # Redis indisponible : limite par worker plutôt que pas de limite.
+            self.errors += 1
+            logger.warning("rate limit store unavailable, using local buckets: %s", exc)
+            return self.local.take(key, cost)
+
+    def __len__(self):
+        return len(self.local)
+
+
+class LoginLimits:
+    """Per-IP limit on every attempt, per-username limit on failures.
+
+    The username bucket is only checked before the attempt and spent by
+    ``failed()``, so a user who types the right password is never slowed by
+    their own earlier successes.
+    """
+
+    def __init__(self, ip=None, user=None):
+        self.ip = ip
+        self.user = user
+        self.throttled_ip = 0
+        self.throttled_user = 0
+
+    def check(self, ip, username):
+        """Seconds to wait before this attempt may run (0.0: go ahead)"""
+        if self.user is not None:
+            wait = self.user.take(username.strip().lower(), cost=0)
+            if wait:
+                self.throttled_user += 1
+                return wait
+        if self.ip is not None:
+            wait = self.ip.take(ip)
+            if wait:
+                self.throttled_ip += 1
+                return wait
+        return 0.0
+
+    def failed(self, username):
+        if self.user is not None:
+            self.user.take(username.strip().lower())
+
+    def stats(self):
+        return {
+            "throttled_ip": self.throttled_ip,
+            "throttled_user": self.throttled_user,
+            "ip_buckets": len(self.ip) if self.ip is not None else None,
+            "user_buckets": len(self.user) if self.user is not None else None,
+        }
+
+
+def make_buckets(rate, redis_url=None, prefix="sge:rl:"):
+    """Buckets for a parse_rate() value; None when the limit is disabled"""
+    if rate is None:
+        return None
+    if redis_url:
+        return RedisTokenBuckets(redis_url, *rate, prefix=prefix)
+    return TokenBuckets(*rate)
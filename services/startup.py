@@ -0,0 +1,98 @@
+"""Startup timings and the optional worker warm-up.
+
+Each process records how long importing index.py, create_app() and the
+warm-up took, then the latency of the first request it served: with a cold
+pool and uncompiled templates that request pays for the TCP/auth handshake
+with PostgreSQL and for compiling every template it renders. WARMUP=1
+moves that cost to boot (pool opened and checked, all templates compiled,
+and written to JINJA_CACHE_DIR when set, so the next workers only load
+bytecode). The numbers are on /admin/startup and /metrics and logged by
+the gunicorn hooks (gunicorn.conf.py).
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("sge.startup")
+
+
+class StartupStats:
+    def __init__(self, import_seconds):
+        self.pid = os.getpid()
+        self.import_seconds = import_seconds
+        self.create_app_seconds = None
+        self.warmup_seconds = None
+        self.worker_boot_seconds = None
+        self.first_request_seconds = None
+        self.first_request_path = None
+        self._lock = threading.Lock()
+
+    def forked(self):
+        # Application préchargée par le maître gunicorn (preload_app) : les
+        # mesures de requête repartent de zéro dans chaque worker.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.first_request_seconds = None
+            self.first_request_path = None
+
+    def record_first_request(self, path, seconds):
+        with self._lock:
+            self.forked()
+            if self.first_request_seconds is not None:
+                return False
+            self.first_request_seconds = seconds
+            self.first_request_path = path
+            return True
+
+    def snapshot(self):
+        self.forked()
+        return {
+            "pid": self.pid,
+            "import_s": self.import_seconds,
+            "create_app_s": self.create_app_seconds,
+            "warmup_s": self.warmup_seconds,
+            "worker_boot_s": self.worker_boot_seconds,
+            "first_request_s": self.first_request_seconds,
+            "first_request_path": self.first_request_path,
+        }
+
+
+def warm_up(app):
+    """Open this process' pool and compile every template; returns seconds"""
+    start = time.perf_counter()
+    conn = app.extensions["db_pool"]().getconn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+        conn.rollback()
+    finally:
+        conn.release()
+    compiled = 0
+    for name in app.jinja_env.list_templates(extensions=("html",)):
+        app.jinja_env.get_template(name)
+        compiled += 1
+    elapsed = time.perf_counter() - start
+    app.extensions["startup"].warmup_seconds = elapsed
+    logger.info("warm-up: pool ready, %d templates compiled in %.3fs", compiled, elapsed)
+    return elapsed
+
+
+def init_app(app, import_seconds):
+    from flask import g, request
+
+    stats = app.extensions["startup"] = StartupStats(import_seconds)
+
+    @app.before_request
+    def start_timer():
+        if stats.first_request_seconds is None or stats.pid != os.getpid():
+            g._startup_timer = time.perf_counter()
+
+    @app.teardown_request
+    def first_request(exc):
+        started = g.pop("_startup_timer", None)
+        if started is not None and stats.record_first_request(request.path, time.perf_counter() - started):
+            logger.info("first request %s in %.1f ms", request.path, stats.first_request_seconds * 1000)
+
+    return stats
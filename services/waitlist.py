@@ -0,0 +1,115 @@
+"""Background promotion of waitlisted attendees."""
+import logging
+import os
+import queue
+import threading
+
+from database import capacity
+
+logger = logging.getLogger("sge.waitlist")
+
+
+class WaitlistPromoter:
+    """Daemon thread filling freed seats from the waitlist.
+
+    ``submit`` is called after the freeing transaction has committed and
+    only queues the event id, so unregister_event() never waits for the
+    promotion. Repeated submissions for an event already queued collapse
+    into one pass. The thread is started lazily, and again after a fork,
+    because gunicorn forks workers after import. A failed pass (pool
+    exhausted, database down) is submitted again after ``retry_delay``
+    seconds, growing with each attempt, up to ``retries`` times.
+    """
+
+    def __init__(self, get_connection, batch=100, retries=5, retry_delay=2.0):
+        self.get_connection = get_connection
+        self.batch = batch
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.promoted = 0
+        self.errors = 0
+
+    def submit(self, event_id):
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._pending.clear()
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name="waitlist-promoter", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+            if event_id in self._pending:
+                return
+            self._pending.add(event_id)
+        self._queue.put(event_id)
+
+    def _run(self):
+        while True:
+            event_id = self._queue.get()
+            with self._lock:
+                self._pending.discard(event_id)
+            try:
+                done = self.promote_event(event_id)
+            except Exception:
+                # Le thread ne doit jamais mourir : les promotions suivantes
+                # attendraient le prochain submit().
+                self.errors += 1
+                logger.exception("waitlist promotion failed for event %s", event_id)
+                done = False
+            if done:
+                self._attempts.pop(event_id, None)
+            else:
+                self._retry(event_id)
+
+    def _retry(self, event_id):
+        attempt = self._attempts.get(event_id, 0) + 1
+        if attempt > self.retries:
+            self._attempts.pop(event_id, None)
+            logger.error("waitlist promotion for event %s abandoned after %d attempts "
+                         "(flask promote-waitlist to catch up)", event_id, self.retries)
+            return
+        self._attempts[event_id] = attempt
+        timer = threading.Timer(self.retry_delay * attempt, self.submit, (event_id,))
+        timer.daemon = True
+        timer.start()
+
+    def promote_event(self, event_id):
+        """Promote until the event is full or its waitlist is empty.
+
+        Returns False if the pass failed; the error is logged and counted.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            while True:
+                promoted = capacity.promote(cur, event_id, self.batch)
+                conn.commit()
+                self.promoted += len(promoted)
+                if len(promoted) < self.batch:
+                    break
+            cur.close()
+            return True
+        except Exception:
+            # Pas de rollback ici : il échouerait sur une connexion coupée ;
+            # le pool annule la transaction ouverte (ou jette la connexion).
+            self.errors += 1
+            logger.exception("waitlist promotion failed for event %s", event_id)
+            return False
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "promoted": self.promoted,
+            "errors": self.errors,
+            "retrying": len(self._attempts),
+            "running": bool(self._thread and self._thread.is_alive() and self._pid == os.getpid()),
+        }
@@ -0,0 +1,44 @@
+"""Shared fixtures.
+
+``pg_cursor`` runs a test against the PostgreSQL database of the
+environment (config.py, migrations applied) inside a transaction that is
+rolled back afterwards; ``pg_connect`` opens connections of their own, for
+tests of concurrent transactions, which must clean up what they commit.
+Both skip the test when no server answers.
+"""
+import psycopg2
+import pytest
+
+import config
+
+
+def _connect():
+    try:
+        return psycopg2.connect(connect_timeout=2, **config.connection_params(config.from_env()))
+    except psycopg2.OperationalError as exc:
+        pytest.skip(f"PostgreSQL unavailable: {exc}")
+
+
+@pytest.fixture
+def pg_cursor():
+    conn = _connect()
+    cur = conn.cursor()
+    try:
+        yield cur
+    finally:
+        cur.close()
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def pg_connect():
+    connections = []
+
+    def connect():
+        connections.append(_connect())
+        return connections[-1]
+
+    yield connect
+    for conn in connections:
+        conn.close()
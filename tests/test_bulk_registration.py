@@ -0,0 +1,81 @@
+"""Bulk registration endpoint (index.register_event_bulk) and register_many."""
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import index
+from database import writes
+from database.tickets import register_many
+
+
+@pytest.fixture
+def app():
+    # Les corps refusés n'atteignent jamais la base.
+    return index.create_app({"LOGIN_DISABLED": True, "TESTING": True})
+
+
+@pytest.mark.parametrize("body", [
+    {"attendee_ids": "12"},
+    {"attendee_ids": 12},
+    {"attendee_ids": [1, "2"]},
+    {"attendee_ids": [True]},
+    {"attendee_ids": [1.5]},
+    {"attendee_ids": [2**31]},
+    {"attendee_ids": [-2**31 - 1]},
+    {"attendee_ids": None},
+    [1, 2],
+    "12",
+], ids=repr)
+def test_malformed_json_is_rejected(app, body):
+    response = app.test_client().post("/register_event/1/bulk", json=body)
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "attendee_ids must be a list of integers"}
+
+
+def test_invalid_json_body_is_rejected(app):
+    response = app.test_client().post(
+        "/register_event/1/bulk", data="{", content_type="application/json"
+    )
+
+    assert response.status_code == 400
+
+
+def test_json_ids_are_kept_as_sent(app):
+    with app.test_request_context(json={"attendee_ids": [3, 2**31 - 1, 3]}):
+        assert index._bulk_attendee_ids() == ([3, 2**31 - 1, 3], 0)
+    with app.test_request_context(json={}):
+        assert index._bulk_attendee_ids() == ([], 0)
+
+
+def test_form_ids_out_of_range_count_as_invalid(app):
+    form = {"attendee_ids": ["4", "x"], "attendee_ids_text": "5, 99999999999 6"}
+    with app.test_request_context(method="POST", data=form):
+        assert index._bulk_attendee_ids() == ([4, 5, 6], 2)
+
+
+def test_register_many_skips_attendee_deleted_concurrently(pg_connect):
+    setup = pg_connect()
+    event_id = writes.run(setup, writes.create_event, "Atelier", datetime.date(2026, 6, 1), "Paris", "", None, None)
+    kept, gone = (writes.run(setup, writes.create_attendee, name, f"{name}@example.com", "")
+                  for name in ("kept", "gone"))
+    deleter = pg_connect()
+    try:
+        # Suppression en cours, pas encore validée.
+        assert writes.delete_attendee(deleter.cursor(), gone) == (True, False)
+        registrar = pg_connect()
+        with ThreadPoolExecutor(1) as pool:
+            future = pool.submit(writes.run, registrar, register_many, event_id, [kept, gone])
+            time.sleep(0.3)
+            deleter.commit()
+            result = future.result(timeout=5)
+
+        assert result["inserted"] == 1
+        assert result["unknown"] == 1
+    finally:
+        deleter.rollback()
+        writes.run(setup, writes.delete_event, event_id)
+        for attendee_id in (kept, gone):
+            writes.run(setup, writes.delete_attendee, attendee_id)
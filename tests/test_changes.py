@@ -0,0 +1,67 @@
+"""One-shot reads of the change feed (services/changes.py), without PostgreSQL."""
+from services.changes import ChangeFeed
+
+
+class FakeConnection:
+    """Answers the three change_feed queries of ChangeFeed._read_table"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = None
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        seqs = [row[0] for row in self.rows]
+        if "MAX(seq)" in query:
+            self.result = [(max(seqs, default=0),)]
+        elif "MIN(seq)" in query:
+            self.result = [(min(seqs, default=None),)]
+        else:
+            after, limit = params
+            self.result = [row for row in self.rows if row[0] > after][:limit]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _feed(rows, buffer=1000):
+    return ChangeFeed(connect=None, get_connection=lambda: FakeConnection(rows), buffer=buffer)
+
+
+ROWS = [
+    (10, "event:1", {"kind": "tickets", "count": 1}),
+    (11, "event:2", {"kind": "tickets", "count": 1}),
+    (12, "event:1", {"kind": "waitlist", "count": 1}),
+    (13, "attendees", {"kind": "attendees", "ids": [4]}),
+]
+
+
+def test_first_read_only_returns_the_position():
+    assert _feed(ROWS).read_since(["event:1"]) == ([], 13)
+
+
+def test_read_returns_matching_changes_and_last_seq_read():
+    changes, position = _feed(ROWS).read_since(["event:1"], 10)
+
+    assert [change.seq for change in changes] == [12]
+    assert position == 13
+
+
+def test_read_keeps_position_when_nothing_changed():
+    assert _feed(ROWS).read_since(["event:1"], 13) == ([], 13)
+
+
+def test_purged_or_too_far_behind_asks_for_a_reset():
+    assert _feed(ROWS).read_since(["event:1"], 5) == (None, None)
+    assert _feed(ROWS, buffer=2).read_since(["event:*"], 9) == (None, None)
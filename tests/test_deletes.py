@@ -0,0 +1,54 @@
+"""Organizer and attendee deletion (index.py routes, database/writes.py)."""
+import pytest
+
+import index
+from database import writes
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app = index.create_app({"LOGIN_DISABLED": True, "TESTING": True})
+    monkeypatch.setattr(index, "get_db_connection", lambda: None)
+    monkeypatch.setattr(index, "invalidate_count", lambda kind: None)
+    return app.test_client()
+
+
+def _flashes(client):
+    with client.session_transaction() as session:
+        return session.get("_flashes", [])
+
+
+@pytest.mark.parametrize("result, expected", [
+    ((True, False), ("success", " Organisateur supprimé avec succès!")),
+    ((False, True), ("danger", " Impossible de supprimer cet organisateur car il a des événements associés.")),
+    ((False, False), ("danger", " Organisateur non trouvé!")),
+])
+def test_delete_organizer_flash(client, monkeypatch, result, expected):
+    monkeypatch.setattr(writes, "run", lambda conn, write, *args: result)
+
+    client.get("/organizers/delete/42")
+
+    assert _flashes(client) == [expected]
+
+
+@pytest.mark.parametrize("result, expected", [
+    ((True, False), ("success", "🗑️ Participant supprimé avec succès!")),
+    ((False, True), ("danger", "⚠️ Impossible de supprimer ce participant car il est inscrit à des événements.")),
+    ((False, False), ("danger", "Participant non trouvé!")),
+])
+def test_delete_attendee_flash(client, monkeypatch, result, expected):
+    monkeypatch.setattr(writes, "run", lambda conn, write, *args: result)
+
+    client.post("/attendees/delete/42")
+
+    assert _flashes(client) == [expected]
+
+
+def test_delete_unknown_id_reports_nothing_deleted(pg_cursor):
+    pg_cursor.execute("SELECT COALESCE(MAX(id), 0) + 1000 FROM organizers")
+    missing_organizer = pg_cursor.fetchone()[0]
+    pg_cursor.execute("SELECT COALESCE(MAX(id), 0) + 1000 FROM attendees")
+    missing_attendee = pg_cursor.fetchone()[0]
+
+    assert writes.delete_organizer(pg_cursor, missing_organizer) == (False, False)
+    assert writes.delete_attendee(pg_cursor, missing_attendee) == (False, False)
@@ -0,0 +1,52 @@
+"""Tickets of archived ranges (migrations 0010 and 0013), on PostgreSQL."""
+import datetime
+
+import pytest
+from psycopg2 import errors
+
+from database import capacity, writes
+from database.tickets import register_many
+
+
+def _archive_ticket(cur, event_id, attendee_id):
+    """An archived ticket: the event's range is moved to tickets_archive (same
+    catalog change as partitions.archive, inside the test transaction) and
+    the ticket written there"""
+    cur.execute("SELECT tickets_partition_width()")
+    width = cur.fetchone()[0]
+    low = event_id // width * width
+    name = f"tickets_p{low}"
+    cur.execute("""
+        SELECT p.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE c.relname = %s
+    """, (name,))
+    row = cur.fetchone()
+    if row is None:
+        cur.execute(f"CREATE TABLE {name} PARTITION OF tickets_archive FOR VALUES FROM ({low}) TO ({low + width})")
+    elif row[0] == "tickets":
+        cur.execute(f"ALTER TABLE tickets DETACH PARTITION {name}")
+        cur.execute(f"ALTER TABLE tickets_archive ATTACH PARTITION {name} FOR VALUES FROM ({low}) TO ({low + width})")
+    cur.execute(
+        "INSERT INTO tickets_archive (id, event_id, attendee_id) VALUES (nextval('tickets_id_seq'), %s, %s)",
+        (event_id, attendee_id)
+    )
+
+
+def test_archived_ticket_is_not_registered_again(pg_cursor):
+    cur = pg_cursor
+    event_id = writes.create_event(cur, "Archivé", datetime.date(2020, 1, 1), "Paris", "", None, None)
+    attendee_id = writes.create_attendee(cur, "Ancien", "ancien@example.com", "")
+    _archive_ticket(cur, event_id, attendee_id)
+
+    assert capacity.register(cur, event_id, attendee_id) == capacity.ALREADY_REGISTERED
+    assert register_many(cur, event_id, [attendee_id])["already_registered"] == 1
+    capacity.enqueue(cur, event_id, [attendee_id])
+    assert capacity.promote(cur, event_id) == []
+    cur.execute("SELECT COUNT(*) FROM tickets_history WHERE event_id = %s", (event_id,))
+    assert cur.fetchone()[0] == 1
+
+    # Toute autre écriture (psql, import) bute sur le trigger de 0013.
+    with pytest.raises(errors.UniqueViolation):
+        cur.execute("INSERT INTO tickets (event_id, attendee_id) VALUES (%s, %s)", (event_id, attendee_id))
@@ -0,0 +1,83 @@
+"""Connection pool checkout (database/pool.py), with fake connections."""
+import threading
+import time
+
+from flask import Flask
+
+from database import pool as db_pool
+from database.pool import ConnectionPool
+
+
+class FakeConnection:
+    closed = 0
+
+    def __init__(self, on_ping=None):
+        self.on_ping = on_ping
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        if self.on_ping is not None:
+            self.on_ping()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def test_health_ping_runs_outside_the_lock():
+    pool = ConnectionPool(minconn=0, maxconn=2, max_idle=1.0)
+    lock_free = []
+
+    def ping():
+        # Le verrou est réentrant : il faut l'essayer depuis un autre thread.
+        def try_lock():
+            acquired = pool._lock.acquire(timeout=1)
+            lock_free.append(acquired)
+            if acquired:
+                pool._lock.release()
+
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+
+    conn = FakeConnection(on_ping=ping)
+    pool._created[id(conn)] = time.monotonic()
+    pool._idle.append((conn, time.monotonic(), time.monotonic() - 10))
+
+    checked_out = pool.getconn()
+
+    assert lock_free == [True]
+    assert checked_out.raw is conn
+    assert pool.stats()["in_use"] == 1
+
+
+def test_unhealthy_idle_connection_frees_its_slot():
+    pool = ConnectionPool(minconn=0, maxconn=1, max_lifetime=1.0)
+    stale = FakeConnection()
+    pool._created[id(stale)] = time.monotonic() - 10
+    pool._idle.append((stale, time.monotonic() - 10, time.monotonic()))
+    fresh = FakeConnection()
+    pool._connect = lambda: fresh
+
+    checked_out = pool.getconn()
+
+    assert checked_out.raw is fresh
+    assert stale.closed
+    assert pool.stats()["in_use"] == 1
+    assert pool.stats()["discarded"] == 1
+
+
+def test_each_app_keeps_its_own_pool_settings():
+    pools = []
+    for size in (3, 7):
+        app = Flask(__name__)
+        app.config.update(DB_POOL_MIN=0, DB_POOL_MAX=size)
+        db_pool.init_app(app, host="localhost")
+        pools.append(app.extensions["db_pool"]())
+
+    assert [p.maxconn for p in pools] == [3, 7]
+    assert pools[0] is not pools[1]
@@ -0,0 +1,108 @@
+"""Statement counts of the ORM query helpers (models/queries.py), on SQLite."""
+import datetime
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+
+from models import queries
+from models.your_model import db, Attendee, Event, Organizer, Ticket
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def count_statements(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _populate(events, attendees_per_event=3):
+    organizers = [Organizer(name=f"Orga {i}", email=f"orga{i}@example.com") for i in range(5)]
+    attendees = [Attendee(name=f"Participant {i}", email=f"p{i}@example.com") for i in range(20)]
+    db.session.add_all(organizers + attendees)
+    db.session.flush()
+    start = datetime.date(2026, 1, 1)
+    for i in range(events):
+        event_row = Event(
+            name=f"Événement {i}", date=start + datetime.timedelta(days=i), location="Paris",
+            organizer=organizers[i % len(organizers)],
+        )
+        db.session.add(event_row)
+        for j in range(attendees_per_event):
+            db.session.add(Ticket(event=event_row, attendee=attendees[(i + j) % len(attendees)]))
+    db.session.flush()
+    # Ce que font les triggers de 0007 sous PostgreSQL.
+    db.session.execute(text(
+        "UPDATE events SET ticket_count = (SELECT COUNT(*) FROM tickets WHERE tickets.event_id = events.id)"
+    ))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def _list_events_statements(statements, limit):
+    del statements[:]
+    rows = queries.list_events(limit=limit)
+    summary = [(row.organizer.name, row.attendee_count) for row in rows]
+    return len(statements), rows, summary
+
+
+def test_list_events_statement_count_is_constant(app, count_statements):
+    _populate(100)
+
+    count_10, rows_10, _ = _list_events_statements(count_statements, 10)
+    db.session.expunge_all()
+    count_100, rows_100, summary = _list_events_statements(count_statements, 100)
+
+    assert len(rows_10) == 10 and len(rows_100) == 100
+    assert count_100 == count_10 == 1
+    assert all(attendee_count == 3 for _, attendee_count in summary)
+
+
+def test_list_events_reads_counter_column(app, count_statements):
+    _populate(1)
+
+    _list_events_statements(count_statements, 100)
+
+    sql = count_statements[0].lower()
+    assert "ticket_count" in sql
+    assert "count(" not in sql
+
+
+def test_counter_columns_are_mapped_but_never_written(app, count_statements):
+    assert Event.attendee_count.property.columns[0] is Event.__table__.c.ticket_count
+    assert Organizer.__table__.c.event_count.server_default is not None
+    assert Attendee.__table__.c.event_count.server_default is not None
+
+    _populate(2)
+    organizer = db.session.get(Organizer, 1)
+    organizer.name = "Orga renommé"
+    event_row = db.session.get(Event, 1)
+    event_row.location = "Lyon"
+    db.session.commit()
+
+    writes = [s.lower() for s in count_statements if s.lstrip().upper().startswith(("INSERT", "UPDATE"))]
+    orm_writes = [s for s in writes if not s.startswith("update events set ticket_count")]
+    assert any(s.startswith("insert into events") for s in orm_writes)
+    assert any(s.startswith("update events") for s in orm_writes)
+    # Les compteurs n'apparaissent qu'après RETURNING : relus, jamais écrits.
+    written = [s.split(" returning ")[0] for s in orm_writes]
+    assert not any("ticket_count" in s or "event_count" in s for s in written)
+    assert db.session.get(Event, 1).attendee_count == 3
+    assert db.session.get(Organizer, 1).event_count == 0
@@ -0,0 +1,73 @@
+"""Failure handling of the waitlist promotion thread (services/waitlist.py)."""
+import threading
+
+from database import capacity
+from database.pool import PoolTimeout
+from services.waitlist import WaitlistPromoter
+
+
+class FakeConnection:
+    def __init__(self, closed=None):
+        self.on_close = closed
+
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def close(self):
+        if self.on_close is not None:
+            self.on_close.set()
+
+
+def test_promotion_survives_checkout_failure_and_is_retried(monkeypatch):
+    done = threading.Event()
+    checkouts = []
+
+    def get_connection():
+        checkouts.append(1)
+        if len(checkouts) == 1:
+            raise PoolTimeout("no database connection available after 5.0s")
+        return FakeConnection(closed=done)
+
+    def promote(cur, event_id, batch):
+        return [101]
+
+    monkeypatch.setattr(capacity, "promote", promote)
+    promoter = WaitlistPromoter(get_connection, retry_delay=0.01)
+
+    promoter.submit(7)
+
+    assert done.wait(2)
+    assert promoter.errors == 1
+    assert promoter.promoted == 1
+    assert promoter.stats()["running"]
+
+
+def test_promotion_gives_up_after_retries(monkeypatch):
+    def get_connection():
+        raise PoolTimeout("no database connection available after 5.0s")
+
+    # Délai long : les relances programmées ne partent pas pendant le test.
+    promoter = WaitlistPromoter(get_connection, retries=2, retry_delay=60)
+
+    assert promoter.promote_event(7) is False
+    for _ in range(3):
+        promoter._retry(7)
+
+    assert promoter.errors == 1
+    assert promoter.stats()["retrying"] == 0
+
+
+def test_promotion_survives_unexpected_error(monkeypatch):
+    promoter = WaitlistPromoter(lambda: FakeConnection(), retry_delay=60)
+    monkeypatch.setattr(promoter, "promote_event", lambda event_id: 1 / 0)
+    retried = threading.Event()
+    monkeypatch.setattr(promoter, "_retry", lambda event_id: retried.set())
+
+    promoter.submit(7)
+
+    assert retried.wait(2)
+    assert promoter.errors == 1
+    assert promoter.stats()["running"]
@@ -0,0 +1,155 @@
+"""Round trips of the write paths (database/writes.py, database/capacity.py).
+
+A fake connection records what ``writes.run`` sends, so these run without
+PostgreSQL: every write marked single_statement must issue one statement,
+in autocommit mode, with no BEGIN or COMMIT around it.
+"""
+import datetime
+
+import pytest
+from psycopg2 import errors, extensions
+
+from database import capacity, writes
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query)
+        failure = self.conn.failures.pop(0) if self.conn.failures else None
+        if failure is not None:
+            raise failure
+
+    def fetchone(self):
+        return self.conn.rows.pop(0) if self.conn.rows else (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Enough of a psycopg2 connection for writes.run"""
+
+    def __init__(self, rows=(), failures=()):
+        self.rows = list(rows)
+        self.failures = list(failures)
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.autocommit = False
+        self.autocommit_seen = []
+        self.closed = False
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        self.autocommit_seen.append(self.autocommit)
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+DAY = datetime.date(2026, 6, 1)
+
+SINGLE_STATEMENT_WRITES = [
+    (writes.create_event, ("Salon", DAY, "Paris", "", 1, 100)),
+    (writes.update_event, (1, "Salon", DAY, "Lyon", "", 1, 100)),
+    (writes.delete_event, (1,)),
+    (writes.create_organizer, ("Orga", "orga@example.com", "")),
+    (writes.update_organizer, (1, "Orga", "orga@example.com", "")),
+    (writes.delete_organizer, (1,)),
+    (writes.create_attendee, ("Alice", "alice@example.com", "")),
+    (writes.update_attendee, (1, "Alice", "alice@example.com", "")),
+    (writes.delete_attendee, (1,)),
+    (capacity.register, (1, 1)),
+    (capacity.unregister, (1, 1)),
+]
+
+
+@pytest.mark.parametrize("write, args", SINGLE_STATEMENT_WRITES, ids=lambda value: getattr(value, "__name__", ""))
+def test_single_statement_write_is_one_round_trip(write, args):
+    conn = FakeConnection(rows=[(1, True, True, True, False, False, 1)] if write is capacity.register else [])
+
+    writes.run(conn, write, *args)
+
+    assert getattr(write, "single_statement", False)
+    assert len(conn.statements) == 1
+    assert conn.autocommit_seen == [True]
+    assert conn.commits == 0
+    assert conn.autocommit is False
+
+
+@pytest.mark.parametrize("row, status", [
+    ((1, True, True, True, False, False, 1), capacity.REGISTERED),
+    ((0, True, True, False, True, False, 0), capacity.WAITLISTED),
+    ((1, True, True, False, False, True, 0), capacity.ALREADY_REGISTERED),
+    ((0, True, True, False, False, True, 0), capacity.ALREADY_REGISTERED),
+    ((0, True, True, False, False, False, 0), capacity.ALREADY_WAITLISTED),
+    ((None, True, False, False, False, False, 0), None),
+    ((None, False, True, False, False, False, 0), None),
+])
+def test_register_status(row, status):
+    conn = FakeConnection(rows=[row])
+
+    assert writes.run(conn, capacity.register, 1, 1) == status
+    assert len(conn.statements) == 1
+
+
+def test_register_creates_missing_seat_row_once():
+    conn = FakeConnection(rows=[
+        (None, True, True, False, False, False, 0),
+        (1, True, True, True, False, False, 1),
+    ])
+
+    assert writes.run(conn, capacity.register, 1, 1) == capacity.REGISTERED
+    assert len(conn.statements) == 3
+    assert "INSERT INTO event_seats" in conn.statements[1]
+
+
+def test_run_retries_deadlock():
+    conn = FakeConnection(failures=[errors.DeadlockDetected("deadlock detected")])
+
+    writes.run(conn, writes.delete_attendee, 1)
+
+    assert len(conn.statements) == 2
+    assert conn.rollbacks == 1
+    assert writes.retry_counts["retried"] >= 1
+
+
+def test_transactional_write_commits_once():
+    def two_statements(cur):
+        cur.execute("SELECT 1")
+        cur.execute("SELECT 2")
+
+    conn = FakeConnection()
+
+    writes.run(conn, two_statements)
+
+    assert conn.autocommit_seen == [False]
+    assert conn.commits == 1
+
+
+def _event_with_tickets(cur, capacity_limit, registered):
+    event_id = writes.create_event(cur, "Atelier", DAY, "Paris", "", None, capacity_limit)
+    attendee_ids = [writes.create_attendee(cur, f"P{i}", f"p{i}@example.com", "") for i in range(registered + 1)]
+    for attendee_id in attendee_ids[:registered]:
+        assert capacity.register(cur, event_id, attendee_id) == capacity.REGISTERED
+    return event_id, attendee_ids[-1]
+
+
+def test_register_waitlists_when_capacity_lowered_below_taken(pg_cursor):
+    event_id, newcomer = _event_with_tickets(pg_cursor, 3, registered=3)
+    writes.update_event(pg_cursor, event_id, "Atelier", DAY, "Paris", "", None, 1)
+
+    assert capacity.register(pg_cursor, event_id, newcomer) == capacity.WAITLISTED
+    pg_cursor.execute("SELECT COUNT(*) FROM waitlist WHERE event_id = %s AND attendee_id = %s",
+                      (event_id, newcomer))
+    assert pg_cursor.fetchone()[0] == 1
+    assert capacity.register(pg_cursor, event_id, newcomer) == capacity.ALREADY_WAITLISTED
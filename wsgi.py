@@ -0,0 +1,16 @@
+"""WSGI entry point for gunicorn (see gunicorn.conf.py).
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    load_dotenv = None
+
+# « flask run » lit .env tout seul ; gunicorn non.
+if load_dotenv is not None:
+    load_dotenv()
+
+from index import create_app
+
+app = create_app()